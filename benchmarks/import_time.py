@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Measure the time taken to import the usagi discovery plugin in a
+fresh interpreter, and list the slowest imports.
+
+Usage: python benchmarks/import_time.py [--repeat N] [--top N]
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import subprocess
+import sys
+import timeit
+
+MODULE = 'usagi.discoverer'
+
+RUNTIME_MODULES = ('requests', 'urllib3', 'jq', 'sqlite3', 'ssl')
+
+
+def time_import(module):
+    script = 'import {0}'.format(module)
+    start = timeit.default_timer()
+    subprocess.check_call([sys.executable, '-c', script])
+    return timeit.default_timer() - start
+
+
+def slowest_imports(module, top):
+    """Parse the output of ``python -X importtime`` (Python >= 3.7).
+
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import {0}'.format(module)],
+        stderr=subprocess.PIPE, universal_newlines=True)
+    _, stderr = process.communicate()
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        timings.append((int(cumulative_us), name.rstrip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    baseline = min(time_import('sys') for _ in range(args.repeat))
+    best = min(time_import(MODULE) for _ in range(args.repeat))
+    print('Interpreter startup: {0:.3f}s'.format(baseline))
+    print('import {0}: {1:.3f}s (+{2:.3f}s)'.format(
+        MODULE, best, best - baseline))
+
+    script = 'import sys, {0}; print(" ".join(m for m in {1!r} ' \
+        'if m in sys.modules))'.format(MODULE, RUNTIME_MODULES)
+    loaded = subprocess.check_output([sys.executable, '-c', script])
+    loaded = loaded.decode('utf-8').strip()
+    print('Runtime modules imported: {0}'.format(loaded or 'none'))
+
+    if sys.version_info >= (3, 7):
+        print()
+        print('Slowest imports (cumulative):')
+        for cumulative_us, name in slowest_imports(MODULE, args.top):
+            print('{0:>10.1f}ms {1}'.format(cumulative_us / 1000.0, name))
+
+
+if __name__ == '__main__':
+    main()
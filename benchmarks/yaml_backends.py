@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Compare the time taken to parse a large test file with each YAML
+backend.
+
+Usage: python benchmarks/yaml_backends.py [--cases N] [--repeat N]
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import timeit
+
+import yaml
+
+from usagi import yaml_backend
+
+
+def generate_test_file(case_count):
+    cases = [
+        {
+            'name': 'Case {0}'.format(index),
+            'tests': [
+                {
+                    'name': 'Test {0}'.format(test_index),
+                    'url': {'template': '/api/{version}/item/' + str(index)},
+                    'parameters': {
+                        'method': 'POST',
+                        'headers': {'Accept': 'application/json'},
+                        'body': {
+                            'format': 'json',
+                            'value': {'id': index, 'tags': ['a', 'b']},
+                        },
+                    },
+                    'assertions': [
+                        {'name': 'status_code', 'expected': 200},
+                        {'name': 'header', 'header': 'Content-Type',
+                         'value': 'application/json'},
+                    ],
+                }
+                for test_index in range(5)
+            ],
+        }
+        for index in range(case_count)
+    ]
+    test_structure = {
+        'version': '1.0',
+        'config': {'host': 'test.domain', 'vars': {'version': 'v1'}},
+        'cases': cases,
+    }
+    return yaml_backend.safe_dump(test_structure, default_flow_style=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    document = generate_test_file(args.cases)
+    print('Active backend: {0}'.format(yaml_backend.BACKEND))
+    print('Document size: {0:.1f} KiB'.format(len(document) / 1024.0))
+
+    loaders = [('python', yaml.SafeLoader)]
+    if yaml_backend.BACKEND == yaml_backend.BACKEND_LIBYAML:
+        loaders.append(('libyaml', yaml.CSafeLoader))
+
+    for name, loader in loaders:
+        timer = timeit.Timer(lambda: yaml.load(document, Loader=loader))
+        best = min(timer.repeat(repeat=args.repeat, number=1))
+        print('{0:>8}: {1:.3f}s'.format(name, best))
+
+
+if __name__ == '__main__':
+    main()
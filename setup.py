@@ -110,13 +110,15 @@ if __name__ == "__main__":
         'pyyaml',
         'requests',
         'six',
-        'stevedore',
-        'haas >= 0.6.0',
+        'haas >= 0.9.0',
         'jq >= 0.1.3, < 0.2',
     ]
     py26_requires = ['unittest2']
     if sys.version_info < (2, 7):
         install_requires += py26_requires
+    py2_requires = ['scandir']
+    if sys.version_info < (3, 5):
+        install_requires += py2_requires
 
     write_version_py()
     from usagi import __version__
@@ -149,10 +151,25 @@ if __name__ == "__main__":
         packages=['usagi', 'usagi.plugins'],
         install_requires=install_requires,
         entry_points={
+            'console_scripts': [
+                'usagi = usagi.main:main',
+            ],
             'haas.discovery': [
                 'rest-test = usagi.discoverer:RestTestDiscoverer',
                 'usagi = usagi.discoverer:RestTestDiscoverer',
             ],
+            'haas.result.handler': [
+                'usagi-dns = usagi.result_handler:DnsStatsResultHandler',
+                'usagi-durations = usagi.result_handler:DurationsResultHandler',  # noqa
+                'usagi-history = usagi.result_handler:HistoryResultHandler',  # noqa
+                'usagi-tls = usagi.result_handler:TlsStatsResultHandler',
+            ],
+            'haas.runner': [
+                'usagi-async = usagi.async_runner:AsyncCaseRunner',
+                'usagi-coordinator = usagi.distributed:CoordinatorRunner',  # noqa
+                'usagi-processes = usagi.process_runner:ProcessCaseRunner',  # noqa
+                'usagi-threaded = usagi.runner:ThreadedCaseRunner',
+            ],
             'usagi.assertions': [
                 'body = usagi.plugins.assertions:BodyAssertion',
                 'sha256 = usagi.plugins.assertions:Sha256BodyAssertion',
@@ -165,6 +182,10 @@ if __name__ == "__main__":
                 'method = usagi.plugins.test_parameters:MethodTestParameter',  # noqa
                 'queryparams = usagi.plugins.test_parameters:QueryParamsTestParameter',  # noqa
             ],
+            'usagi.transports': [
+                'requests = usagi.plugins.transports:RequestsTransport',
+                'urllib3 = usagi.plugins.transports:Urllib3Transport',
+            ],
             'usagi.var_loaders': [
                 'env = usagi.plugins.var_loaders:EnvVarLoader',
                 'ref = usagi.plugins.var_loaders:RefVarLoader',
@@ -174,5 +195,7 @@ if __name__ == "__main__":
         },
         extras_require={
             ':python_version=="2.6"': py26_requires,
+            ':python_version<"3.5"': py2_requires,
+            'async': ['aiohttp'],
         },
     )
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+# THIS FILE IS GENERATED FROM SETUP.PY
+version = '0.4.0'
+full_version = '0.4.0.dev25'
+git_revision = 'db9d198134a2804129cf6c1ef00e8cfc59b9105c'
+is_released = False
+
+if not is_released:
+    version = full_version
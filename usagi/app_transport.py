@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Dispatch requests directly to a WSGI or ASGI application in the
+test process, without a server or sockets.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+from email.message import Message
+from importlib import import_module
+from io import BytesIO
+import inspect
+import sys
+
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+import six
+from six.moves import urllib
+
+from .exceptions import HaasRestTestError
+
+INTERFACE_AUTO = 'auto'
+INTERFACE_WSGI = 'wsgi'
+INTERFACE_ASGI = 'asgi'
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def load_app(target):
+    """Import the application named by ``'module:attribute'``.
+
+    """
+    module_name, _, attrs = target.partition(':')
+    if not attrs:
+        raise HaasRestTestError(
+            'Invalid app {0!r}; expected module:attribute'.format(target))
+    obj = import_module(module_name)
+    for attr in attrs.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def is_asgi_app(app):
+    """Guess whether ``app`` is an ASGI (rather than WSGI) application.
+
+    """
+    iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', None)
+    if iscoroutinefunction is None:  # pragma: no cover
+        return False
+    return iscoroutinefunction(app) or \
+        iscoroutinefunction(getattr(app, '__call__', None))
+
+
+def request_body(request):
+    """The body of a ``requests.PreparedRequest`` as bytes.
+
+    """
+    body = request.body
+    if body is None:
+        return b''
+    if hasattr(body, 'read'):
+        body = body.read()
+    if isinstance(body, six.text_type):
+        body = body.encode('utf-8')
+    return body
+
+
+def request_target(request):
+    """Split the URL of a ``requests.PreparedRequest``.
+
+    Returns
+    -------
+    parts : urllib.parse.SplitResult
+        The parts of the URL.
+    port : int
+        The port of the URL, or the default port of its scheme.
+
+    """
+    parts = urllib.parse.urlsplit(request.url)
+    port = parts.port or _DEFAULT_PORTS.get(parts.scheme, 80)
+    return parts, port
+
+
+class _OriginalResponse(object):
+    """Provides the header access used by ``requests`` to extract
+    cookies from a response.
+
+    """
+
+    def __init__(self, headers):
+        super(_OriginalResponse, self).__init__()
+        self.msg = Message()
+        for name, value in headers:
+            self.msg[name] = value
+
+    def isclosed(self):
+        return True
+
+
+class AppAdapter(HTTPAdapter):
+    """Base class of transport adapters that call an application in
+    the test process instead of opening a connection.
+
+    Responses are real ``requests.Response`` objects, so assertion
+    plugins and cookie handling work exactly as for network requests.
+
+    Parameters
+    ----------
+    app : callable
+        The application.
+    target : str
+        The ``module:attribute`` name of the application, used in error
+        messages.
+
+    """
+
+    def __init__(self, app, target=None):
+        super(AppAdapter, self).__init__()
+        self.app = app
+        self.target = target
+
+    def call_app(self, request):
+        """Call the application.
+
+        Returns
+        -------
+        status : int
+            The HTTP status code.
+        reason : str
+            The HTTP reason phrase.
+        headers : list
+            The response headers as ``(name, value)`` pairs.
+        content : bytes
+            The response body.
+
+        """
+        raise NotImplementedError()
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        status, reason, headers, content = self.call_app(request)
+        raw = HTTPResponse(
+            body=BytesIO(content),
+            headers=headers,
+            status=status,
+            reason=reason,
+            preload_content=False,
+            original_response=_OriginalResponse(headers),
+            enforce_content_length=False,
+        )
+        return self.build_response(request, raw)
+
+
+def _native(value):
+    # PEP 3333 "native strings" are byte strings on Python 2.
+    if six.PY2 and isinstance(value, six.text_type):  # pragma: no cover
+        return value.encode('latin-1')
+    return value
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        return value.decode('latin-1')
+    return value
+
+
+class WSGIAdapter(AppAdapter):
+    """Send requests to a WSGI (PEP 3333) application.
+
+    """
+
+    def _environ(self, request, body):
+        parts, port = request_target(request)
+        path = urllib.parse.unquote(parts.path or '/')
+        if not six.PY2:
+            # Native strings hold the raw bytes decoded as latin-1.
+            path = path.encode('utf-8').decode('latin-1')
+        environ = {
+            'REQUEST_METHOD': _native(request.method),
+            'SCRIPT_NAME': _native(''),
+            'PATH_INFO': _native(path),
+            'QUERY_STRING': _native(parts.query),
+            'SERVER_NAME': _native(parts.hostname or 'localhost'),
+            'SERVER_PORT': _native(str(port)),
+            'SERVER_PROTOCOL': _native('HTTP/1.1'),
+            'REMOTE_ADDR': _native('127.0.0.1'),
+            'CONTENT_LENGTH': _native(str(len(body))),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': _native(parts.scheme),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace('-', '_')
+            if key == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = _native(value)
+            elif key != 'CONTENT_LENGTH':
+                environ['HTTP_' + key] = _native(_decode(value))
+        environ.setdefault('HTTP_HOST', _native(parts.netloc))
+        return environ
+
+    def call_app(self, request):
+        body = request_body(request)
+        environ = self._environ(request, body)
+        response = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and response:
+                six.reraise(*exc_info)
+            response['status'] = status
+            response['headers'] = headers
+            return chunks.append
+
+        result = self.app(environ, start_response)
+        try:
+            for chunk in result:
+                chunks.append(chunk)
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+
+        if 'status' not in response:
+            raise HaasRestTestError(
+                'WSGI application {0!r} returned without calling '
+                'start_response'.format(self.target))
+        code, _, reason = response['status'].partition(' ')
+        headers = [(_decode(name), _decode(value))
+                   for name, value in response['headers']]
+        return int(code), reason, headers, b''.join(chunks)
+
+
+def create_app_adapter(target, interface=INTERFACE_AUTO):
+    """Load the application ``target`` and create the transport
+    adapter for its interface.
+
+    """
+    app = load_app(target)
+    if interface == INTERFACE_AUTO:
+        interface = INTERFACE_ASGI if is_asgi_app(app) else INTERFACE_WSGI
+    if interface == INTERFACE_ASGI:
+        if sys.version_info < (3, 5):
+            raise HaasRestTestError(
+                'ASGI applications require Python 3.5 or later')
+        from .asgi import ASGIAdapter
+        return ASGIAdapter(app, target)
+    return WSGIAdapter(app, target)
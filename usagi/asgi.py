@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Dispatch requests to an ASGI application in the test process.
+
+This module requires Python 3.5 or later.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+from http.client import responses
+from urllib.parse import unquote
+import asyncio
+import threading
+
+from .app_transport import AppAdapter, request_body, request_target
+from .exceptions import HaasRestTestError
+
+
+class ASGIAdapter(AppAdapter):
+    """Send requests to an ASGI 3 (single callable) application.
+
+    The application runs on an event loop in a background thread owned
+    by the adapter, so that it may be called from synchronous tests and
+    keeps any state bound to its loop between requests.  The lifespan
+    protocol is not used.
+
+    """
+
+    def __init__(self, app, target=None):
+        super(ASGIAdapter, self).__init__(app, target)
+        self._loop = None
+        self._thread = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='usagi-asgi')
+                self._thread.daemon = True
+                self._thread.start()
+        return self._loop
+
+    def _scope(self, request):
+        parts, port = request_target(request)
+        path = parts.path or '/'
+        headers = [
+            (name.lower().encode('latin-1'),
+             value.encode('latin-1') if not isinstance(value, bytes)
+             else value)
+            for name, value in request.headers.items()
+        ]
+        if 'host' not in request.headers:
+            headers.insert(0, (b'host', parts.netloc.encode('latin-1')))
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0', 'spec_version': '2.1'},
+            'http_version': '1.1',
+            'method': request.method,
+            'scheme': parts.scheme,
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'query_string': parts.query.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 0),
+            'server': (parts.hostname or 'localhost', port),
+        }
+
+    async def _call(self, scope, body):
+        response = {'headers': [], 'chunks': []}
+        complete = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {
+                    'type': 'http.request', 'body': body,
+                    'more_body': False,
+                }
+            await complete.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = message.get('headers', [])
+            elif message['type'] == 'http.response.body':
+                response['chunks'].append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    complete.set()
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception as exc:
+            if 'status' in response:
+                raise
+            raise HaasRestTestError(
+                'ASGI application {0!r} raised {1!r} before sending '
+                'http.response.start'.format(self.target, exc)) from exc
+        finally:
+            complete.set()
+        if 'status' not in response:
+            raise HaasRestTestError(
+                'ASGI application {0!r} returned without sending '
+                'http.response.start'.format(self.target))
+        return response
+
+    def call_app(self, request):
+        scope = self._scope(request)
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(scope, request_body(request)), self._get_loop())
+        response = future.result()
+        headers = [(name.decode('latin-1'), value.decode('latin-1'))
+                   for name, value in response['headers']]
+        status = response['status']
+        return (status, responses.get(status, ''), headers,
+                b''.join(response['chunks']))
+
+    def close(self):
+        with self._loop_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        super(ASGIAdapter, self).close()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Run usagi tests on an ``asyncio`` event loop.
+
+This module requires Python 3.5 or later, and is only imported by the
+``usagi-async`` runner.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+from timeit import default_timer
+import asyncio
+import logging
+import sys
+
+from haas.result import ResultCollector
+from haas.suite import TestSuite
+from haas.testing import unittest
+
+from .lazy_import import lazy_import
+from .response import BufferedResponse
+from .runner import CollectingResultHandler, replay_results
+from .utils import usagi_user_agent
+from .web_test import WebPoll
+from .yaml_test_loader import CASE_TESTS_ATTRIBUTE, TEST_INDEX_ATTRIBUTE
+
+aiohttp = lazy_import('aiohttp')
+
+logger = logging.getLogger(__name__)
+
+
+class AiohttpClient(object):
+    """Make the requests of one case with an ``aiohttp`` session.
+
+    """
+
+    def __init__(self, session):
+        super(AiohttpClient, self).__init__()
+        self._session = session
+
+    @property
+    def connection_errors(self):
+        return (aiohttp.ClientConnectionError,)
+
+    def _query_params(self, params):
+        # aiohttp only accepts string and integer values; format them
+        # as requests does, and drop parameters without a value.
+        return [
+            (name, value if isinstance(value, str) else str(value))
+            for name, value in params.items()
+            if value is not None
+        ]
+
+    def _headers(self, headers):
+        # Repeated headers are joined, as requests does.
+        joined = {}
+        for name, value in headers.items():
+            key = name.lower()
+            if key in joined:
+                joined[key] = (joined[key][0], joined[key][1] + ', ' + value)
+            else:
+                joined[key] = (name, value)
+        return list(joined.values())
+
+    def _form_data(self, files):
+        form = aiohttp.FormData()
+        for name, value in files.items():
+            if isinstance(value, tuple):
+                filename, fh, content_type = value
+                form.add_field(name, fh.read(), content_type=content_type)
+            else:
+                form.add_field(name, value)
+        return form
+
+    async def request(self, method, url, headers=None, params=None,
+                      data=None, files=None):
+        if files is not None:
+            data = self._form_data(files)
+        if params is not None:
+            params = self._query_params(params)
+        async with self._session.request(
+                method, url, headers=headers, params=params,
+                data=data) as response:
+            content = await response.read()
+            return BufferedResponse(
+                response.status, self._headers(response.headers), content,
+                url=str(response.url), reason=response.reason)
+
+
+class AiohttpTransport(object):
+    """Create :class:`~.AiohttpClient` instances that share one pool of
+    connections.
+
+    Each case gets its own ``aiohttp.ClientSession``, and so its own
+    cookies, while all sessions share a single connector.
+
+    Parameters
+    ----------
+    concurrency : int
+        The maximum number of open connections.
+
+    """
+
+    def __init__(self, concurrency):
+        super(AiohttpTransport, self).__init__()
+        self.concurrency = concurrency
+        self._connector = None
+
+    async def __aenter__(self):
+        self._connector = aiohttp.TCPConnector(limit=self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._connector.close()
+        self._connector = None
+
+    def client(self):
+        """An async context manager providing the client for one case.
+
+        """
+        return _AiohttpClientContext(self._connector)
+
+
+class _AiohttpClientContext(object):
+
+    def __init__(self, connector):
+        super(_AiohttpClientContext, self).__init__()
+        self._connector = connector
+        self._session = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=self._connector, connector_owner=False,
+            headers={'User-Agent': usagi_user_agent()})
+        return AiohttpClient(self._session)
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+
+async def run_web_test(web_test, case, client):
+    """Asynchronous counterpart of :meth:`WebTest.run()
+    <usagi.web_test.WebTest.run>`.
+
+    """
+    web_test.response_size = None
+    url = web_test.prepare(case)
+
+    with web_test.test_parameters() as test_parameters:
+        try:
+            response = await client.request(url=url, **test_parameters)
+        except client.connection_errors as exc:
+            case.fail('{0!r}: Unable to connect: {1!r}'.format(
+                url, str(exc)))
+
+    web_test.response_size = len(response.content)
+    web_test.check_response(case, url, response)
+
+
+async def run_web_poll(web_poll, case, client):
+    """Asynchronous counterpart of :meth:`WebPoll.run()
+    <usagi.web_test.WebPoll.run>`.
+
+    """
+    start_time = default_timer()
+    while True:
+        try:
+            await run_web_test(web_poll, case, client)
+        except case.failureException:
+            duration = default_timer() - start_time
+            if duration >= web_poll.timeout:
+                raise
+            await asyncio.sleep(web_poll.period)
+        else:
+            return
+
+
+def run(web_test, case, client):
+    if isinstance(web_test, WebPoll):
+        return run_web_poll(web_test, case, client)
+    return run_web_test(web_test, case, client)
+
+
+async def _run_test(collector, test, client):
+    method = getattr(test, test._testMethodName)
+    case_tests = getattr(test, CASE_TESTS_ATTRIBUTE)
+    web_test = case_tests[getattr(method, TEST_INDEX_ATTRIBUTE)]
+    collector.startTest(test)
+    try:
+        try:
+            await run(web_test, test, client)
+        finally:
+            case_tests.response_sizes[test._testMethodName] = \
+                web_test.response_size
+    except test.failureException:
+        collector.addFailure(test, sys.exc_info())
+    except unittest.SkipTest as exc:
+        collector.addSkip(test, str(exc))
+    except Exception:
+        collector.addError(test, sys.exc_info())
+    else:
+        collector.addSuccess(test)
+    finally:
+        collector.stopTest(test)
+
+
+def _is_web_test_unit(tests):
+    # Cases testing an in-process application or a Unix socket, or
+    # overriding host resolution, are run with their synchronous
+    # transport.
+    def is_tcp(config):
+        return (config.app is None and config.socket is None and
+                not config.resolve)
+    return all(
+        hasattr(test, CASE_TESTS_ATTRIBUTE) and
+        is_tcp(getattr(test, CASE_TESTS_ATTRIBUTE).config)
+        for test in tests
+    )
+
+
+async def run_unit(tests, transport, semaphore, failfast):
+    """Run the tests of one case, in order, and return their results.
+
+    """
+    handler = CollectingResultHandler()
+    collector = ResultCollector(buffer=False, failfast=failfast)
+    collector.add_result_handler(handler)
+    async with semaphore:
+        if not _is_web_test_unit(tests):
+            # Not a network usagi case; run it synchronously in a
+            # thread, so that it does not block the other cases.
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, TestSuite(tests), collector)
+            return handler.results
+        async with transport.client() as client:
+            for test in tests:
+                if collector.shouldStop:
+                    break
+                await _run_test(collector, test, client)
+    return handler.results
+
+
+async def run_units(result_collector, units, transport, concurrency):
+    """Run all ``units`` concurrently, reporting their results to
+    ``result_collector`` in order.
+
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    async with transport:
+        tasks = [
+            asyncio.ensure_future(run_unit(
+                tests, transport, semaphore, result_collector.failfast))
+            for tests in units
+        ]
+        try:
+            for task in tasks:
+                replay_results(result_collector, await task)
+                if result_collector.shouldStop:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
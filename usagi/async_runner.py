@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import sys
+
+from haas.plugins.runner import BaseTestRunner
+
+from .exceptions import HaasRestTestError
+from .runner import group_test_cases
+
+DEFAULT_CONCURRENCY = 100
+
+
+class AsyncCaseRunner(BaseTestRunner):
+    """A ``haas`` test runner that runs cases concurrently on an
+    ``asyncio`` event loop, making requests with ``aiohttp``.
+
+    As with :class:`~usagi.runner.ThreadedCaseRunner`, the tests of a
+    case run serially and results are reported in suite order.  Each
+    in-flight case costs a coroutine rather than a thread, so many
+    more cases can wait on slow or long-polling endpoints at once.
+
+    Requires Python 3.5 and the ``aiohttp`` package.
+
+    Parameters
+    ----------
+    concurrency : int
+        The maximum number of cases in flight at the same time.
+    transport_factory : callable
+        Called with ``concurrency`` to create the transport used to
+        make requests.  Defaults to
+        :class:`usagi.async_engine.AiohttpTransport`.
+    warnings : str
+        The warnings filter action used while running tests.
+
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY,
+                 transport_factory=None, warnings=None):
+        super(AsyncCaseRunner, self).__init__(warnings=warnings)
+        self.concurrency = concurrency
+        self.transport_factory = transport_factory
+
+    @classmethod
+    def from_args(cls, args, arg_prefix):
+        return cls(
+            concurrency=getattr(args, arg_prefix + 'usagi_concurrency'),
+            warnings=args.warnings,
+        )
+
+    @classmethod
+    def add_parser_arguments(cls, parser, option_prefix, dest_prefix):
+        try:
+            parser.add_argument(
+                '{0}usagi-concurrency'.format(option_prefix),
+                dest='{0}usagi_concurrency'.format(dest_prefix),
+                type=int, default=DEFAULT_CONCURRENCY,
+                help=('Maximum number of cases in flight at the same time '
+                      'with the usagi-async runner (default {0})'.format(
+                          DEFAULT_CONCURRENCY)))
+        except argparse.ArgumentError:
+            # The runner may be registered under more than one name.
+            pass
+
+    def _run_tests(self, result_collector, suite):
+        if sys.version_info < (3, 5):
+            raise HaasRestTestError(
+                'The usagi-async runner requires Python 3.5 or later')
+        import asyncio
+        from . import async_engine
+
+        transport_factory = self.transport_factory
+        if transport_factory is None:
+            transport_factory = async_engine.AiohttpTransport
+        transport = transport_factory(self.concurrency)
+
+        units = group_test_cases(suite)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(async_engine.run_units(
+                result_collector, units, transport, self.concurrency))
+        finally:
+            loop.close()
+
+    def run(self, result_collector, test_to_run):
+        """Run the cases of the suite on an event loop.
+
+        """
+        def test(result):
+            self._run_tests(result_collector, test_to_run)
+        return super(AsyncCaseRunner, self).run(result_collector, test)
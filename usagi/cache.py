@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+
+from six.moves import cPickle as pickle
+
+import usagi
+from . import yaml_backend
+from .schema import get_validator_backend
+
+logger = logging.getLogger(__name__)
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def environment_key(plugin_specs):
+    """Create a key identifying the code that parsed a cached file.
+
+    Parameters
+    ----------
+    plugin_specs : dict
+        Mapping of plugin name to a description of the plugin,
+        including its version (see
+        :meth:`usagi.registry.PluginRegistry.specs`).
+
+    """
+    parts = [
+        'usagi={0}'.format(usagi.__version__),
+        'python={0}'.format(sys.version),
+        'yaml={0}'.format(yaml_backend.BACKEND),
+    ]
+    for name, spec in sorted(plugin_specs.items()):
+        parts.append('{0}={1}'.format(name, spec))
+    digest = hashlib.sha256('\n'.join(parts).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ParsedFileCache(object):
+    """A persistent cache of parsed and schema-validated test files.
+
+    Each test file is cached in its own entry, keyed by the absolute
+    path of the file.  An entry is used only if the SHA256 of the file
+    contents is unchanged; the modification time is not trusted, as a
+    file may be rewritten within its resolution.  Entries created with
+    different versions of usagi, Python or the installed plugins, or
+    with another schema validator backend, are ignored.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory in which cache entries are stored.
+    environment_key : str
+        Key identifying the code used to parse the files (see
+        :func:`~.environment_key`).
+
+    """
+
+    # Cache entries are never shared between unrelated users, so the
+    # speed of pickle is preferred over a safer format.
+    protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, cache_dir, environment_key):
+        super(ParsedFileCache, self).__init__()
+        self.cache_dir = cache_dir
+        self.environment_key = environment_key
+
+    def _entry_path(self, filename):
+        path = os.path.abspath(filename)
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, '{0}.pickle'.format(digest))
+
+    def _read_entry(self, entry_path, filename):
+        try:
+            with open(entry_path, 'rb') as fh:
+                entry = pickle.load(fh)
+        except (IOError, OSError):
+            return None
+        except Exception:
+            logger.debug('Ignoring corrupt cache entry %r', entry_path,
+                         exc_info=True)
+            return None
+        if entry.get('environment') != self.environment_key or \
+                entry.get('validator') != get_validator_backend() or \
+                entry.get('path') != os.path.abspath(filename):
+            return None
+        return entry
+
+    def _write_entry(self, entry_path, entry):
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            fd, temp_path = tempfile.mkstemp(
+                dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                pickle.dump(entry, fh, self.protocol)
+            _replace(temp_path, entry_path)
+        except (IOError, OSError):
+            logger.warning('Unable to write cache entry %r', entry_path,
+                           exc_info=True)
+
+    def load(self, filename, parse):
+        """Load the parsed test structure of ``filename``, parsing the
+        file if there is no valid cache entry.
+
+        Parameters
+        ----------
+        filename : str
+            The path of the test file.
+        parse : callable
+            Called with the contents of the file as ``bytes`` on a cache
+            miss.  This must return the tuple ``(test_structure,
+            error)`` to be cached.
+
+        """
+        entry_path = self._entry_path(filename)
+        with open(filename, 'rb') as fh:
+            data = fh.read()
+        digest = hashlib.sha256(data).hexdigest()
+        entry = self._read_entry(entry_path, filename)
+        if entry is not None and entry['digest'] == digest:
+            logger.debug('Cache hit for %r', filename)
+            return entry['test_structure'], entry['error']
+
+        logger.debug('Cache miss for %r', filename)
+        result = parse(data)
+        test_structure, error = result
+        entry = {
+            'environment': self.environment_key,
+            'validator': get_validator_backend(),
+            'path': os.path.abspath(filename),
+            'digest': digest,
+            'test_structure': test_structure,
+            'error': error,
+        }
+        self._write_entry(entry_path, entry)
+        return result
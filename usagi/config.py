@@ -6,6 +6,7 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from __future__ import absolute_import, unicode_literals
 
+from .sessions import DEFAULT_TRANSPORT, AppConfig, ConnectionConfig
 from .var_loader import VarLoader
 
 
@@ -15,27 +16,65 @@ class Config(object):
     This contains all of the top-level configuration, such as the target
     host and variables to be used in test cases.
 
+    If ``socket`` is given, requests are sent over that Unix domain
+    socket.  If ``app`` is given, requests are sent to the application
+    in the test process.  In both cases ``host`` defaults to
+    ``localhost``.
+
     """
 
-    def __init__(self, scheme, host, variables, var_loader, test_filename):
+    def __init__(self, scheme, host, variables, var_loader, test_filename,
+                 connection=None, app=None, transport=DEFAULT_TRANSPORT,
+                 socket=None, resolve=None):
         super(Config, self).__init__()
+        if connection is None:
+            connection = ConnectionConfig()
+        if host is None and (app is not None or socket is not None):
+            host = 'localhost'
         self.var_loader = var_loader
         self.scheme = scheme
+        self.connection = connection
+        self.app = app
+        self.transport = transport
         self.variables = variables
         self.host = self.load_variable('host', host)
+        if socket is not None:
+            socket = self.load_variable('socket', socket)
+        self.socket = socket
+        self.resolve = dict(resolve or {})
         self.test_filename = test_filename
 
     @classmethod
     def from_dict(cls, config, test_filename):
         var_loader = VarLoader(test_filename)
         variables = var_loader.load_variables(config.get('vars', {}))
+        app = config.get('app')
+        if app is not None:
+            app = AppConfig.from_dict(app)
         return cls(
             scheme=config.get('scheme', 'http'),
-            host=config['host'],
+            host=config.get('host'),
             variables=variables,
             var_loader=var_loader,
             test_filename=test_filename,
+            connection=ConnectionConfig.from_dict(
+                config.get('connection', {})),
+            app=app,
+            transport=config.get('transport', DEFAULT_TRANSPORT),
+            socket=config.get('socket'),
+            resolve=config.get('resolve'),
         )
 
+    def __getstate__(self):
+        # Plugin classes are not pickled; the variable loader is
+        # recreated from the registry of the unpickling process.
+        state = self.__dict__.copy()
+        del state['var_loader']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.var_loader = VarLoader(self.test_filename)
+
     def load_variable(self, name, var):
         return self.var_loader.load_variable(name, var, self.variables)
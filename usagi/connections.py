@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""``urllib3`` connection pools, and the ``requests`` adapter using
+them, that resolve host names with a :class:`usagi.dns.Resolver`.
+
+The connection is made to the resolved address, while the ``Host``
+header and TLS server name keep the original host name.  HTTPS
+connections use the process-wide TLS contexts of
+:func:`usagi.tls.get_tls_cache`, and so resume TLS sessions.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.poolmanager import SSL_KEYWORDS, PoolManager
+
+from .tls import get_tls_cache
+
+_TLS_FILE_ATTRIBUTES = (
+    'ca_certs', 'ca_cert_dir', 'ca_cert_data', 'cert_file', 'key_file',
+    'key_password',
+)
+
+
+class _ResolvingConnectionMixin(object):
+
+    def __init__(self, *args, **kwargs):
+        self.resolver = kwargs.pop('resolver')
+        super(_ResolvingConnectionMixin, self).__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        # urllib3 connects to _dns_host, which is also the value of
+        # host, used for the Host header and certificate verification,
+        # so it is only replaced while the socket is created.  Like
+        # urllib3's create_connection, each address is tried in turn
+        # until one accepts the connection.
+        dns_host = self._dns_host
+        error = None
+        try:
+            for address in self.resolver.resolve(self.host, self.port):
+                self._dns_host = address
+                try:
+                    return super(_ResolvingConnectionMixin, self)._new_conn()
+                except (ConnectTimeoutError, NewConnectionError) as exc:
+                    error = exc
+        finally:
+            self._dns_host = dns_host
+        raise error
+
+
+class _SharedTlsContextMixin(object):
+
+    def connect(self):
+        if self.ssl_context is not None or self.assert_fingerprint:
+            return super(_SharedTlsContextMixin, self).connect()
+        files = dict(
+            (name, getattr(self, name)) for name in _TLS_FILE_ATTRIBUTES)
+        # The shared context already holds the certificates, so urllib3
+        # must not load them into it again.
+        self.ssl_context = get_tls_cache().get_context(
+            cert_reqs=self.cert_reqs, **files)
+        for name in files:
+            setattr(self, name, None)
+        try:
+            return super(_SharedTlsContextMixin, self).connect()
+        finally:
+            self.ssl_context = None
+            for name, value in files.items():
+                setattr(self, name, value)
+
+
+class ResolvingHTTPConnection(_ResolvingConnectionMixin, HTTPConnection):
+    pass
+
+
+class ResolvingHTTPSConnection(_ResolvingConnectionMixin,
+                               _SharedTlsContextMixin, HTTPSConnection):
+    pass
+
+
+class ResolvingHTTPConnectionPool(HTTPConnectionPool):
+
+    ConnectionCls = ResolvingHTTPConnection
+
+
+class ResolvingHTTPSConnectionPool(HTTPSConnectionPool):
+
+    ConnectionCls = ResolvingHTTPSConnection
+
+
+class ResolvingPoolManager(PoolManager):
+    """A ``urllib3.PoolManager`` whose connections resolve host names
+    with ``resolver``.
+
+    Parameters
+    ----------
+    resolver : usagi.dns.Resolver
+        The resolver used by all connections.
+
+    """
+
+    pool_classes = {
+        'http': ResolvingHTTPConnectionPool,
+        'https': ResolvingHTTPSConnectionPool,
+    }
+
+    def __init__(self, resolver, *args, **kwargs):
+        super(ResolvingPoolManager, self).__init__(*args, **kwargs)
+        self.resolver = resolver
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if request_context is None:
+            request_context = self.connection_pool_kw.copy()
+        kwargs = dict(
+            (key, value) for key, value in request_context.items()
+            if key not in ('scheme', 'host', 'port'))
+        if scheme == 'http':
+            for key in SSL_KEYWORDS:
+                kwargs.pop(key, None)
+        return self.pool_classes[scheme](
+            host, port, resolver=self.resolver, **kwargs)
+
+
+class ResolvingAdapter(HTTPAdapter):
+    """A ``requests`` transport adapter whose connections resolve host
+    names with ``resolver``.
+
+    Parameters
+    ----------
+    resolver : usagi.dns.Resolver
+        The resolver used by all connections.
+
+    """
+
+    def __init__(self, resolver, **kwargs):
+        self.resolver = resolver
+        super(ResolvingAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = ResolvingPoolManager(
+            self.resolver, num_pools=connections, maxsize=maxsize,
+            block=block, **pool_kwargs)
@@ -6,13 +6,27 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from __future__ import absolute_import, unicode_literals
 
+from functools import partial
+import argparse
 import logging
+import multiprocessing
 import os
 
-from haas.plugins.discoverer import match_path
 from haas.plugins.i_discoverer_plugin import IDiscovererPlugin
 
-from .yaml_test_loader import YamlTestLoader
+from .dns import DEFAULT_TTL, get_dns_cache
+from .file_finder import TestFileFinder
+from .lazy_import import lazy_import
+from .prewarm import PrewarmingSuite
+from .runner import group_test_cases
+from .schema import (
+    VALIDATOR_BACKEND_FASTJSONSCHEMA, VALIDATOR_BACKEND_JSONSCHEMA,
+    get_validator_backend, set_validator_backend)
+from .selection import TestSelector
+from .sharding import Shard, load_durations, parse_shard
+from .yaml_test_loader import YamlTestLoader, parse_test_file
+
+history = lazy_import('usagi.history')
 
 logger = logging.getLogger(__name__)
 
@@ -25,13 +39,81 @@ class RestTestDiscoverer(IDiscovererPlugin):
     ----------
     loader : haas.loader.Loader
         The ``haas`` test loader.
+    jobs : int
+        The number of worker processes used to parse and validate test
+        files during directory discovery.  ``1`` parses all files in
+        the current process; ``0`` uses one process per CPU.
+    cache_dir : str
+        Optional directory in which to cache parsed and validated test
+        files between runs.
+    schema_backend : str
+        The backend used to validate test files and plugin
+        configuration (see :func:`usagi.schema.set_validator_backend`).
+    case_patterns : list
+        Glob patterns selecting the cases to run by name.
+    test_patterns : list
+        Glob patterns selecting the tests to run by name.
+    tags : list
+        Select only tests tagged, or in a case tagged, with any of
+        these tags.
+    patterns : list
+        Glob patterns matched against file names to find test files
+        (default ``test*.yml``).
+    include : list
+        Glob patterns; if given, only test files whose path relative to
+        the start directory matches one of them are loaded.
+    exclude : list
+        Glob patterns of files and directories to skip.  Excluded
+        directories are not walked.
+    dns_ttl : float
+        The number of seconds for which host name lookups are cached.
+    prewarm : int
+        The number of connections opened to each distinct host of the
+        discovered suite before its first test runs.
+    shard : tuple
+        Optional zero-based ``(index, count)`` of the shard of the
+        cases to load (see :mod:`usagi.sharding`).
+    shard_durations : list
+        Optional paths of JSON files of recorded case durations, written
+        by ``--with-usagi-durations``, or history databases.  If given,
+        shards are balanced by duration instead of assigned by hash.
+    order : str
+        The order in which to run cases: ``'suite'`` (the default), or
+        ``'longest'`` or ``'failed'`` to run the longest or most
+        recently failed cases first, from the history in ``history``.
+    history : str
+        The path of the :class:`usagi.history.HistoryStore` database
+        written by ``--with-usagi-history``.  Defaults to
+        :data:`usagi.history.DEFAULT_HISTORY_PATH`.
 
     """
 
-    def __init__(self, loader, **kwargs):
+    def __init__(self, loader, jobs=1, cache_dir=None,
+                 schema_backend=VALIDATOR_BACKEND_JSONSCHEMA,
+                 case_patterns=None, test_patterns=None, tags=None,
+                 patterns=None, include=None, exclude=None,
+                 dns_ttl=DEFAULT_TTL, prewarm=0, shard=None,
+                 shard_durations=None, order=None, history=None,
+                 **kwargs):
         super(RestTestDiscoverer, self).__init__(**kwargs)
         self._loader = loader
-        self._yaml_loader = YamlTestLoader(loader)
+        self._schema_backend = schema_backend
+        self._dns_ttl = dns_ttl
+        if shard is not None:
+            durations = None
+            if shard_durations is not None:
+                durations = load_durations(shard_durations)
+            shard = Shard(shard[0], shard[1], durations)
+        self._shard = shard
+        selector = TestSelector(case_patterns, test_patterns, tags, shard)
+        self._yaml_loader = YamlTestLoader(
+            loader, cache_dir=cache_dir, selector=selector)
+        self._file_finder = TestFileFinder(
+            patterns=patterns, include=include, exclude=exclude)
+        self._jobs = jobs
+        self._prewarm = prewarm
+        self._order = order
+        self._history = history
 
     @classmethod
     def from_args(cls, args, arg_prefix, loader):
@@ -47,7 +129,25 @@ class RestTestDiscoverer(IDiscovererPlugin):
             The test loader used to construct TestCase and TestSuite instances.
 
         """
-        return cls(loader)
+        return cls(
+            loader,
+            jobs=getattr(args, arg_prefix + 'usagi_jobs'),
+            cache_dir=getattr(args, arg_prefix + 'usagi_cache_dir'),
+            schema_backend=getattr(args, arg_prefix + 'usagi_schema_backend'),
+            case_patterns=getattr(args, arg_prefix + 'usagi_case'),
+            test_patterns=getattr(args, arg_prefix + 'usagi_test'),
+            tags=getattr(args, arg_prefix + 'usagi_tag'),
+            patterns=getattr(args, arg_prefix + 'usagi_pattern'),
+            include=getattr(args, arg_prefix + 'usagi_include'),
+            exclude=getattr(args, arg_prefix + 'usagi_exclude'),
+            dns_ttl=getattr(args, arg_prefix + 'usagi_dns_ttl'),
+            prewarm=getattr(args, arg_prefix + 'usagi_prewarm'),
+            shard=getattr(args, arg_prefix + 'usagi_shard'),
+            shard_durations=getattr(
+                args, arg_prefix + 'usagi_shard_durations'),
+            order=getattr(args, arg_prefix + 'usagi_order'),
+            history=getattr(args, arg_prefix + 'usagi_history'),
+        )
 
     @classmethod
     def add_parser_arguments(cls, parser, option_prefix, dest_prefix):
@@ -64,6 +164,115 @@ class RestTestDiscoverer(IDiscovererPlugin):
             plugin should use.
 
         """
+        group = parser.add_argument_group('usagi')
+        try:
+            group.add_argument(
+                '{0}usagi-jobs'.format(option_prefix),
+                dest='{0}usagi_jobs'.format(dest_prefix),
+                type=int, default=1,
+                help=('Number of processes used to parse and validate YAML '
+                      'test files.  0 uses one process per CPU '
+                      '(default 1)'))
+            group.add_argument(
+                '{0}usagi-cache-dir'.format(option_prefix),
+                dest='{0}usagi_cache_dir'.format(dest_prefix),
+                default=None,
+                help=('Directory in which to cache parsed and validated '
+                      'YAML test files between runs (default: no cache)'))
+            group.add_argument(
+                '{0}usagi-schema-backend'.format(option_prefix),
+                dest='{0}usagi_schema_backend'.format(dest_prefix),
+                default=VALIDATOR_BACKEND_JSONSCHEMA,
+                choices=[VALIDATOR_BACKEND_JSONSCHEMA,
+                         VALIDATOR_BACKEND_FASTJSONSCHEMA],
+                help=('Library used to validate test files; fastjsonschema '
+                      'must be installed separately (default jsonschema)'))
+            group.add_argument(
+                '{0}usagi-case'.format(option_prefix),
+                dest='{0}usagi_case'.format(dest_prefix),
+                action='append', default=None, metavar='PATTERN',
+                help=('Only run cases with a name matching the glob '
+                      'PATTERN.  May be given more than once'))
+            group.add_argument(
+                '{0}usagi-test'.format(option_prefix),
+                dest='{0}usagi_test'.format(dest_prefix),
+                action='append', default=None, metavar='PATTERN',
+                help=('Only run tests with a name matching the glob '
+                      'PATTERN.  May be given more than once'))
+            group.add_argument(
+                '{0}usagi-tag'.format(option_prefix),
+                dest='{0}usagi_tag'.format(dest_prefix),
+                action='append', default=None, metavar='TAG',
+                help=('Only run tests tagged, or in a case tagged, with '
+                      'TAG.  May be given more than once'))
+            group.add_argument(
+                '{0}usagi-pattern'.format(option_prefix),
+                dest='{0}usagi_pattern'.format(dest_prefix),
+                action='append', default=None, metavar='PATTERN',
+                help=('Glob pattern matching the names of YAML test '
+                      'files.  May be given more than once '
+                      '(default test*.yml)'))
+            group.add_argument(
+                '{0}usagi-include'.format(option_prefix),
+                dest='{0}usagi_include'.format(dest_prefix),
+                action='append', default=None, metavar='PATTERN',
+                help=('Only load test files whose path relative to the '
+                      'start directory matches the glob PATTERN.  May be '
+                      'given more than once'))
+            group.add_argument(
+                '{0}usagi-exclude'.format(option_prefix),
+                dest='{0}usagi_exclude'.format(dest_prefix),
+                action='append', default=None, metavar='PATTERN',
+                help=('Skip files and directories whose name or relative '
+                      'path matches the glob PATTERN.  Patterns may also '
+                      'be listed in a .usagiignore file.  May be given '
+                      'more than once'))
+            group.add_argument(
+                '{0}usagi-dns-ttl'.format(option_prefix),
+                dest='{0}usagi_dns_ttl'.format(dest_prefix),
+                type=float, default=DEFAULT_TTL, metavar='SECONDS',
+                help=('Time for which host name lookups are cached.  0 '
+                      'disables the cache (default {0})'.format(
+                          DEFAULT_TTL)))
+            group.add_argument(
+                '{0}usagi-prewarm'.format(option_prefix),
+                dest='{0}usagi_prewarm'.format(dest_prefix),
+                type=int, default=0, metavar='N',
+                help=('Open N pooled connections to each host of the '
+                      'discovered tests before they run (default 0)'))
+            group.add_argument(
+                '{0}usagi-shard'.format(option_prefix),
+                dest='{0}usagi_shard'.format(dest_prefix),
+                type=parse_shard, default=None, metavar='I/N',
+                help=('Only load the cases of shard I of N (1 <= I <= N), '
+                      'assigned by a hash of their file and name'))
+            group.add_argument(
+                '{0}usagi-shard-durations'.format(option_prefix),
+                dest='{0}usagi_shard_durations'.format(dest_prefix),
+                action='append', default=None, metavar='FILE',
+                help=('Balance shards by the case durations recorded in '
+                      'FILE with --with-usagi-durations or '
+                      '--with-usagi-history.  May be given more than once'))
+            group.add_argument(
+                '{0}usagi-order'.format(option_prefix),
+                dest='{0}usagi_order'.format(dest_prefix),
+                choices=[history.ORDER_SUITE, history.ORDER_LONGEST,
+                         history.ORDER_FAILED],
+                default=history.ORDER_SUITE,
+                help=('Run cases in suite order, the longest first, or '
+                      'the most recently failed first, from the test '
+                      'history (default suite)'))
+            group.add_argument(
+                '{0}usagi-history'.format(option_prefix),
+                dest='{0}usagi_history'.format(dest_prefix),
+                default=history.DEFAULT_HISTORY_PATH, metavar='FILE',
+                help=('Test history written with --with-usagi-history, '
+                      'used by --discovery-usagi-order (default '
+                      '{0})'.format(history.DEFAULT_HISTORY_PATH)))
+        except argparse.ArgumentError:
+            # The discoverer is registered under more than one name, so
+            # the options may already have been added.
+            pass
 
     def discover(self, start, top_level_directory=None, pattern=None):
         """Discover YAML-formatted Web API tests.
@@ -78,13 +287,37 @@ class RestTestDiscoverer(IDiscovererPlugin):
             Ignored; for API compatibility with haas.
 
         """
+        # The validator backend and DNS cache are process-wide, so they
+        # are only configured when this discoverer is used.
+        set_validator_backend(self._schema_backend)
+        get_dns_cache().ttl = self._dns_ttl
         if os.path.isdir(start):
             start_directory = start
-            return self._discover_by_directory(start_directory)
+            suite = self._discover_by_directory(start_directory)
         elif os.path.isfile(start):
             start_filepath = start
-            return self._discover_by_file(start_filepath)
-        return self._loader.create_suite()
+            suite = self._discover_by_file(start_filepath)
+        else:
+            return self._loader.create_suite()
+        if self._order not in (None, history.ORDER_SUITE):
+            suite = self._order_suite(suite)
+        if self._prewarm > 0:
+            suite = PrewarmingSuite([suite], self._prewarm)
+        return suite
+
+    def _order_suite(self, suite):
+        path = self._history
+        if path is None:
+            path = history.DEFAULT_HISTORY_PATH
+        if not os.path.exists(path):
+            logger.warning('No test history in %r, running cases in '
+                           'suite order', path)
+            return suite
+        with history.HistoryStore(path) as store:
+            units = history.order_units(
+                group_test_cases(suite), self._order, store)
+        return self._loader.create_suite(
+            [self._loader.create_suite(tests) for tests in units])
 
     def _discover_by_directory(self, start_directory):
         """Run test discovery in a directory.
@@ -112,21 +345,85 @@ class RestTestDiscoverer(IDiscovererPlugin):
         logger.debug('Discovering tests in file: start_filepath=%r',
                      start_filepath)
 
+        if self._balances_shards:
+            tests = self._discover_tests_balanced([start_filepath])
+            return self._loader.create_suite(list(tests))
         tests = self._load_from_file(start_filepath)
         return self._loader.create_suite(list(tests))
 
+    @property
+    def _balances_shards(self):
+        return self._shard is not None and self._shard.balanced
+
     def _load_from_file(self, filepath):
         logger.debug('Loading tests from %r', filepath)
         tests = self._yaml_loader.load_tests_from_file(filepath)
         return self._loader.create_suite(tests)
 
+    def _load_from_parsed_file(self, filepath, test_structure, error):
+        logger.debug('Loading parsed tests from %r', filepath)
+        tests = self._yaml_loader.load_tests_from_parsed_file(
+            test_structure, filepath, error)
+        return self._loader.create_suite(tests)
+
     def _discover_tests(self, start_directory):
-        pattern = 'test*.yml'
-        for curdir, dirnames, filenames in os.walk(start_directory):
-            logger.debug('Discovering tests in %r', curdir)
-            for filename in filenames:
-                filepath = os.path.join(curdir, filename)
-                if not match_path(filename, filepath, pattern):
-                    logger.debug('Skipping %r', filepath)
-                    continue
+        filepaths = self._file_finder.find(start_directory)
+        if self._balances_shards:
+            for suite in self._discover_tests_balanced(list(filepaths)):
+                yield suite
+        elif self._jobs == 1:
+            for filepath in filepaths:
                 yield self._load_from_file(filepath)
+        else:
+            for suite in self._discover_tests_parallel(list(filepaths)):
+                yield suite
+
+    def _discover_tests_parallel(self, filepaths):
+        """Parse and validate test files in a pool of worker processes.
+
+        Test suites are constructed in the current process, in the
+        order in which the files were found, so that the resulting
+        suite is identical to that produced by serial discovery.
+
+        """
+        for filepath, (test_structure, error) in self._parse_files_parallel(
+                filepaths):
+            yield self._load_from_parsed_file(
+                filepath, test_structure, error)
+
+    def _parse_files_parallel(self, filepaths):
+        processes = self._jobs or multiprocessing.cpu_count()
+        chunksize = max(1, len(filepaths) // (processes * 4))
+        pool = multiprocessing.Pool(
+            processes=processes, initializer=set_validator_backend,
+            initargs=(get_validator_backend(),))
+        try:
+            parse = partial(parse_test_file, cache=self._yaml_loader.cache)
+            parsed_files = pool.imap(parse, filepaths, chunksize=chunksize)
+            for filepath, parsed in zip(filepaths, parsed_files):
+                yield filepath, parsed
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _discover_tests_balanced(self, filepaths):
+        """Parse all test files, assign their cases to shards by duration
+        and only then construct the cases of this shard.
+
+        """
+        if self._jobs == 1:
+            cache = self._yaml_loader.cache
+            parsed_files = [
+                (filepath, parse_test_file(filepath, cache))
+                for filepath in filepaths
+            ]
+        else:
+            parsed_files = list(self._parse_files_parallel(filepaths))
+        keys = []
+        for filepath, (test_structure, error) in parsed_files:
+            keys.extend(self._yaml_loader.case_keys(
+                test_structure, filepath, error))
+        self._shard.balance(keys)
+        for filepath, (test_structure, error) in parsed_files:
+            yield self._load_from_parsed_file(
+                filepath, test_structure, error)
@@ -0,0 +1,539 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Run the cases of a suite on workers that connect to a coordinator.
+
+The coordinator discovers the suite, and serves its cases as work units
+over a TCP or Unix domain socket.  Workers, on the same host or on
+other machines, pull units one at a time, run them and send the results
+back.  Messages are JSON objects, one per line::
+
+    worker       {"type": "next"}
+    coordinator  {"type": "unit", "id": 3, "jobs": [...],
+                  "buffer": false, "failfast": false}
+    worker       {"type": "result", "id": 3, "results": [[...]],
+                  "dns": {...}, "tls": {...}}
+    ...
+    worker       {"type": "next"}
+    coordinator  {"type": "done"}
+
+A unit taken by a worker that disconnects before sending its results is
+served again to the next worker asking for one.  There is no
+authentication, so a coordinator must only listen on trusted networks.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+from collections import deque
+from datetime import datetime, timedelta
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+from six.moves import socketserver
+
+from haas.plugins.runner import BaseTestRunner
+from haas.result import TestCompletionStatus, TestDuration
+from haas.suite import TestSuite
+
+from .dns import DnsStats, get_dns_cache
+from .exceptions import HaasRestTestError
+from .lazy_import import lazy_import
+from .process_runner import (
+    GROUP_CASE, GROUP_FILE, CaseJob, _initialize_worker, default_start_method,
+    get_context, group_jobs, replay_job_results, run_jobs)
+from .runner import group_test_cases
+
+tls = lazy_import('usagi.tls')
+
+logger = logging.getLogger(__name__)
+
+UNIX_PREFIX = 'unix:'
+
+DEFAULT_LISTEN = 'localhost:0'
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_address(address):
+    """Parse a coordinator address, ``'host:port'`` or
+    ``'unix:/path/to/socket'``.
+
+    Returns
+    -------
+    family : int
+        ``socket.AF_INET`` or ``socket.AF_UNIX``.
+    address : tuple or str
+        A ``(host, port)`` tuple, or the path of the socket.
+
+    """
+    if address.startswith(UNIX_PREFIX):
+        path = address[len(UNIX_PREFIX):]
+        if not path:
+            raise ValueError('Missing socket path in {0!r}'.format(address))
+        return socket.AF_UNIX, path
+    host, separator, port = address.rpartition(':')
+    if not separator or not port.isdigit():
+        raise ValueError(
+            'Invalid address {0!r}, expected host:port or '
+            'unix:/path'.format(address))
+    return socket.AF_INET, (host or 'localhost', int(port))
+
+
+def format_address(family, address):
+    """The inverse of :func:`parse_address`.
+
+    """
+    if family == socket.AF_UNIX:
+        return '{0}{1}'.format(UNIX_PREFIX, address)
+    return '{0}:{1}'.format(*address[:2])
+
+
+def send_message(stream, message):
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+def receive_message(stream):
+    """Read the next message from ``stream``, or return ``None`` if the
+    other end has closed the connection.
+
+    """
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+def _timestamp(value):
+    return (value - _EPOCH).total_seconds()
+
+
+def results_to_list(results):
+    """Serialize the results returned by :func:`usagi.process_runner.run_jobs`
+    to JSON types.
+
+    """
+    return [
+        [[name, status.value, _timestamp(duration.start_time),
+          _timestamp(duration.stop_time), exception, message, size]
+         for name, status, duration, exception, message, size
+         in job_results]
+        for job_results in results
+    ]
+
+
+def results_from_list(results):
+    """The inverse of :func:`results_to_list`.
+
+    """
+    return [
+        [(name, TestCompletionStatus(status),
+          TestDuration(_EPOCH + timedelta(seconds=start),
+                       _EPOCH + timedelta(seconds=stop)),
+          exception, message, size)
+         for name, status, start, stop, exception, message, size
+         in job_results]
+        for job_results in results
+    ]
+
+
+class WorkQueue(object):
+    """The work units of a run, served to workers in order.
+
+    Parameters
+    ----------
+    units : list
+        The units, as messages to send to a worker.  The results of the
+        unit at index ``i`` are stored under the same index.
+
+    """
+
+    def __init__(self, units):
+        super(WorkQueue, self).__init__()
+        self._pending = deque(range(len(units)))
+        self._units = units
+        self._results = {}
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def take(self):
+        """Take the next unit to run, waiting while all remaining units
+        are taken by other workers.
+
+        Returns
+        -------
+        unit : tuple
+            An ``(index, message)`` pair, or ``None`` if no units are
+            left or the queue is closed.
+
+        """
+        with self._condition:
+            while not self._closed:
+                if self._pending:
+                    index = self._pending.popleft()
+                    return index, self._units[index]
+                if len(self._results) == len(self._units):
+                    break
+                self._condition.wait()
+            return None
+
+    def put_back(self, index):
+        """Serve a unit taken by a worker that failed to complete it
+        again.
+
+        """
+        with self._condition:
+            if index not in self._results:
+                self._pending.appendleft(index)
+                self._condition.notify_all()
+
+    def complete(self, index, result):
+        with self._condition:
+            self._results[index] = result
+            self._condition.notify_all()
+
+    def wait_result(self, index, timeout=None):
+        """Wait for the result of a unit, returning ``None`` if it is not
+        complete after ``timeout`` seconds.
+
+        """
+        with self._condition:
+            if index not in self._results:
+                self._condition.wait(timeout)
+            return self._results.get(index)
+
+    def close(self):
+        """Stop serving units, so that workers asking for one are
+        told that the run is done.
+
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        queue = self.server.queue
+        while True:
+            message = receive_message(self.rfile)
+            if message is None or message.get('type') != 'next':
+                return
+            unit = queue.take()
+            if unit is None:
+                send_message(self.wfile, {'type': 'done'})
+                return
+            index, unit_message = unit
+            try:
+                send_message(self.wfile, unit_message)
+                result = receive_message(self.rfile)
+            except (socket.error, ValueError):
+                logger.warning('Lost worker %r', self.client_address,
+                               exc_info=True)
+                result = None
+            if result is None or result.get('id') != index:
+                queue.put_back(index)
+                return
+            queue.complete(index, result)
+
+
+class _TCPCoordinatorServer(socketserver.ThreadingTCPServer):
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixCoordinatorServer(socketserver.ThreadingUnixStreamServer):
+
+        daemon_threads = True
+else:  # pragma: no cover
+    _UnixCoordinatorServer = None
+
+
+class Coordinator(object):
+    """A server handing the units of a :class:`~.WorkQueue` to workers.
+
+    Parameters
+    ----------
+    address : str
+        The address to listen on, ``'host:port'`` or
+        ``'unix:/path/to/socket'``.  Port ``0`` listens on a free port.
+    queue : WorkQueue
+        The units to serve.
+
+    """
+
+    def __init__(self, address, queue):
+        super(Coordinator, self).__init__()
+        family, server_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            if _UnixCoordinatorServer is None:  # pragma: no cover
+                raise HaasRestTestError(
+                    'Unix domain sockets are not supported')
+            server_class = _UnixCoordinatorServer
+        else:
+            server_class = _TCPCoordinatorServer
+        self.family = family
+        self._server = server_class(server_address, _CoordinatorHandler)
+        self._server.queue = queue
+        self._thread = None
+
+    @property
+    def address(self):
+        """The address workers connect to, with the actual port.
+
+        """
+        return format_address(self.family, self._server.server_address)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.1})
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        if self.family == socket.AF_UNIX:
+            try:
+                os.unlink(self._server.server_address)
+            except OSError:
+                pass
+
+
+def _connect(address, wait):
+    family, server_address = parse_address(address)
+    deadline = time.time() + wait
+    while True:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(server_address)
+        except socket.error:
+            sock.close()
+            if time.time() >= deadline:
+                raise
+            time.sleep(0.1)
+        else:
+            return sock
+
+
+def run_worker(address, wait=10.0):
+    """Run units served by the coordinator at ``address`` until it has
+    none left.
+
+    Parameters
+    ----------
+    address : str
+        The address of the coordinator, ``'host:port'`` or
+        ``'unix:/path/to/socket'``.
+    wait : float
+        The time to keep retrying to connect to the coordinator, in
+        seconds.
+
+    Returns
+    -------
+    units : int
+        The number of units run by the worker.
+
+    """
+    _initialize_worker()
+    sock = _connect(address, wait)
+    stream = sock.makefile('rwb')
+    count = 0
+    try:
+        while True:
+            send_message(stream, {'type': 'next'})
+            message = receive_message(stream)
+            if message is None or message['type'] != 'unit':
+                break
+            jobs = [CaseJob.from_dict(job) for job in message['jobs']]
+            results, dns_stats, tls_stats = run_jobs(
+                jobs, message['buffer'], message['failfast'])
+            send_message(stream, {
+                'type': 'result',
+                'id': message['id'],
+                'results': results_to_list(results),
+                'dns': vars(dns_stats),
+                'tls': vars(tls_stats),
+            })
+            count += 1
+    finally:
+        stream.close()
+        sock.close()
+    logger.info('Ran %d units from %s', count, address)
+    return count
+
+
+class CoordinatorRunner(BaseTestRunner):
+    """A ``haas`` test runner that serves the cases of the suite to
+    workers started with ``usagi worker ADDRESS``, on this host or on
+    other machines.
+
+    Workers recreate the tests of each case from its test
+    specifications and configuration, so they need usagi, the same
+    plugins and any files read by the tests at the same paths as the
+    coordinator.  Results are reported to the result handlers of the
+    coordinator in the order of the suite.  Tests that are not
+    generated from usagi test files run in the coordinator.
+
+    Parameters
+    ----------
+    listen : str
+        The address to listen on, ``'host:port'`` or
+        ``'unix:/path/to/socket'``.
+    local_workers : int
+        The number of workers to start as processes of this host.  With
+        no local workers, the run waits for remote workers.
+    unit : str
+        ``'case'`` to serve cases one at a time, or ``'file'`` to serve
+        all cases of a test file as one unit.
+    stream : file
+        The stream to write the listening address to.  Defaults to
+        ``sys.stderr``.
+    warnings : str
+        The warnings filter action used while running tests.
+
+    """
+
+    def __init__(self, listen=DEFAULT_LISTEN, local_workers=0,
+                 unit=GROUP_CASE, stream=None, warnings=None):
+        super(CoordinatorRunner, self).__init__(warnings=warnings)
+        if stream is None:
+            stream = sys.stderr
+        self.listen = listen
+        self.local_workers = local_workers
+        self.unit = unit
+        self.stream = stream
+
+    @classmethod
+    def from_args(cls, args, arg_prefix):
+        return cls(
+            listen=getattr(args, arg_prefix + 'usagi_listen'),
+            local_workers=getattr(args, arg_prefix + 'usagi_local_workers'),
+            unit=getattr(args, arg_prefix + 'usagi_unit'),
+            warnings=args.warnings,
+        )
+
+    @classmethod
+    def add_parser_arguments(cls, parser, option_prefix, dest_prefix):
+        try:
+            parser.add_argument(
+                '{0}usagi-listen'.format(option_prefix),
+                dest='{0}usagi_listen'.format(dest_prefix),
+                default=DEFAULT_LISTEN,
+                help=('Address the usagi-coordinator runner serves work '
+                      'on, host:port or unix:/path (default {0})'.format(
+                          DEFAULT_LISTEN)))
+            parser.add_argument(
+                '{0}usagi-local-workers'.format(option_prefix),
+                dest='{0}usagi_local_workers'.format(dest_prefix),
+                type=int, default=0,
+                help=('Number of workers the usagi-coordinator runner '
+                      'starts on this host (default 0)'))
+            parser.add_argument(
+                '{0}usagi-unit'.format(option_prefix),
+                dest='{0}usagi_unit'.format(dest_prefix),
+                choices=[GROUP_CASE, GROUP_FILE], default=GROUP_CASE,
+                help=('Serve work from the usagi-coordinator runner a case '
+                      'at a time (case), or a test file at a time (file) '
+                      '(default case)'))
+        except argparse.ArgumentError:
+            # The runner may be registered under more than one name.
+            pass
+
+    def _start_local_workers(self, address):
+        context = get_context(default_start_method())
+        workers = []
+        for _ in range(self.local_workers):
+            worker = context.Process(target=run_worker, args=(address,))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        return workers
+
+    def _wait_result(self, queue, index, workers):
+        while True:
+            result = queue.wait_result(index, timeout=0.5)
+            if result is not None:
+                return result
+            if workers and not any(worker.is_alive() for worker in workers):
+                # Workers exit once there is nothing left to take.
+                result = queue.wait_result(index, timeout=0)
+                if result is None:
+                    raise HaasRestTestError(
+                        'All local workers exited before running all '
+                        'cases')
+                return result
+
+    def _replay(self, result_collector, case_jobs, result, tests):
+        get_dns_cache().merge_stats(DnsStats(**result['dns']))
+        tls.get_tls_cache().merge_stats(tls.TlsStats(**result['tls']))
+        for job, job_results in zip(
+                case_jobs, results_from_list(result['results'])):
+            replay_job_results(result_collector, type(tests[0]), job_results)
+            if result_collector.shouldStop:
+                return
+            tests = tests[len(job.method_names):]
+
+    def _run_tests(self, result_collector, suite):
+        jobs = group_jobs(group_test_cases(suite), self.unit)
+        units = []
+        for case_jobs, _ in jobs:
+            if case_jobs is not None:
+                units.append({
+                    'type': 'unit',
+                    'id': len(units),
+                    'jobs': [job.to_dict() for job in case_jobs],
+                    'buffer': result_collector.buffer,
+                    'failfast': result_collector.failfast,
+                })
+        queue = WorkQueue(units)
+        coordinator = Coordinator(self.listen, queue)
+        workers = []
+        try:
+            coordinator.start()
+            self.stream.write(
+                'usagi coordinator listening on {0}\n'.format(
+                    coordinator.address))
+            self.stream.flush()
+            workers = self._start_local_workers(coordinator.address)
+            index = 0
+            for case_jobs, tests in jobs:
+                if case_jobs is None:
+                    TestSuite(tests)(result_collector)
+                else:
+                    result = self._wait_result(queue, index, workers)
+                    index += 1
+                    self._replay(result_collector, case_jobs, result, tests)
+                if result_collector.shouldStop:
+                    break
+        finally:
+            queue.close()
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            coordinator.close()
+
+    def run(self, result_collector, test_to_run):
+        """Serve the cases of the suite to workers.
+
+        """
+        def test(result):
+            self._run_tests(result_collector, test_to_run)
+        return super(CoordinatorRunner, self).run(result_collector, test)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Host name resolution for the connections made by tests.
+
+Names are resolved once and cached for the whole process, and may be
+overridden per test file with the ``resolve`` option of ``config``.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+from timeit import default_timer
+import logging
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+
+
+def is_ip_address(host):
+    for family in (socket.AF_INET, getattr(socket, 'AF_INET6', None)):
+        if family is None:  # pragma: no cover
+            continue
+        try:
+            socket.inet_pton(family, host)
+        except (socket.error, ValueError):
+            continue
+        return True
+    return False
+
+
+def _unique(addresses):
+    unique = []
+    for address in addresses:
+        if address not in unique:
+            unique.append(address)
+    return unique
+
+
+class DnsStats(object):
+    """Counters of the host name lookups made by a :class:`~.DnsCache`.
+
+    Attributes
+    ----------
+    lookups : int
+        The number of names resolved with ``socket.getaddrinfo``.
+    hits : int
+        The number of names found in the cache.
+    overrides : int
+        The number of names resolved by a ``resolve`` override.
+    lookup_time : float
+        The total time spent in ``socket.getaddrinfo``, in seconds.
+
+    """
+
+    def __init__(self, lookups=0, hits=0, overrides=0, lookup_time=0.0):
+        super(DnsStats, self).__init__()
+        self.lookups = lookups
+        self.hits = hits
+        self.overrides = overrides
+        self.lookup_time = lookup_time
+
+    def copy(self):
+        return type(self)(
+            self.lookups, self.hits, self.overrides, self.lookup_time)
+
+    def merge(self, other):
+        """Add the counters of ``other`` to this object.
+
+        """
+        self.lookups += other.lookups
+        self.hits += other.hits
+        self.overrides += other.overrides
+        self.lookup_time += other.lookup_time
+
+
+class DnsCache(object):
+    """A thread-safe cache of host name lookups.
+
+    Parameters
+    ----------
+    ttl : float
+        The number of seconds for which a lookup is reused.  ``0``
+        disables caching.
+
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        super(DnsCache, self).__init__()
+        self.ttl = ttl
+        self._cache = {}
+        self._stats = DnsStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """A snapshot of the :class:`~.DnsStats` of this cache.
+
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def reset_stats(self):
+        """Reset the counters, keeping the cached names.
+
+        Returns
+        -------
+        stats : DnsStats
+            The counters before the reset.
+
+        """
+        with self._lock:
+            stats, self._stats = self._stats, DnsStats()
+        return stats
+
+    def merge_stats(self, stats):
+        """Add ``stats``, counted by another process, to the counters.
+
+        """
+        with self._lock:
+            self._stats.merge(stats)
+
+    def record_override(self):
+        with self._lock:
+            self._stats.overrides += 1
+
+    def lookup(self, host, port):
+        """Resolve ``host`` to its addresses, in the order in which they
+        should be tried.
+
+        """
+        now = default_timer()
+        with self._lock:
+            cached = self._cache.get(host)
+            if cached is not None and cached[0] > now:
+                self._stats.hits += 1
+                return cached[1]
+        start = default_timer()
+        try:
+            addresses = socket.getaddrinfo(
+                host, port, 0, socket.SOCK_STREAM)
+        finally:
+            elapsed = default_timer() - start
+            with self._lock:
+                self._stats.lookups += 1
+                self._stats.lookup_time += elapsed
+        addresses = _unique(info[4][0] for info in addresses)
+        logger.debug('Resolved %r to %r in %.3fs', host, addresses, elapsed)
+        if self.ttl > 0:
+            with self._lock:
+                self._cache[host] = (now + self.ttl, addresses)
+        return addresses
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._stats = DnsStats()
+
+
+class Resolver(object):
+    """Resolve host names for the connections of one test file.
+
+    Parameters
+    ----------
+    overrides : dict
+        Mapping of ``'host'`` or ``'host:port'`` to the address to
+        connect to, like ``curl --resolve``.
+    cache : DnsCache
+        The cache used for other names.  Defaults to the process-wide
+        cache.
+
+    """
+
+    def __init__(self, overrides=None, cache=None):
+        super(Resolver, self).__init__()
+        self.overrides = dict(overrides or {})
+        self._cache = cache
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            return get_dns_cache()
+        return self._cache
+
+    @property
+    def key(self):
+        return tuple(sorted(self.overrides.items()))
+
+    def resolve(self, host, port):
+        """The addresses to connect to for ``host`` and ``port``, in the
+        order in which they should be tried.
+
+        """
+        address = self.overrides.get('{0}:{1}'.format(host, port))
+        if address is None:
+            address = self.overrides.get(host)
+        if address is not None:
+            self.cache.record_override()
+            return [address]
+        if is_ip_address(host):
+            return [host]
+        return self.cache.lookup(host, port)
+
+
+_dns_cache = None
+_dns_cache_lock = threading.Lock()
+
+
+def get_dns_cache():
+    """Get the process-wide :class:`~.DnsCache`.
+
+    """
+    global _dns_cache
+    if _dns_cache is None:
+        with _dns_cache_lock:
+            if _dns_cache is None:
+                _dns_cache = DnsCache()
+    return _dns_cache
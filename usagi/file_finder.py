@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from fnmatch import fnmatchcase
+import logging
+import os
+
+try:  # pragma: no cover
+    from os import scandir
+except ImportError:  # pragma: no cover
+    from scandir import scandir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS = ('test*.yml',)
+
+IGNORE_FILENAME = '.usagiignore'
+
+#: Directories that never contain tests.
+PRUNED_DIRECTORIES = frozenset([
+    '.git', '.hg', '.svn', '.tox', '.nox', '.eggs', '__pycache__',
+    'node_modules',
+])
+
+#: A directory containing this file is a virtualenv (PEP 405).
+VIRTUALENV_MARKER = 'pyvenv.cfg'
+
+
+def _matches_any(name, patterns):
+    return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+
+class _IgnoreRule(object):
+
+    def __init__(self, base, pattern):
+        super(_IgnoreRule, self).__init__()
+        self.directory_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A pattern containing a slash is relative to the ignore file,
+        # otherwise it matches a name at any depth.
+        self.anchored = '/' in pattern
+        self.pattern = pattern.lstrip('/')
+        self.base = base
+
+    def matches(self, relpath, name, is_dir):
+        if self.directory_only and not is_dir:
+            return False
+        if not self.anchored:
+            return fnmatchcase(name, self.pattern)
+        if self.base:
+            prefix = self.base + '/'
+            if not relpath.startswith(prefix):
+                return False
+            relpath = relpath[len(prefix):]
+        return fnmatchcase(relpath, self.pattern)
+
+
+def read_ignore_file(path, base=''):
+    """Read the rules of a ``.usagiignore`` file.
+
+    Each non-empty line not starting with ``#`` is a glob pattern.  A
+    pattern ending in ``/`` only matches directories.  A pattern
+    containing ``/`` is matched against the path relative to the
+    directory containing the ignore file; any other pattern is matched
+    against file and directory names at any depth.
+
+    """
+    rules = []
+    try:
+        with open(path) as fh:
+            for line in fh:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                rules.append(_IgnoreRule(base, line))
+    except (IOError, OSError):
+        logger.warning('Unable to read ignore file %r', path)
+    return rules
+
+
+class TestFileFinder(object):
+    """Find YAML test files below a directory.
+
+    Directories are read with ``os.scandir`` so that the type of each
+    entry is known without a further ``stat``.  Pruned directories are
+    never entered.  Files are yielded in sorted order.
+
+    Parameters
+    ----------
+    patterns : list
+        Glob patterns matched against file names to select test files.
+    include : list
+        Optional glob patterns matched against the path of each test
+        file relative to the start directory.  If given, only files
+        matching any of these patterns are selected.
+    exclude : list
+        Glob patterns matched against the relative path and the name
+        of each file and directory.  Matching directories are pruned.
+    ignore_filename : str
+        The name of ignore files, read from each directory walked,
+        containing further exclude patterns.  ``None`` disables ignore
+        files.
+
+    """
+
+    __test__ = False
+
+    def __init__(self, patterns=None, include=None, exclude=None,
+                 ignore_filename=IGNORE_FILENAME):
+        super(TestFileFinder, self).__init__()
+        self.patterns = list(patterns or DEFAULT_PATTERNS)
+        self.include = list(include or ())
+        self.exclude = list(exclude or ())
+        self.ignore_filename = ignore_filename
+
+    def _is_excluded(self, relpath, name, is_dir, rules):
+        if _matches_any(relpath, self.exclude) or \
+                _matches_any(name, self.exclude):
+            return True
+        return any(rule.matches(relpath, name, is_dir) for rule in rules)
+
+    def _is_test_file(self, relpath, name):
+        if not _matches_any(name, self.patterns):
+            return False
+        return not self.include or _matches_any(relpath, self.include)
+
+    def find(self, start_directory):
+        """Generate the paths of test files below ``start_directory``.
+
+        """
+        return self._walk(start_directory, '', [])
+
+    def _walk(self, directory, reldir, rules):
+        logger.debug('Discovering tests in %r', directory)
+        try:
+            entries = sorted(scandir(directory), key=lambda e: e.name)
+        except OSError as exc:
+            logger.warning('Unable to list directory %r: %s', directory, exc)
+            return
+        names = set(entry.name for entry in entries)
+        if reldir and VIRTUALENV_MARKER in names:
+            logger.debug('Skipping virtualenv %r', directory)
+            return
+        if self.ignore_filename is not None and \
+                self.ignore_filename in names:
+            rules = rules + read_ignore_file(
+                os.path.join(directory, self.ignore_filename), reldir)
+
+        subdirectories = []
+        for entry in entries:
+            name = entry.name
+            relpath = reldir + '/' + name if reldir else name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if name in PRUNED_DIRECTORIES or entry.is_symlink() or \
+                        self._is_excluded(relpath, name, True, rules):
+                    logger.debug('Pruning %r', entry.path)
+                    continue
+                subdirectories.append((entry.path, relpath))
+            elif self._is_test_file(relpath, name) and \
+                    not self._is_excluded(relpath, name, False, rules):
+                yield entry.path
+
+        for path, relpath in subdirectories:
+            for filepath in self._walk(path, relpath, rules):
+                yield filepath
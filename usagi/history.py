@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""A local SQLite store of the outcome, duration and response size of
+each test of past runs.
+
+The store is written once at the end of a run by the
+``--with-usagi-history`` result handler, and read during discovery to
+order cases (``--discovery-usagi-order``) or to balance shards
+(``--discovery-usagi-shard-durations``).  Only the most recent runs are
+kept.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import sqlite3
+import time
+
+from .sharding import case_key
+from .yaml_test_loader import CASE_TESTS_ATTRIBUTE, TEST_NAME_ATTRIBUTE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = '.usagi-history.sqlite'
+
+DEFAULT_MAX_RUNS = 50
+
+ORDER_SUITE = 'suite'
+ORDER_LONGEST = 'longest'
+ORDER_FAILED = 'failed'
+
+#: The base class of the errors raised by :class:`HistoryStore`.
+Error = sqlite3.Error
+
+#: Outcomes, named as ``haas.result.TestCompletionStatus``, counted as
+#: failures.
+FAILED_OUTCOMES = ('failure', 'error', 'unexpected_success')
+
+_SQLITE_HEADER = b'SQLite format 3\x00'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    case_name TEXT NOT NULL,
+    test_index INTEGER NOT NULL,
+    test_name TEXT NOT NULL,
+    duration REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    response_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS results_case ON results (file, case_name, run_id);
+"""
+
+
+def is_history_file(path):
+    """``True`` if ``path`` is a SQLite database.
+
+    """
+    with open(path, 'rb') as fh:
+        return fh.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER
+
+
+class HistoryStore(object):
+    """The results of past runs, stored in a SQLite database.
+
+    Parameters
+    ----------
+    path : str
+        The path of the database, created if it does not exist.
+    max_runs : int
+        The number of most recent runs kept when a run is added.
+
+    """
+
+    def __init__(self, path, max_runs=DEFAULT_MAX_RUNS):
+        super(HistoryStore, self).__init__()
+        self.path = path
+        self.max_runs = max_runs
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_run(self, records, started=None):
+        """Add the results of a run, and forget the oldest runs.
+
+        Parameters
+        ----------
+        records : list
+            ``(file, case_name, test_index, test_name, duration,
+            outcome, response_size)`` tuples, with ``file`` relative to
+            the current directory (see
+            :func:`usagi.sharding.relative_path`).
+        started : float
+            The start time of the run, in seconds since the epoch.
+            Defaults to now.
+
+        Returns
+        -------
+        run_id : int
+            The identifier of the run; later runs have larger
+            identifiers.
+
+        """
+        if started is None:
+            started = time.time()
+        with self._connection as connection:
+            run_id = connection.execute(
+                'INSERT INTO runs (started) VALUES (?)', (started,)
+            ).lastrowid
+            connection.executemany(
+                'INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(run_id,) + tuple(record) for record in records])
+            oldest = run_id - self.max_runs
+            connection.execute('DELETE FROM runs WHERE id <= ?', (oldest,))
+            connection.execute(
+                'DELETE FROM results WHERE run_id <= ?', (oldest,))
+        return run_id
+
+    def results(self, run_id=None):
+        """The records of a run, the most recent by default, in the
+        order they were added.
+
+        """
+        if run_id is None:
+            run_id = self._connection.execute(
+                'SELECT MAX(id) FROM runs').fetchone()[0]
+        return self._connection.execute(
+            'SELECT file, case_name, test_index, test_name, duration, '
+            'outcome, response_size FROM results WHERE run_id = ? '
+            'ORDER BY rowid', (run_id,)).fetchall()
+
+    def case_durations(self):
+        """The total duration of each case in the most recent run in
+        which it ran, by :func:`usagi.sharding.case_key`.
+
+        """
+        rows = self._connection.execute("""
+            SELECT file, case_name, SUM(duration) FROM results AS r
+            WHERE run_id = (
+                SELECT MAX(run_id) FROM results
+                WHERE file = r.file AND case_name = r.case_name)
+            GROUP BY file, case_name
+        """)
+        return dict(
+            (case_key(filename, case_name), duration)
+            for filename, case_name, duration in rows)
+
+    def failed_cases(self):
+        """The identifier of the most recent run in which each case had a
+        failure, by :func:`usagi.sharding.case_key`.
+
+        """
+        rows = self._connection.execute("""
+            SELECT file, case_name, MAX(run_id) FROM results
+            WHERE outcome IN ({0})
+            GROUP BY file, case_name
+        """.format(', '.join('?' * len(FAILED_OUTCOMES))), FAILED_OUTCOMES)
+        return dict(
+            (case_key(filename, case_name), run_id)
+            for filename, case_name, run_id in rows)
+
+
+def _unit_key(tests):
+    test_class = type(tests[0])
+    case_tests = getattr(test_class, CASE_TESTS_ATTRIBUTE, None)
+    if case_tests is None:
+        return None
+    return case_key(
+        case_tests.config.test_filename,
+        getattr(test_class, TEST_NAME_ATTRIBUTE))
+
+
+def order_units(units, order, store):
+    """Sort the units of a suite, as returned by
+    :func:`usagi.runner.group_test_cases`, by the history in ``store``.
+
+    With ``order`` ``'longest'``, cases are sorted by their last
+    duration, longest first; cases without history are assumed to take
+    the mean duration.  With ``'failed'``, the cases that failed most
+    recently run first, followed by the others.  The sort is stable, so
+    units of equal priority keep the order of the suite.
+
+    """
+    if order == ORDER_SUITE:
+        return list(units)
+    keys = [_unit_key(tests) for tests in units]
+    if order == ORDER_LONGEST:
+        durations = store.case_durations()
+        known = [durations[key] for key in keys if key in durations]
+        default = sum(known) / len(known) if known else 0.0
+        priorities = [-durations.get(key, default) for key in keys]
+    elif order == ORDER_FAILED:
+        failed = store.failed_cases()
+        priorities = [-failed.get(key, 0) for key in keys]
+    else:
+        raise ValueError('Unknown order {0!r}'.format(order))
+    indices = sorted(range(len(units)), key=lambda index: priorities[index])
+    return [units[index] for index in indices]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from importlib import import_module
+
+
+class LazyModule(object):
+    """A stand-in for a module that is only imported when one of its
+    attributes is first accessed.
+
+    This keeps expensive dependencies that are only needed while tests
+    run, such as ``requests`` and ``jq``, out of the import of the
+    discovery plugin.
+
+    Parameters
+    ----------
+    name : str
+        The absolute name of the module.
+
+    """
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__()
+        self._name = name
+        self._module = None
+
+    @property
+    def is_imported(self):
+        return self._module is not None
+
+    def _load(self):
+        if self._module is None:
+            self._module = import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        # Only called for attributes not found on the proxy itself.
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return '<LazyModule {0!r}>'.format(self._name)
+
+
+def lazy_import(name):
+    """Get a :class:`~.LazyModule` for the module ``name``.
+
+    """
+    return LazyModule(name)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import sys
+
+import usagi
+
+
+def write_manifest(args):
+    from .registry import write_plugin_manifest
+    path = write_plugin_manifest(args.output)
+    print('Wrote plugin manifest to {0}'.format(path))
+    return 0
+
+
+def run_worker(args):
+    from .distributed import run_worker
+    run_worker(args.address, wait=args.wait)
+    return 0
+
+
+def create_argument_parser():
+    """Creates the argument parser for the ``usagi`` command.
+
+    """
+    parser = argparse.ArgumentParser(prog='usagi')
+    parser.add_argument('--version', action='version',
+                        version='%(prog)s {0}'.format(usagi.__version__))
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    manifest_parser = subparsers.add_parser(
+        'write-manifest',
+        help=('Write a manifest of the installed usagi plugins, used to '
+              'avoid scanning entry points at startup'))
+    manifest_parser.add_argument(
+        '-o', '--output', default=None,
+        help=('Manifest path.  Defaults to $USAGI_PLUGIN_MANIFEST or '
+              'usagi-plugins.json in the environment prefix'))
+    manifest_parser.set_defaults(func=write_manifest)
+
+    worker_parser = subparsers.add_parser(
+        'worker',
+        help=('Run cases served by a usagi-coordinator runner until it '
+              'has none left'))
+    worker_parser.add_argument(
+        'address',
+        help='Coordinator address, host:port or unix:/path/to/socket')
+    worker_parser.add_argument(
+        '--wait', type=float, default=10.0,
+        help=('Seconds to keep retrying to connect to the coordinator '
+              '(default 10)'))
+    worker_parser.set_defaults(func=run_worker)
+
+    return parser
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    parser = create_argument_parser()
+    args = parser.parse_args(argv[1:])
+    return args.func(args)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
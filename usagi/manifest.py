@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from importlib import import_module
+import hashlib
+import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_ENVIRONMENT_VARIABLE = 'USAGI_PLUGIN_MANIFEST'
+
+MANIFEST_VERSION = 1
+
+
+def default_manifest_path():
+    """The manifest path given by the ``USAGI_PLUGIN_MANIFEST``
+    environment variable, or ``usagi-plugins.json`` in ``sys.prefix``.
+
+    """
+    path = os.environ.get(MANIFEST_ENVIRONMENT_VARIABLE)
+    if path is None:
+        path = os.path.join(sys.prefix, 'usagi-plugins.json')
+    return path
+
+
+def environment_hash():
+    """Hash the state of the Python environment that determines which
+    plugins are installed.
+
+    Installing or removing a distribution changes the modification
+    time of the ``sys.path`` directory it is installed into, so only
+    the ``sys.path`` entries themselves are inspected.  The first entry
+    is the script directory or the current directory, which changes
+    between invocations, and is ignored.
+
+    """
+    parts = [sys.prefix, sys.version]
+    for path in sys.path[1:]:
+        try:
+            mtime = os.stat(path or os.curdir).st_mtime
+        except OSError:
+            mtime = None
+        parts.append('{0}={1!r}'.format(path, mtime))
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ManifestEntryPoint(object):
+    """An entry point loaded from a plugin manifest.
+
+    """
+
+    def __init__(self, name, value, version):
+        super(ManifestEntryPoint, self).__init__()
+        self.name = name
+        self.value = value
+        self.version = version
+
+    def load(self):
+        module_name, _, attrs = self.value.partition(':')
+        obj = import_module(module_name)
+        for attr in attrs.split('.'):
+            if attr:
+                obj = getattr(obj, attr)
+        return obj
+
+
+def write_manifest(path, plugins):
+    """Write a plugin manifest.
+
+    Parameters
+    ----------
+    path : str
+        The path of the manifest file.
+    plugins : dict
+        Mapping of namespace to a list of plugin descriptions.  Each
+        description is a dict with the ``name``, ``value``
+        (``'module:attr'``) and ``version`` of the plugin's entry
+        point.
+
+    """
+    manifest = {
+        'manifest-version': MANIFEST_VERSION,
+        'environment': environment_hash(),
+        'plugins': plugins,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path, namespaces):
+    """Load plugin entry points from the manifest at ``path``.
+
+    Returns
+    -------
+    entry_points : dict
+        Mapping of namespace to a list of
+        :class:`~.ManifestEntryPoint`, or ``None`` if there is no
+        manifest, or it is stale or does not contain all
+        ``namespaces``.
+
+    """
+    try:
+        with open(path) as fh:
+            manifest = json.load(fh)
+    except (IOError, OSError):
+        return None
+    except ValueError:
+        logger.warning('Ignoring invalid plugin manifest %r', path)
+        return None
+    if manifest.get('manifest-version') != MANIFEST_VERSION:
+        return None
+    if manifest.get('environment') != environment_hash():
+        logger.debug('Plugin manifest %r is stale', path)
+        return None
+    plugins = manifest.get('plugins', {})
+    if not all(namespace in plugins for namespace in namespaces):
+        return None
+    return dict(
+        (namespace, [
+            ManifestEntryPoint(**entry_point)
+            for entry_point in plugins[namespace]
+        ])
+        for namespace in namespaces
+    )
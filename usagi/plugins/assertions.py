@@ -10,12 +10,14 @@ import hashlib
 import re
 
 from jsonschema.exceptions import ValidationError
-import jsonschema
-from jq import jq
 
 from ..exceptions import JqCompileError, YamlParseError
+from ..lazy_import import lazy_import
+from ..schema import validate
 from .i_assertion import IAssertion
 
+jq = lazy_import('jq')
+
 
 class StatusCodeAssertion(IAssertion):
 
@@ -39,7 +41,7 @@ class StatusCodeAssertion(IAssertion):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(expected_status=data['expected'])
@@ -80,7 +82,7 @@ class HeaderAssertion(IAssertion):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         if 'value' in data and 'regexp' in data:
@@ -158,14 +160,14 @@ class BodyAssertion(IAssertion):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
 
         filter_ = data.get('filter', None)
         if filter_ is not None:
             try:
-                jq_filter = jq(filter_)
+                jq_filter = jq.jq(filter_)
             except ValueError as e:
                 raise JqCompileError(str(e))
         else:
@@ -219,7 +221,7 @@ class Sha256BodyAssertion(IAssertion):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
 
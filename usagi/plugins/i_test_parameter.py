@@ -18,7 +18,8 @@ class ITestParameter(object):
     """Interface for test parameter plugins.
 
     A test parameter plugin generates options to pass to
-    ``requests.Session.request()``.
+    ``requests.Session.request()`` (or the ``request()`` method of the
+    client of another transport plugin).
 
     """
 
@@ -31,7 +32,8 @@ class ITestParameter(object):
     @abc.abstractmethod
     def load(self, config):
         """Context manager to load and return the options to pass to
-        ``requests.Session.request()``.
+        ``requests.Session.request()``: ``method``, ``headers``,
+        ``params``, ``data`` and ``files``.
 
         On context cleanup, this context manager is expected to release
         any resources helf during the HTTP request.
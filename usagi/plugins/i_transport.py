@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import abc
+
+from six import add_metaclass
+
+
+@add_metaclass(abc.ABCMeta)
+class ITransport(object):
+    """Interface for transport plugins, which make the HTTP requests of
+    web tests.
+
+    A single instance of each transport is created per process, and
+    creates a client for each case.  Clients provide::
+
+        client.request(method, url, headers=None, params=None,
+                       data=None, files=None)
+
+    taking the options generated by test parameter plugins and
+    returning a response with the interface of ``requests.Response``
+    used by assertion plugins (for example
+    :class:`usagi.response.BufferedResponse`), and a
+    ``connection_errors`` attribute holding the tuple of exceptions
+    raised when the server can not be reached.
+
+    """
+
+    @abc.abstractmethod
+    def create_client(self, config):
+        """Create the client used by the tests of one case.
+
+        Clients must not share cookies between cases.
+
+        Parameters
+        ----------
+        config : usagi.config.Config
+            The configuration of the test file containing the case.
+
+        """
+
+    def connection_pool(self, config):
+        """The ``urllib3`` connection pool that will be used for
+        requests to the host of ``config``, so that connections may be
+        opened before tests run.
+
+        Returns ``None`` (the default) if the transport does not keep
+        a pool shared between cases.
+
+        """
+        return None
+
+    @abc.abstractmethod
+    def close(self):
+        """Release all connections held by the transport.
+
+        """
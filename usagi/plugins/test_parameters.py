@@ -11,12 +11,12 @@ import json
 
 from jsonschema.exceptions import ValidationError
 from six import BytesIO
-import jsonschema
 import six
-import yaml
 
 from usagi.utils import ExitStack, get_file_path
+from .. import yaml_backend
 from ..exceptions import YamlParseError
+from ..schema import validate
 from .i_test_parameter import ITestParameter
 
 
@@ -43,7 +43,7 @@ class MethodTestParameter(ITestParameter):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(method=data['method'])
@@ -76,7 +76,7 @@ class HeadersTestParameter(ITestParameter):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(headers=data['headers'])
@@ -99,7 +99,7 @@ class BodyTestParameter(ITestParameter):
     _format_multipart = 'multipart'
     _format_handlers = {
         _format_json: json.dumps,
-        _format_yaml: lambda d: yaml.safe_dump(
+        _format_yaml: lambda d: yaml_backend.safe_dump(
             d, default_flow_style=False)
     }
 
@@ -212,7 +212,7 @@ class BodyTestParameter(ITestParameter):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         body = data['body']
@@ -222,7 +222,7 @@ class BodyTestParameter(ITestParameter):
         format_schema = cls._format_schemas.get(format)
         if format_schema is not None:
             try:
-                jsonschema.validate(value, format_schema)
+                validate(value, format_schema)
             except ValidationError as e:
                 raise YamlParseError(str(e))
 
@@ -339,7 +339,7 @@ class QueryParamsTestParameter(ITestParameter):
     @classmethod
     def from_dict(cls, data):
         try:
-            jsonschema.validate(data, cls._schema)
+            validate(data, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(params=data['queryparams'])
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from io import BytesIO
+import textwrap
+import json
+
+from haas.loader import Loader
+from haas.result import ResultCollector
+from haas.suite import find_test_cases
+from haas.testing import unittest
+import yaml
+
+from usagi.exceptions import HaasRestTestError
+from usagi.plugins.assertions import BodyAssertion, StatusCodeAssertion
+from usagi.response import BufferedResponse
+from usagi.sessions import get_transport
+from usagi.tests.common import MockTestCase
+from usagi.tests.utils import WSGIServerTestCase, make_config, unused_port
+from usagi.yaml_test_loader import CASE_TESTS_ATTRIBUTE, YamlTestLoader
+from ..transports import (
+    RequestsClient, RequestsTransport, Urllib3Client, Urllib3Transport)
+
+
+def echo_app(environ, start_response):
+    length = int(environ.get('CONTENT_LENGTH') or 0)
+    body = environ['wsgi.input'].read(length)
+    content_type = environ.get('CONTENT_TYPE', '')
+    result = json.dumps({
+        'method': environ['REQUEST_METHOD'],
+        'path': environ['PATH_INFO'],
+        'query': environ['QUERY_STRING'],
+        'content_type': content_type,
+        'cookie': environ.get('HTTP_COOKIE'),
+        'connection': environ.get('HTTP_CONNECTION'),
+        'body': body.decode('utf-8'),
+    }).encode('utf-8')
+    headers = [(str('Content-Type'), str('application/json'))]
+    if environ['PATH_INFO'] == '/login':
+        headers.append((str('Set-Cookie'), str('session=abc; Path=/')))
+    elif environ['PATH_INFO'] == '/cookies':
+        headers.append((str('Set-Cookie'), str('a=1; Path=/')))
+        headers.append((str('Set-Cookie'), str('b=2; Path=/')))
+    start_response(str('200 OK'), headers)
+    return [result]
+
+
+class TestRequestsTransport(unittest.TestCase):
+
+    def test_create_client(self):
+        # Given
+        transport = RequestsTransport()
+
+        config = make_config(host='test.domain')
+
+        # When
+        client_1 = transport.create_client(config)
+        client_2 = transport.create_client(config)
+
+        # Then
+        self.assertIsInstance(client_1, RequestsClient)
+        self.assertIsNot(client_1.session, client_2.session)
+        self.assertIs(
+            client_1.session.get_adapter('http://test.domain/'),
+            client_2.session.get_adapter('http://test.domain/'))
+
+    def test_default_transport(self):
+        # When
+        transport = get_transport(make_config(host='test.domain').transport)
+
+        # Then
+        self.assertIsInstance(transport, RequestsTransport)
+        self.assertIs(get_transport('requests'), transport)
+
+    def test_unknown_transport(self):
+        # When/Then
+        with self.assertRaises(HaasRestTestError):
+            get_transport('carrier-pigeon')
+
+
+class TestUrllib3Transport(WSGIServerTestCase):
+
+    app = staticmethod(echo_app)
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestUrllib3Transport, cls).setUpClass()
+        cls.host = '127.0.0.1:{0}'.format(cls.server.server_port)
+
+    def setUp(self):
+        self.transport = Urllib3Transport()
+
+    def tearDown(self):
+        self.transport.close()
+
+    def _url(self, path):
+        return 'http://{0}{1}'.format(self.host, path)
+
+    def test_request(self):
+        # Given
+        client = self.transport.create_client(make_config(host=self.host))
+
+        # When
+        response = client.request(
+            'POST', self._url('/items?a=1'), params={'b': '2'},
+            headers={'Content-Type': 'text/plain'}, data='hello')
+
+        # Then
+        self.assertIsInstance(response, BufferedResponse)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.reason, 'OK')
+        self.assertEqual(response.headers['content-type'], 'application/json')
+        self.assertEqual(response.url, self._url('/items?a=1&b=2'))
+        body = response.json()
+        self.assertEqual(body['method'], 'POST')
+        self.assertEqual(body['path'], '/items')
+        self.assertEqual(body['query'], 'a=1&b=2')
+        self.assertEqual(body['content_type'], 'text/plain')
+        self.assertEqual(body['body'], 'hello')
+
+    def test_multipart(self):
+        # Given
+        client = self.transport.create_client(make_config(host=self.host))
+        files = {
+            'field': ('', BytesIO(b'value'), 'text/plain; charset=UTF-8'),
+        }
+
+        # When
+        response = client.request('POST', self._url('/'), files=files)
+
+        # Then
+        body = response.json()
+        self.assertTrue(body['content_type'].startswith('multipart/form-data'))
+        self.assertIn('name="field"', body['body'])
+        self.assertIn('Content-Type: text/plain; charset=UTF-8', body['body'])
+        self.assertIn('\r\n\r\nvalue\r\n', body['body'])
+
+    def test_cookies(self):
+        # Given
+        config = make_config(host=self.host)
+        client = self.transport.create_client(config)
+        other_client = self.transport.create_client(config)
+
+        # When
+        client.request('GET', self._url('/login'))
+        response = client.request('GET', self._url('/'))
+        other_response = other_client.request('GET', self._url('/'))
+
+        # Then
+        self.assertEqual(response.json()['cookie'], 'session=abc')
+        self.assertIsNone(other_response.json()['cookie'])
+
+    def test_repeated_headers(self):
+        # Given
+        client = self.transport.create_client(make_config(host=self.host))
+
+        # When
+        response = client.request('GET', self._url('/cookies'))
+
+        # Then
+        self.assertEqual(
+            response.headers['set-cookie'], 'a=1; Path=/, b=2; Path=/')
+        self.assertEqual(client.cookies, {'a': '1', 'b': '2'})
+
+    def test_assertions(self):
+        # Given
+        config = make_config(host=self.host)
+        client = self.transport.create_client(config)
+        url = self._url('/')
+        assertions = [
+            StatusCodeAssertion.from_dict({'expected': 200}),
+            BodyAssertion.from_dict({
+                'filter': '{method: .method, path: .path}',
+                'format': 'json',
+                'value': {'method': 'GET', 'path': '/'},
+                'lookup-var': False,
+            }),
+        ]
+        case = MockTestCase()
+
+        # When
+        response = client.request('GET', url)
+        for assertion in assertions:
+            assertion.run(config, url, case, response)
+
+        # Then
+        self.assertFalse(case.fail.called)
+
+    def test_yaml_case(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: {host}
+            transport: urllib3
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Log in"
+                  url: "/login"
+                  parameters:
+                    method: POST
+                  assertions:
+                    - name: status_code
+                      expected: 200
+                - name: "Cookie sent"
+                  url: "/"
+                  assertions:
+                    - name: body
+                      format: json
+                      filter: .cookie
+                      value:
+                        cookie: session=abc
+                      lookup-var: false
+        """).format(host=self.host)
+        suite = YamlTestLoader(Loader()).load_tests_from_yaml(
+            yaml.safe_load(test_yaml), '/path/to/test.yml')
+        result = ResultCollector()
+
+        # When
+        suite(result)
+
+        # Then
+        self.assertEqual(result.testsRun, 2)
+        self.assertTrue(result.wasSuccessful())
+        case_tests = getattr(
+            next(find_test_cases(suite)), CASE_TESTS_ATTRIBUTE)
+        self.assertIsInstance(case_tests[0].session, Urllib3Client)
+
+    def test_connection_error(self):
+        # Given
+        client = self.transport.create_client(make_config(host=self.host))
+
+        # When/Then
+        with self.assertRaises(client.connection_errors):
+            client.request(
+                'GET', 'http://127.0.0.1:{0}/'.format(unused_port()))
+
+    def test_pools_shared(self):
+        # When
+        client_1 = self.transport.create_client(make_config(host=self.host))
+        client_2 = self.transport.create_client(make_config(host=self.host))
+
+        # Then
+        self.assertIsInstance(client_1, Urllib3Client)
+        self.assertIs(client_1.pool_manager, client_2.pool_manager)
+
+    def test_case_reuse(self):
+        # Given
+        config = make_config(host=self.host, connection={'reuse': 'case'})
+
+        # When
+        client_1 = self.transport.create_client(config)
+        client_2 = self.transport.create_client(config)
+
+        # Then
+        self.assertIsNot(client_1.pool_manager, client_2.pool_manager)
+
+    def test_no_keep_alive(self):
+        # Given
+        config = make_config(host=self.host, connection={'keep-alive': False})
+        client = self.transport.create_client(config)
+
+        # When
+        response = client.request('GET', self._url('/'))
+
+        # Then
+        self.assertEqual(response.json()['connection'], 'close')
+
+    def test_app_not_supported(self):
+        # Given
+        config = make_config(app='module:app', transport='urllib3')
+
+        # When/Then
+        with self.assertRaises(HaasRestTestError):
+            self.transport.create_client(config)
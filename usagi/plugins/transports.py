@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import os
+import threading
+
+import six
+from six.moves import http_cookies, urllib
+
+from ..dns import Resolver
+from ..exceptions import HaasRestTestError
+from ..lazy_import import lazy_import
+from ..response import BufferedResponse
+from ..sessions import REUSE_CASE, REUSE_FILE, get_session_manager
+from ..utils import usagi_user_agent
+from .i_transport import ITransport
+
+requests = lazy_import('requests')
+urllib3 = lazy_import('urllib3')
+connections = lazy_import('usagi.connections')
+unix_socket = lazy_import('usagi.unix_socket')
+
+logger = logging.getLogger(__name__)
+
+MAX_REDIRECTS = 30
+
+
+class RequestsClient(object):
+    """Make the requests of one case with a ``requests`` session.
+
+    """
+
+    def __init__(self, session):
+        super(RequestsClient, self).__init__()
+        self.session = session
+
+    @property
+    def connection_errors(self):
+        return (requests.exceptions.ConnectionError,)
+
+    def request(self, method, url, headers=None, params=None, data=None,
+                files=None):
+        return self.session.request(
+            method, url, headers=headers, params=params, data=data,
+            files=files)
+
+
+class RequestsTransport(ITransport):
+    """Make requests with ``requests``, sharing connection pools
+    between cases with :class:`usagi.sessions.SessionManager`.
+
+    This is the default transport, and the only one supporting
+    in-process applications (the ``app`` option of ``config``).
+
+    """
+
+    def create_client(self, config):
+        return RequestsClient(get_session_manager().create_session(config))
+
+    def connection_pool(self, config):
+        return get_session_manager().connection_pool(config)
+
+    def close(self):
+        get_session_manager().close()
+
+
+class Urllib3Client(object):
+    """Make the requests of one case directly with a
+    ``urllib3.PoolManager``.
+
+    Cookies set by responses are sent with the later requests of the
+    case, regardless of their domain, path or expiry.
+
+    """
+
+    def __init__(self, pool_manager, keep_alive=True):
+        super(Urllib3Client, self).__init__()
+        self.pool_manager = pool_manager
+        self.cookies = {}
+        self.headers = {
+            'User-Agent': usagi_user_agent(),
+            'Accept-Encoding': 'gzip, deflate',
+            'Accept': '*/*',
+        }
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
+    @property
+    def connection_errors(self):
+        return (
+            urllib3.exceptions.MaxRetryError,
+            urllib3.exceptions.NewConnectionError,
+            urllib3.exceptions.ProtocolError,
+        )
+
+    def _fields(self, data, files):
+        if isinstance(data, dict):
+            fields = list(data.items())
+        else:
+            fields = []
+        for name, value in files.items():
+            if isinstance(value, tuple):
+                filename, fh, content_type = value
+                fields.append((name, (filename, fh.read(), content_type)))
+            else:
+                filename = os.path.basename(getattr(value, 'name', name))
+                fields.append((name, (filename, value.read())))
+        return fields
+
+    def _body(self, headers, data, files):
+        if files:
+            body, content_type = urllib3.encode_multipart_formdata(
+                self._fields(data, files))
+            headers['Content-Type'] = content_type
+            return body
+        if isinstance(data, dict):
+            headers.setdefault(
+                'Content-Type', 'application/x-www-form-urlencoded')
+            return urllib.parse.urlencode(data, doseq=True)
+        if isinstance(data, six.text_type):
+            return data.encode('utf-8')
+        return data
+
+    def _update_cookies(self, response):
+        for header in response.headers.getlist('Set-Cookie'):
+            cookie = http_cookies.SimpleCookie()
+            cookie.load(str(header))
+            for name, morsel in cookie.items():
+                if morsel['max-age'] == '0':
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+
+    def request(self, method, url, headers=None, params=None, data=None,
+                files=None):
+        request_headers = dict(self.headers)
+        if headers:
+            request_headers.update(headers)
+        if self.cookies:
+            request_headers['Cookie'] = '; '.join(
+                '{0}={1}'.format(name, value)
+                for name, value in self.cookies.items())
+        if params:
+            separator = '&' if '?' in url else '?'
+            url = url + separator + urllib.parse.urlencode(
+                params, doseq=True)
+        body = self._body(request_headers, data, files or {})
+        response = self.pool_manager.request(
+            method, url, headers=request_headers, body=body,
+            retries=urllib3.Retry(
+                total=None, connect=0, read=0, status=0,
+                redirect=MAX_REDIRECTS, raise_on_redirect=False),
+        )
+        self._update_cookies(response)
+        # Repeated headers are joined, as requests does.
+        headers = [
+            (name, ', '.join(response.headers.getlist(name)))
+            for name in response.headers
+        ]
+        return BufferedResponse(
+            response.status, headers, response.data,
+            url=urllib.parse.urljoin(url, response.geturl() or url),
+            reason=response.reason)
+
+
+class Urllib3Transport(ITransport):
+    """Make requests directly with ``urllib3``.
+
+    This skips the per-request work of ``requests`` (hooks, cookie
+    jars, request preparation and adapter lookup), for high throughput
+    against fast services.  The ``connection``, ``socket`` and
+    ``resolve`` options of ``config`` are honoured.
+
+    """
+
+    def __init__(self):
+        super(Urllib3Transport, self).__init__()
+        self._pool_managers = {}
+        self._lock = threading.Lock()
+
+    def _create_pool_manager(self, config):
+        maxsize = max(
+            config.connection.pool_size, get_session_manager().concurrency)
+        if config.socket is not None:
+            return unix_socket.UnixSocketPoolManager(
+                config.socket, maxsize=maxsize)
+        return connections.ResolvingPoolManager(
+            Resolver(config.resolve), maxsize=maxsize)
+
+    def _get_pool_manager(self, key, config):
+        with self._lock:
+            pool_manager = self._pool_managers.get(key)
+            if pool_manager is None:
+                logger.debug('Creating urllib3 pool manager for %r', key)
+                pool_manager = self._create_pool_manager(config)
+                self._pool_managers[key] = pool_manager
+        return pool_manager
+
+    def _get_shared_pool_manager(self, config):
+        connection = config.connection
+        if connection.reuse == REUSE_CASE:
+            return None
+        if connection.reuse == REUSE_FILE:
+            scope = config.test_filename
+        else:
+            scope = None
+        key = (connection.pool_size, scope, config.socket,
+               Resolver(config.resolve).key)
+        return self._get_pool_manager(key, config)
+
+    def create_client(self, config):
+        if config.app is not None:
+            raise HaasRestTestError(
+                'The urllib3 transport does not support the app option')
+        pool_manager = self._get_shared_pool_manager(config)
+        if pool_manager is None:
+            pool_manager = self._create_pool_manager(config)
+        return Urllib3Client(
+            pool_manager, keep_alive=config.connection.keep_alive)
+
+    def connection_pool(self, config):
+        if config.app is not None or not config.connection.keep_alive:
+            return None
+        pool_manager = self._get_shared_pool_manager(config)
+        if pool_manager is None:
+            return None
+        return pool_manager.connection_from_url(
+            '{0}://{1}/'.format(config.scheme, config.host))
+
+    def close(self):
+        with self._lock:
+            pool_managers = list(self._pool_managers.values())
+            self._pool_managers.clear()
+        for pool_manager in pool_managers:
+            pool_manager.clear()
@@ -10,11 +10,11 @@ import json
 import os
 
 from jsonschema.exceptions import ValidationError
-import jsonschema
-import yaml
 
 from usagi.utils import get_file_path
+from .. import yaml_backend
 from ..exceptions import InvalidVariable, YamlParseError
+from ..schema import validate
 from .i_var_loader import IVarLoader
 
 
@@ -47,7 +47,7 @@ class EnvVarLoader(IVarLoader):
     @classmethod
     def from_dict(cls, name, var_dict):
         try:
-            jsonschema.validate(var_dict, cls._schema)
+            validate(var_dict, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(
@@ -99,7 +99,7 @@ class TemplateVarLoader(IVarLoader):
     @classmethod
     def from_dict(cls, name, var_dict):
         try:
-            jsonschema.validate(var_dict, cls._schema)
+            validate(var_dict, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(name=name, template=var_dict['template'])
@@ -133,7 +133,7 @@ class FileVarLoader(IVarLoader):
     _format_handlers = {
         _format_plain: lambda d: d,
         _format_json: json.loads,
-        _format_yaml: yaml.safe_load,
+        _format_yaml: yaml_backend.safe_load,
     }
 
     _schema = {
@@ -174,7 +174,7 @@ class FileVarLoader(IVarLoader):
     @classmethod
     def from_dict(cls, name, var_dict):
         try:
-            jsonschema.validate(var_dict, cls._schema)
+            validate(var_dict, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(
@@ -234,7 +234,7 @@ class RefVarLoader(IVarLoader):
     @classmethod
     def from_dict(cls, name, var_dict):
         try:
-            jsonschema.validate(var_dict, cls._schema)
+            validate(var_dict, cls._schema)
         except ValidationError as e:
             raise YamlParseError(str(e))
         return cls(
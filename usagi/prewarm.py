@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Open pooled connections to the hosts of a suite before it runs, so
+that the first request of each case does not pay for connection setup.
+
+Enabled with ``--discovery-usagi-prewarm N``, which wraps the
+discovered suite in a :class:`PrewarmingSuite`.  Connections are opened
+when the suite is run, after the runner has set the concurrency, and
+no request is sent on them.  The process and coordinator runners do not
+pre-warm, as their workers make their own connections.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+from multiprocessing.pool import ThreadPool
+import logging
+import threading
+
+from haas.suite import TestSuite, find_test_cases
+
+from .sessions import get_transport
+from .yaml_test_loader import CASE_TESTS_ATTRIBUTE
+
+logger = logging.getLogger(__name__)
+
+MAX_PREWARM_THREADS = 32
+
+
+def find_configs(suite):
+    """The distinct :class:`~usagi.config.Config` objects of the usagi
+    cases in ``suite``, in suite order.
+
+    """
+    seen = set()
+    for test in find_test_cases(suite):
+        case_tests = getattr(test, CASE_TESTS_ATTRIBUTE, None)
+        if case_tests is None or id(case_tests.config) in seen:
+            continue
+        seen.add(id(case_tests.config))
+        yield case_tests.config
+
+
+def find_connection_pools(configs):
+    """The distinct connection pools used by the transports of
+    ``configs``.
+
+    """
+    pools = []
+    for config in configs:
+        try:
+            pool = get_transport(config.transport).connection_pool(config)
+        except Exception:
+            logger.warning('Unable to pre-warm connections to %r',
+                           config.host, exc_info=True)
+            continue
+        if pool is not None and not any(pool is p for p in pools):
+            pools.append(pool)
+    return pools
+
+
+def _connect(connection):
+    try:
+        connection.connect()
+    except Exception as exc:
+        logger.warning('Unable to pre-warm a connection to %r: %s',
+                       connection.host, exc)
+        connection.close()
+        return False
+    return True
+
+
+def prewarm_pools(pools, connections):
+    """Open up to ``connections`` connections in each pool, without
+    sending a request, and return them to the pool to be reused by
+    tests.
+
+    No more connections are opened than a pool can hold.
+
+    Returns
+    -------
+    count : int
+        The number of connections opened.
+
+    """
+    # urllib3 has no public API to open a connection without a request,
+    # so connections are taken from and returned to the pool directly.
+    acquired = []
+    for pool in pools:
+        count = min(connections, pool.pool.maxsize)
+        for _ in range(count):
+            acquired.append((pool, pool._get_conn()))
+    if not acquired:
+        return 0
+    thread_pool = ThreadPool(min(len(acquired), MAX_PREWARM_THREADS))
+    try:
+        connected = thread_pool.map(
+            _connect, [connection for _, connection in acquired])
+    finally:
+        thread_pool.close()
+        thread_pool.join()
+    for (pool, connection), success in zip(acquired, connected):
+        pool._put_conn(connection if success else None)
+    return sum(connected)
+
+
+def prewarm_suite(suite, connections):
+    """Open ``connections`` connections to each distinct host that the
+    cases of ``suite`` connect to.
+
+    """
+    pools = find_connection_pools(find_configs(suite))
+    count = prewarm_pools(pools, connections)
+    logger.info('Pre-warmed %d connections in %d pools', count, len(pools))
+    return count
+
+
+class PrewarmingSuite(TestSuite):
+    """A suite that pre-warms the connections of its cases once, before
+    its first test runs.
+
+    Parameters
+    ----------
+    tests : iterable
+        The tests and suites of the suite.
+    connections : int
+        The number of connections opened to each distinct host.
+
+    """
+
+    def __init__(self, tests=(), connections=0):
+        super(PrewarmingSuite, self).__init__(tests)
+        self.connections = connections
+        self._prewarmed = False
+        self._lock = threading.Lock()
+
+    def prewarm(self):
+        """Pre-warm the connections of the suite, if not already done.
+
+        Runners that do not call the suite call this themselves, once
+        the pool sizes are known.
+
+        """
+        with self._lock:
+            if not self._prewarmed:
+                self._prewarmed = True
+                prewarm_suite(self, self.connections)
+
+    def run(self, result, _state=None):
+        if _state is None:
+            self.prewarm()
+        return super(PrewarmingSuite, self).run(result, _state=_state)
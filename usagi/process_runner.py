@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from contextlib import contextmanager
+from importlib import import_module
+from timeit import default_timer
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+
+from haas.plugins.runner import BaseTestRunner
+from haas.result import ResultCollector, TestResult
+from haas.suite import TestSuite
+
+from .config import Config
+from . import yaml_backend
+from .dns import get_dns_cache
+from .lazy_import import lazy_import
+from .registry import get_registry
+from .runner import CollectingResultHandler, group_test_cases, replay_results
+from .sessions import AppConfig, ConnectionConfig, reset_sessions
+from .var_loader import VarLoader
+from .yaml_test_loader import (
+    CASE_TESTS_ATTRIBUTE, LazyCaseTests, TEST_NAME_ATTRIBUTE,
+    create_test_case_class)
+
+tls = lazy_import('usagi.tls')
+
+logger = logging.getLogger(__name__)
+
+GROUP_CASE = 'case'
+GROUP_FILE = 'file'
+
+START_FORK = 'fork'
+START_FORKSERVER = 'forkserver'
+START_SPAWN = 'spawn'
+
+#: Modules imported by :func:`preload`, that tests use while running.
+PRELOAD_MODULES = (
+    'jq',
+    'jsonschema',
+    'requests',
+    'urllib3',
+    'yaml',
+    'usagi.connections',
+    'usagi.response',
+    'usagi.tls',
+    'usagi.unix_socket',
+)
+
+# The jobs of the current run, inherited by forked workers so that the
+# configuration and fixtures of the cases are never pickled.
+_forked_jobs = None
+
+
+def get_all_start_methods():
+    """The ``multiprocessing`` start methods available on this platform.
+
+    """
+    get_all = getattr(multiprocessing, 'get_all_start_methods', None)
+    if get_all is None:
+        # Python 2 only has the default start method of the platform.
+        return [START_FORK] if os.name == 'posix' else [START_SPAWN]
+    return get_all()
+
+
+def default_start_method():
+    """``'fork'`` where it is available, otherwise ``'spawn'``.
+
+    """
+    if START_FORK in get_all_start_methods():
+        return START_FORK
+    return START_SPAWN
+
+
+def get_context(start_method):
+    """The ``multiprocessing`` context of ``start_method``.
+
+    On Python 2, which has no contexts, this is the ``multiprocessing``
+    module itself, and ``start_method`` must be the default start
+    method of the platform.
+
+    """
+    get = getattr(multiprocessing, 'get_context', None)
+    if get is not None:
+        return get(start_method)
+    if start_method not in get_all_start_methods():
+        raise ValueError(
+            'The {0!r} start method is not available'.format(start_method))
+    return multiprocessing
+
+
+@contextmanager
+def frozen_heap():
+    """Move all objects tracked by the garbage collector to its
+    permanent generation while workers are forked.
+
+    Objects in the permanent generation are never visited by the garbage
+    collector of the workers, which would otherwise copy every page
+    holding a preloaded object.  ``gc.freeze`` is only available from
+    Python 3.7; on older versions this does nothing.
+
+    """
+    freeze = getattr(gc, 'freeze', None)
+    if freeze is None:
+        yield
+        return
+    freeze()
+    try:
+        yield
+    finally:
+        gc.unfreeze()
+
+
+def preload():
+    """Import all plugins and the modules used by running tests, so that
+    forked workers share them with the parent.
+
+    """
+    get_registry().load_all()
+    for name in PRELOAD_MODULES:
+        try:
+            import_module(name)
+        except ImportError:
+            logger.debug('Not preloading %r', name, exc_info=True)
+
+
+class CaseJob(object):
+    """A picklable description of the tests of one generated case,
+    from which a worker process creates the same tests.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the test file defining the case.
+    case_name : str
+        The name of the case.
+    config : usagi.config.Config
+        The configuration of the test file.
+    specs : list
+        The test specifications of the case, in execution order.
+    max_diff : int
+        The ``maxDiff`` of the case.
+    method_names : list
+        The names of the test methods to run.
+
+    """
+
+    def __init__(self, filename, case_name, config, specs, max_diff,
+                 method_names):
+        super(CaseJob, self).__init__()
+        self.filename = filename
+        self.case_name = case_name
+        self.config = config
+        self.specs = specs
+        self.max_diff = max_diff
+        self.method_names = method_names
+
+    @classmethod
+    def from_tests(cls, tests):
+        """Describe the tests of a case, or return ``None`` if they are
+        not generated from a usagi test file.
+
+        """
+        test_class = type(tests[0])
+        case_tests = getattr(test_class, CASE_TESTS_ATTRIBUTE, None)
+        if case_tests is None:
+            return None
+        config = case_tests.config
+        return cls(
+            filename=config.test_filename,
+            case_name=getattr(test_class, TEST_NAME_ATTRIBUTE),
+            config=config,
+            specs=case_tests.specs,
+            max_diff=test_class.maxDiff,
+            method_names=[test._testMethodName for test in tests],
+        )
+
+    def to_dict(self):
+        """Serialize the job to a dictionary of JSON types.
+
+        The variables and test specifications are parsed from YAML and
+        may hold values that JSON can not represent, such as dates or
+        binary data, so they are included as YAML documents.
+
+        """
+        config = self.config
+        app = config.app
+        if app is not None:
+            app = {'target': app.target, 'interface': app.interface}
+        return {
+            'filename': self.filename,
+            'case_name': self.case_name,
+            'config': {
+                'scheme': config.scheme,
+                'host': config.host,
+                'variables': yaml_backend.safe_dump(config.variables),
+                'connection': {
+                    'pool-size': config.connection.pool_size,
+                    'keep-alive': config.connection.keep_alive,
+                    'reuse': config.connection.reuse,
+                },
+                'app': app,
+                'transport': config.transport,
+                'socket': config.socket,
+                'resolve': config.resolve,
+            },
+            'specs': yaml_backend.safe_dump(self.specs),
+            'max_diff': self.max_diff,
+            'method_names': self.method_names,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a job from a dictionary created by :meth:`to_dict`.
+
+        """
+        config = data['config']
+        app = config['app']
+        if app is not None:
+            app = AppConfig.from_dict(app)
+        filename = data['filename']
+        return cls(
+            filename=filename,
+            case_name=data['case_name'],
+            config=Config(
+                scheme=config['scheme'],
+                host=config['host'],
+                variables=yaml_backend.safe_load(config['variables']),
+                var_loader=VarLoader(filename),
+                test_filename=filename,
+                connection=ConnectionConfig.from_dict(config['connection']),
+                app=app,
+                transport=config['transport'],
+                socket=config['socket'],
+                resolve=config['resolve'],
+            ),
+            specs=yaml_backend.safe_load(data['specs']),
+            max_diff=data['max_diff'],
+            method_names=data['method_names'],
+        )
+
+    def create_tests(self):
+        """Create the tests of the case in this process.
+
+        """
+        registry = get_registry()
+        case_tests = LazyCaseTests(
+            self.config, self.specs, registry.assertions,
+            registry.parameters)
+        test_class = create_test_case_class(
+            self.filename, self.case_name, case_tests, self.max_diff)
+        return [test_class(name) for name in self.method_names]
+
+
+def group_jobs(units, group):
+    """Group units of tests into the jobs sent to a worker at once.
+
+    Units of tests generated from test files are described by
+    :class:`~.CaseJob` objects.  With ``group`` ``'file'``, consecutive
+    cases of the same file are sent together, so that they share the
+    connections of one worker.
+
+    Returns
+    -------
+    jobs : list
+        A list of ``(case_jobs, tests)`` pairs, in suite order, where
+        ``tests`` are the tests of the job in this process.
+        ``case_jobs`` is ``None`` for tests that are not generated from
+        test files, which are run in this process.
+
+    """
+    jobs = []
+    current_file = None
+    for tests in units:
+        job = CaseJob.from_tests(tests)
+        if job is None:
+            jobs.append((None, tests))
+            current_file = None
+        elif group == GROUP_FILE and job.filename == current_file:
+            jobs[-1][0].append(job)
+            jobs[-1][1].extend(tests)
+        else:
+            jobs.append(([job], list(tests)))
+            current_file = job.filename
+    return jobs
+
+
+def _initialize_worker():
+    # A forked worker inherits the connections of the parent, which
+    # must not be shared; statistics are reported per job.
+    reset_sessions()
+    get_dns_cache().reset_stats()
+    tls.get_tls_cache().reset_stats()
+
+
+def _run_case_job(job, buffer, failfast):
+    handler = CollectingResultHandler()
+    collector = ResultCollector(buffer=buffer, failfast=failfast)
+    collector.add_result_handler(handler)
+    tests = job.create_tests()
+    TestSuite(tests)(collector)
+    case_tests = getattr(type(tests[0]), CASE_TESTS_ATTRIBUTE)
+    response_sizes = case_tests.response_sizes
+    results = [
+        (result.test_method_name, result.status, result.duration,
+         result.exception, result.message,
+         response_sizes.get(result.test_method_name))
+        for result in handler.results
+    ]
+    return results, collector.shouldStop
+
+
+def run_jobs(jobs, buffer=False, failfast=False):
+    """Run the tests of a list of :class:`~.CaseJob` in a worker process.
+
+    Returns
+    -------
+    results : list
+        For each job, a list of ``(test_method_name, status, duration,
+        exception, message, response_size)`` tuples.
+    dns_stats : usagi.dns.DnsStats
+        The host name lookups made by the jobs.
+    tls_stats : usagi.tls.TlsStats
+        The TLS handshakes made by the jobs.
+
+    """
+    results = []
+    for job in jobs:
+        job_results, should_stop = _run_case_job(job, buffer, failfast)
+        results.append(job_results)
+        if should_stop:
+            break
+    return (results, get_dns_cache().reset_stats(),
+            tls.get_tls_cache().reset_stats())
+
+
+def replay_job_results(result_collector, test_class, job_results):
+    """Report the results of a job run by another process, as returned
+    by :func:`run_jobs`, against the ``test_class`` of its case in this
+    process.
+
+    """
+    response_sizes = getattr(test_class, CASE_TESTS_ATTRIBUTE).response_sizes
+    for name, _, _, _, _, response_size in job_results:
+        response_sizes[name] = response_size
+    replay_results(result_collector, [
+        TestResult(test_class, name, status, duration, exception, message)
+        for name, status, duration, exception, message, _ in job_results
+    ])
+
+
+def _run_jobs(args):
+    return run_jobs(*args)
+
+
+def _run_forked_jobs(args):
+    index, buffer, failfast = args
+    return run_jobs(_forked_jobs[index], buffer, failfast)
+
+
+class ProcessCaseRunner(BaseTestRunner):
+    """A ``haas`` test runner that runs cases in a pool of worker
+    processes, so that CPU-heavy assertions are not limited by the GIL.
+
+    The tests of each case are recreated in a worker from the test
+    specifications and configuration of the case.  Each worker has its
+    own plugin registry and keeps its own pooled connections between
+    the cases it runs.  The outcome and timing of each test are sent
+    back as soon as its case is complete and reported to the result
+    handlers of the parent in the order of the suite, so reporting is
+    the same as with the default runner.  Tests that are not generated
+    from usagi test files run in the parent process.
+
+    With the ``'fork'`` start method, the parent imports all plugins
+    and freezes its garbage collected heap before starting the workers,
+    which share the modules, configuration and file fixtures of the
+    parent copy-on-write instead of importing and unpickling them.
+
+    Parameters
+    ----------
+    processes : int
+        The number of worker processes.  ``0`` uses one process per
+        CPU.
+    group : str
+        ``'case'`` to send cases to the workers one at a time, or
+        ``'file'`` to send all cases of a test file to one worker.
+    start_method : str
+        The ``multiprocessing`` start method of the workers.  Defaults
+        to :func:`default_start_method`.
+    warnings : str
+        The warnings filter action used while running tests.
+
+    """
+
+    def __init__(self, processes=0, group=GROUP_CASE, start_method=None,
+                 warnings=None):
+        super(ProcessCaseRunner, self).__init__(warnings=warnings)
+        if start_method is None:
+            start_method = default_start_method()
+        self.processes = processes
+        self.group = group
+        self.start_method = start_method
+
+    @classmethod
+    def from_args(cls, args, arg_prefix):
+        return cls(
+            processes=getattr(args, arg_prefix + 'usagi_processes'),
+            group=getattr(args, arg_prefix + 'usagi_process_group'),
+            start_method=getattr(args, arg_prefix + 'usagi_start_method'),
+            warnings=args.warnings,
+        )
+
+    @classmethod
+    def add_parser_arguments(cls, parser, option_prefix, dest_prefix):
+        try:
+            parser.add_argument(
+                '{0}usagi-processes'.format(option_prefix),
+                dest='{0}usagi_processes'.format(dest_prefix),
+                type=int, default=0,
+                help=('Number of worker processes of the usagi-processes '
+                      'runner.  0 uses one process per CPU (default 0)'))
+            parser.add_argument(
+                '{0}usagi-process-group'.format(option_prefix),
+                dest='{0}usagi_process_group'.format(dest_prefix),
+                choices=[GROUP_CASE, GROUP_FILE], default=GROUP_CASE,
+                help=('Send cases to the workers of the usagi-processes '
+                      'runner one at a time (case), or a test file at a '
+                      'time (file) (default case)'))
+            parser.add_argument(
+                '{0}usagi-start-method'.format(option_prefix),
+                dest='{0}usagi_start_method'.format(dest_prefix),
+                choices=get_all_start_methods(),
+                default=None,
+                help=('Start method of the workers of the usagi-processes '
+                      'runner (default {0})'.format(
+                          default_start_method())))
+        except argparse.ArgumentError:
+            # The runner may be registered under more than one name.
+            pass
+
+    def _replay_jobs(self, result_collector, case_jobs, results, tests):
+        for job, job_results in zip(case_jobs, results):
+            test_class = type(tests[0])
+            replay_job_results(result_collector, test_class, job_results)
+            if result_collector.shouldStop:
+                return
+            tests = tests[len(job.method_names):]
+
+    def _start_pool(self, processes):
+        context = get_context(self.start_method)
+        start = default_timer()
+        if self.start_method == START_FORKSERVER:
+            context.set_forkserver_preload(
+                list(PRELOAD_MODULES) + [__name__])
+        if self.start_method != START_FORK:
+            pool = context.Pool(
+                processes=processes, initializer=_initialize_worker)
+        else:
+            preload()
+            with frozen_heap():
+                pool = context.Pool(
+                    processes=processes, initializer=_initialize_worker)
+        logger.debug('Started %d %s workers in %.3fs', processes,
+                     self.start_method, default_timer() - start)
+        return pool
+
+    def _run_tests(self, result_collector, suite):
+        global _forked_jobs
+        jobs = group_jobs(group_test_cases(suite), self.group)
+        remote_jobs = [
+            case_jobs for case_jobs, _ in jobs if case_jobs is not None]
+        options = (result_collector.buffer, result_collector.failfast)
+        if self.start_method == START_FORK:
+            _forked_jobs = remote_jobs
+            run = _run_forked_jobs
+            tasks = [(index,) + options for index in range(len(remote_jobs))]
+        else:
+            run = _run_jobs
+            tasks = [(case_jobs,) + options for case_jobs in remote_jobs]
+        pool = self._start_pool(self.processes or multiprocessing.cpu_count())
+        try:
+            # imap yields in submission order, so results are replayed
+            # in suite order as soon as each job is complete.
+            remote_results = pool.imap(run, tasks)
+            for case_jobs, tests in jobs:
+                if case_jobs is None:
+                    TestSuite(tests)(result_collector)
+                else:
+                    results, dns_stats, tls_stats = next(remote_results)
+                    get_dns_cache().merge_stats(dns_stats)
+                    tls.get_tls_cache().merge_stats(tls_stats)
+                    self._replay_jobs(
+                        result_collector, case_jobs, results, tests)
+                if result_collector.shouldStop:
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+            _forked_jobs = None
+
+    def run(self, result_collector, test_to_run):
+        """Run the cases of the suite in worker processes.
+
+        """
+        def test(result):
+            self._run_tests(result_collector, test_to_run)
+        return super(ProcessCaseRunner, self).run(result_collector, test)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import threading
+
+try:  # pragma: no cover
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
+
+from .manifest import (
+    default_manifest_path, load_manifest, write_manifest)
+
+logger = logging.getLogger(__name__)
+
+ASSERTIONS = 'usagi.assertions'
+PARAMETERS = 'usagi.parameters'
+VAR_LOADERS = 'usagi.var_loaders'
+TRANSPORTS = 'usagi.transports'
+
+
+def _entry_point_target(entry_point):
+    value = getattr(entry_point, 'value', None)
+    if value is not None:
+        return value
+    # pkg_resources.EntryPoint
+    return '{0}:{1}'.format(
+        entry_point.module_name, '.'.join(entry_point.attrs))
+
+
+def _entry_point_version(entry_point):
+    version = getattr(entry_point, 'version', None)
+    if version is not None:
+        return version
+    dist = getattr(entry_point, 'dist', None)
+    return getattr(dist, 'version', '')
+
+
+def _scan_entry_points(namespaces):
+    """Enumerate the entry points of all ``namespaces`` in a single scan
+    of the installed distributions, without importing any plugin.
+
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # pragma: no cover
+        import pkg_resources
+        return dict(
+            (namespace, list(pkg_resources.iter_entry_points(namespace)))
+            for namespace in namespaces
+        )
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, 'select'):
+        return dict(
+            (namespace, list(all_entry_points.select(group=namespace)))
+            for namespace in namespaces
+        )
+    return dict(  # pragma: no cover
+        (namespace, list(all_entry_points.get(namespace, ())))
+        for namespace in namespaces
+    )
+
+
+class PluginNamespace(Mapping):
+    """A read-only mapping of plugin name to plugin class for a single
+    entry point namespace.
+
+    A plugin is only imported the first time its name is looked up.
+
+    """
+
+    def __init__(self, namespace, entry_points):
+        super(PluginNamespace, self).__init__()
+        self.namespace = namespace
+        self._entry_points = {}
+        for entry_point in entry_points:
+            if entry_point.name in self._entry_points:
+                logger.warning('Ignoring duplicate %s plugin %r', namespace,
+                               entry_point.name)
+                continue
+            self._entry_points[entry_point.name] = entry_point
+        self._plugins = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        try:
+            return self._plugins[name]
+        except KeyError:
+            pass
+        entry_point = self._entry_points[name]
+        with self._lock:
+            if name not in self._plugins:
+                logger.debug('Loading %s plugin %r', self.namespace, name)
+                self._plugins[name] = entry_point.load()
+        return self._plugins[name]
+
+    def __contains__(self, name):
+        return name in self._entry_points
+
+    def __iter__(self):
+        return iter(self._entry_points)
+
+    def __len__(self):
+        return len(self._entry_points)
+
+    def specs(self):
+        """Describe the plugins without importing them.
+
+        Returns
+        -------
+        specs : dict
+            Mapping of plugin name to a ``'module:attr (version)'``
+            string.
+
+        """
+        return dict(
+            (name, '{0} ({1})'.format(
+                _entry_point_target(entry_point),
+                _entry_point_version(entry_point)))
+            for name, entry_point in self._entry_points.items()
+        )
+
+
+class PluginRegistry(object):
+    """The assertion, test parameter, var loader and transport plugins
+    available to usagi.
+
+    Entry points are enumerated once, on first access to any
+    namespace.  If an up-to-date plugin manifest (written by ``usagi
+    write-manifest``) exists, it is used instead of scanning the
+    installed distributions.
+
+    Parameters
+    ----------
+    manifest_path : str
+        The path of the plugin manifest.  Defaults to
+        :func:`usagi.manifest.default_manifest_path`.
+
+    """
+
+    namespaces = (ASSERTIONS, PARAMETERS, VAR_LOADERS, TRANSPORTS)
+
+    def __init__(self, manifest_path=None):
+        super(PluginRegistry, self).__init__()
+        if manifest_path is None:
+            manifest_path = default_manifest_path()
+        self.manifest_path = manifest_path
+        self._plugin_namespaces = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        entry_points = load_manifest(self.manifest_path, self.namespaces)
+        if entry_points is not None:
+            logger.debug('Using plugin manifest %r', self.manifest_path)
+            return entry_points
+        return _scan_entry_points(self.namespaces)
+
+    def get_namespace(self, namespace):
+        if self._plugin_namespaces is None:
+            with self._lock:
+                if self._plugin_namespaces is None:
+                    scanned = self._scan()
+                    self._plugin_namespaces = dict(
+                        (name, PluginNamespace(name, entry_points))
+                        for name, entry_points in scanned.items()
+                    )
+        return self._plugin_namespaces[namespace]
+
+    @property
+    def assertions(self):
+        return self.get_namespace(ASSERTIONS)
+
+    @property
+    def parameters(self):
+        return self.get_namespace(PARAMETERS)
+
+    @property
+    def var_loaders(self):
+        return self.get_namespace(VAR_LOADERS)
+
+    @property
+    def transports(self):
+        return self.get_namespace(TRANSPORTS)
+
+    def load_all(self):
+        """Import every plugin.
+
+        Plugins that can not be imported are logged, and fail as usual
+        when they are used.
+
+        """
+        for namespace in self.namespaces:
+            plugins = self.get_namespace(namespace)
+            for name in plugins:
+                try:
+                    plugins[name]
+                except Exception:
+                    logger.warning('Unable to load %s plugin %r', namespace,
+                                   name, exc_info=True)
+
+    def specs(self):
+        """Describe all plugins without importing them.
+
+        Returns
+        -------
+        specs : dict
+            Mapping of ``'namespace:name'`` to plugin description.
+
+        """
+        specs = {}
+        for namespace in self.namespaces:
+            for name, spec in self.get_namespace(namespace).specs().items():
+                specs['{0}:{1}'.format(namespace, name)] = spec
+        return specs
+
+
+def write_plugin_manifest(path=None):
+    """Write a manifest of the currently installed plugins, for use by
+    :class:`~.PluginRegistry` at startup.
+
+    """
+    if path is None:
+        path = default_manifest_path()
+    scanned = _scan_entry_points(PluginRegistry.namespaces)
+    plugins = dict(
+        (namespace, [
+            {
+                'name': entry_point.name,
+                'value': _entry_point_target(entry_point),
+                'version': _entry_point_version(entry_point),
+            }
+            for entry_point in entry_points
+        ])
+        for namespace, entry_points in scanned.items()
+    )
+    write_manifest(path, plugins)
+    return path
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Get the process-wide :class:`~.PluginRegistry`.
+
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PluginRegistry()
+    return _registry
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+from .lazy_import import lazy_import
+
+requests_structures = lazy_import('requests.structures')
+requests_utils = lazy_import('requests.utils')
+
+
+class BufferedResponse(object):
+    """A fully read HTTP response providing the parts of the
+    ``requests.Response`` interface used by assertion plugins.
+
+    This adapts responses from HTTP clients other than ``requests`` so
+    that :meth:`IAssertion.run() <usagi.plugins.i_assertion.IAssertion.run>`
+    receives the same interface regardless of how the request was made.
+
+    Parameters
+    ----------
+    status_code : int
+        The HTTP status code.
+    headers : mapping or list
+        The response headers, as a mapping or ``(name, value)`` pairs.
+    content : bytes
+        The response body.
+    url : str
+        The final URL of the request.
+    reason : str
+        The HTTP reason phrase.
+    encoding : str
+        The encoding of the body, if known.  Defaults to the charset
+        of the ``Content-Type`` header.
+
+    """
+
+    def __init__(self, status_code, headers, content, url=None,
+                 reason=None, encoding=None):
+        super(BufferedResponse, self).__init__()
+        self.status_code = status_code
+        self.headers = requests_structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.reason = reason
+        if encoding is None:
+            encoding = requests_utils.get_encoding_from_headers(self.headers)
+        self.encoding = encoding
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        encoding = self.encoding or 'utf-8'
+        return self.content.decode(encoding, 'replace')
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
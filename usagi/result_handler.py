@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from collections import defaultdict
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from haas.plugins.i_result_handler_plugin import IResultHandlerPlugin
+from haas.plugins.result_handler import TimingResultHandler
+from haas.result import separator2
+
+from .dns import get_dns_cache
+from .lazy_import import lazy_import
+from .sharding import case_key, load_durations, relative_path
+from .yaml_test_loader import (
+    CASE_TESTS_ATTRIBUTE, TEST_INDEX_ATTRIBUTE, TEST_NAME_ATTRIBUTE)
+
+history = lazy_import('usagi.history')
+tls = lazy_import('usagi.tls')
+
+logger = logging.getLogger(__name__)
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class _SummaryResultHandler(IResultHandlerPlugin):
+    # A result handler printing a report at the end of the test run,
+    # enabled by its own option or the haas timing report.
+
+    separator2 = separator2
+
+    help = None
+
+    def __init__(self, stream=None):
+        super(_SummaryResultHandler, self).__init__()
+        if stream is None:
+            stream = sys.stderr
+        self.stream = stream
+        self.enabled = True
+
+    @classmethod
+    def from_args(cls, args, name, dest_prefix, test_count):
+        summarize = getattr(
+            args, 'summarize_test_time', TimingResultHandler.OPTION_DEFAULT)
+        if getattr(args, dest_prefix) or \
+                summarize is not TimingResultHandler.OPTION_DEFAULT:
+            return cls()
+
+    @classmethod
+    def add_parser_arguments(cls, parser, name, option_prefix, dest_prefix):
+        parser.add_argument(
+            option_prefix, action='store_true', default=False,
+            dest=dest_prefix, help=cls.help)
+
+    def start_test(self, test):
+        pass
+
+    def stop_test(self, test):
+        pass
+
+    def start_test_run(self):
+        pass
+
+    def stop_test_run(self):
+        self.print_summary()
+
+    def summary_lines(self):
+        raise NotImplementedError()
+
+    def print_summary(self):
+        self.stream.write('\n'.join(self.summary_lines()))
+        self.stream.flush()
+
+    def __call__(self, result):
+        pass
+
+
+class DnsStatsResultHandler(_SummaryResultHandler):
+    """A ``haas`` result handler reporting the host name resolution of
+    the test run.
+
+    Enabled with ``--with-usagi-dns``, or together with the ``haas``
+    timing report (``--summarize-test-time``), after which it is
+    printed.
+
+    Parameters
+    ----------
+    stream : file
+        The stream to write the report to.  Defaults to
+        ``sys.stderr``.
+
+    """
+
+    help = 'Report host name lookups made by usagi tests'
+
+    def summary_lines(self):
+        stats = get_dns_cache().stats
+        return [
+            '',
+            '',
+            'DNS resolution report',
+            self.separator2,
+            '  Lookups      {0}'.format(stats.lookups),
+            '  Lookup time  {0:.3f}s'.format(stats.lookup_time),
+            '  Cache hits   {0}'.format(stats.hits),
+            '  Overrides    {0}'.format(stats.overrides),
+            '',
+        ]
+
+
+class TlsStatsResultHandler(_SummaryResultHandler):
+    """A ``haas`` result handler reporting the TLS handshakes of the
+    test run.
+
+    Enabled with ``--with-usagi-tls``, or together with the ``haas``
+    timing report (``--summarize-test-time``), after which it is
+    printed.
+
+    Parameters
+    ----------
+    stream : file
+        The stream to write the report to.  Defaults to
+        ``sys.stderr``.
+
+    """
+
+    help = 'Report full and resumed TLS handshakes made by usagi tests'
+
+    def summary_lines(self):
+        stats = tls.get_tls_cache().stats
+        return [
+            '',
+            '',
+            'TLS handshake report',
+            self.separator2,
+            '  Full handshakes     {0}'.format(stats.full_handshakes),
+            '  Resumed handshakes  {0}'.format(stats.resumed_handshakes),
+            '',
+        ]
+
+
+class DurationsResultHandler(IResultHandlerPlugin):
+    """A ``haas`` result handler recording the total duration of each
+    usagi case of the test run in a JSON file, used to balance shards
+    with ``--discovery-usagi-shard-durations``.
+
+    Enabled with ``--with-usagi-durations FILE``.  Durations already
+    in the file are kept for cases that did not run.
+
+    Parameters
+    ----------
+    path : str
+        The path of the JSON file.
+
+    """
+
+    def __init__(self, path):
+        super(DurationsResultHandler, self).__init__()
+        self.path = path
+        self.durations = defaultdict(float)
+        self.enabled = True
+
+    @classmethod
+    def from_args(cls, args, name, dest_prefix, test_count):
+        path = getattr(args, dest_prefix)
+        if path is not None:
+            return cls(path)
+
+    @classmethod
+    def add_parser_arguments(cls, parser, name, option_prefix, dest_prefix):
+        parser.add_argument(
+            option_prefix, dest=dest_prefix, default=None, metavar='FILE',
+            help=('Record the duration of each usagi case in FILE, to '
+                  'balance shards with --discovery-usagi-shard-durations'))
+
+    def start_test(self, test):
+        pass
+
+    def stop_test(self, test):
+        pass
+
+    def start_test_run(self):
+        pass
+
+    def stop_test_run(self):
+        self.write()
+
+    def write(self):
+        durations = {}
+        if os.path.exists(self.path):
+            durations = load_durations([self.path])
+        durations.update(self.durations)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(durations, fh, indent=0, sort_keys=True)
+            _replace(temp_path, self.path)
+        except (IOError, OSError):
+            logger.warning('Unable to write case durations to %r',
+                           self.path, exc_info=True)
+
+    def __call__(self, result):
+        test_class = result.test_class
+        case_tests = getattr(test_class, CASE_TESTS_ATTRIBUTE, None)
+        if case_tests is None or result.duration is None:
+            return
+        key = case_key(case_tests.config.test_filename,
+                       getattr(test_class, TEST_NAME_ATTRIBUTE))
+        self.durations[key] += result.duration.total_seconds
+
+
+class HistoryResultHandler(IResultHandlerPlugin):
+    """A ``haas`` result handler adding the file, case, name, duration,
+    outcome and response size of each usagi test of the run to a
+    :class:`usagi.history.HistoryStore`.
+
+    Enabled with ``--with-usagi-history [FILE]``.  Results are kept in
+    memory and written in a single transaction at the end of the run.
+
+    Parameters
+    ----------
+    path : str
+        The path of the history database.
+
+    """
+
+    def __init__(self, path):
+        super(HistoryResultHandler, self).__init__()
+        self.path = path
+        self.records = []
+        self.started = None
+        self.enabled = True
+
+    @classmethod
+    def from_args(cls, args, name, dest_prefix, test_count):
+        path = getattr(args, dest_prefix)
+        if path is not None:
+            return cls(path)
+
+    @classmethod
+    def add_parser_arguments(cls, parser, name, option_prefix, dest_prefix):
+        parser.add_argument(
+            option_prefix, dest=dest_prefix, nargs='?', default=None,
+            const=history.DEFAULT_HISTORY_PATH, metavar='FILE',
+            help=('Record the outcome, duration and response size of '
+                  'each usagi test in the history database FILE '
+                  '(default {0})'.format(history.DEFAULT_HISTORY_PATH)))
+
+    def start_test(self, test):
+        pass
+
+    def stop_test(self, test):
+        pass
+
+    def start_test_run(self):
+        self.started = time.time()
+
+    def stop_test_run(self):
+        self.write()
+
+    def write(self):
+        try:
+            with history.HistoryStore(self.path) as store:
+                store.add_run(self.records, self.started)
+        except history.Error:
+            logger.warning('Unable to write test history to %r',
+                           self.path, exc_info=True)
+
+    def __call__(self, result):
+        test_class = result.test_class
+        case_tests = getattr(test_class, CASE_TESTS_ATTRIBUTE, None)
+        if case_tests is None or result.duration is None:
+            return
+        name = result.test_method_name
+        method = getattr(test_class, name)
+        self.records.append((
+            relative_path(case_tests.config.test_filename),
+            getattr(test_class, TEST_NAME_ATTRIBUTE),
+            getattr(method, TEST_INDEX_ATTRIBUTE),
+            getattr(method, TEST_NAME_ATTRIBUTE),
+            result.duration.total_seconds,
+            result.status.name,
+            case_tests.response_sizes.get(name),
+        ))
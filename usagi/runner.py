@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from multiprocessing.pool import ThreadPool
+import argparse
+import logging
+import threading
+
+from haas.plugins.i_result_handler_plugin import IResultHandlerPlugin
+from haas.plugins.runner import BaseTestRunner
+from haas.result import ResultCollector
+from haas.suite import TestSuite, find_test_cases
+
+from .prewarm import PrewarmingSuite
+from .sessions import get_session_manager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREADS = 8
+
+
+class CollectingResultHandler(IResultHandlerPlugin):
+    """A result handler that keeps the :class:`~haas.result.TestResult`
+    of each test, to be replayed into the main result collector.
+
+    """
+
+    def __init__(self):
+        super(CollectingResultHandler, self).__init__()
+        self.results = []
+
+    # To keep the interface happy
+    @classmethod
+    def from_args(cls, args, name, dest_prefix,
+                  test_count):  # pragma: no cover
+        pass
+
+    # To keep the interface happy
+    @classmethod
+    def add_parser_arguments(cls, parser, name, option_prefix,
+                             dest_prefix):  # pragma: no cover
+        pass
+
+    def start_test(self, test):
+        pass
+
+    def stop_test(self, test):
+        pass
+
+    def start_test_run(self):
+        pass
+
+    def stop_test_run(self):
+        pass
+
+    def __call__(self, result):
+        self.results.append(result)
+
+
+def group_test_cases(suite):
+    """Split a suite into units that must run serially.
+
+    All tests of one generated case share a ``TestCase`` class and form
+    a single unit, run in order in one thread.  Units are returned in
+    the order of the suite.
+
+    """
+    units = []
+    current_class = None
+    for test in find_test_cases(suite):
+        if type(test) is not current_class:
+            current_class = type(test)
+            units.append([])
+        units[-1].append(test)
+    return units
+
+
+def replay_results(result_collector, results):
+    """Report results collected by another ``ResultCollector`` to
+    ``result_collector``.
+
+    If ``result_collector`` is in failfast mode, it is stopped at the
+    first unsuccessful result.
+
+    """
+    for test_result in results:
+        test = test_result.test
+        result_collector.startTest(test, test_result.duration.start_time)
+        result_collector.add_result(test_result)
+        result_collector.stopTest(test)
+        if result_collector.failfast and \
+                not result_collector.wasSuccessful():
+            result_collector.stop()
+
+
+class ThreadedCaseRunner(BaseTestRunner):
+    """A ``haas`` test runner that runs independent cases concurrently
+    on a pool of threads.
+
+    The tests of a case always run serially, in order, in one thread,
+    so that setup, teardown and tests that depend on each other keep
+    working.  Results are reported to the result handlers in the order
+    of the suite, not the order of completion, so output is
+    deterministic.
+
+    Parameters
+    ----------
+    threads : int
+        The number of cases that run at the same time.
+    warnings : str
+        The warnings filter action used while running tests.
+
+    """
+
+    def __init__(self, threads=DEFAULT_THREADS, warnings=None):
+        super(ThreadedCaseRunner, self).__init__(warnings=warnings)
+        self.threads = threads
+
+    @classmethod
+    def from_args(cls, args, arg_prefix):
+        return cls(
+            threads=getattr(args, arg_prefix + 'usagi_threads'),
+            warnings=args.warnings,
+        )
+
+    @classmethod
+    def add_parser_arguments(cls, parser, option_prefix, dest_prefix):
+        try:
+            parser.add_argument(
+                '{0}usagi-threads'.format(option_prefix),
+                dest='{0}usagi_threads'.format(dest_prefix),
+                type=int, default=DEFAULT_THREADS,
+                help=('Number of cases run at the same time by the '
+                      'usagi-threaded runner (default {0})'.format(
+                          DEFAULT_THREADS)))
+        except argparse.ArgumentError:
+            # The runner may be registered under more than one name.
+            pass
+
+    def _run_unit(self, result_collector, stop_event, tests):
+        handler = CollectingResultHandler()
+        if stop_event.is_set():
+            return handler.results
+        # Output can not be buffered per test, as sys.stdout is shared
+        # by all threads.
+        collector = ResultCollector(
+            buffer=False, failfast=result_collector.failfast)
+        collector.add_result_handler(handler)
+        TestSuite(tests)(collector)
+        if collector.shouldStop:
+            # Do not start any further cases
+            stop_event.set()
+        return handler.results
+
+    def _run_tests(self, result_collector, suite):
+        units = group_test_cases(suite)
+        get_session_manager().concurrency = self.threads
+        if isinstance(suite, PrewarmingSuite):
+            # The suite is not called, so pre-warm it here, now that
+            # the pool sizes are known.
+            suite.prewarm()
+        stop_event = threading.Event()
+        pool = ThreadPool(processes=self.threads)
+        try:
+            def run_unit(tests):
+                return self._run_unit(result_collector, stop_event, tests)
+            # imap yields in submission order, so results are replayed
+            # in suite order as soon as each case is complete.
+            for results in pool.imap(run_unit, units):
+                replay_results(result_collector, results)
+                if result_collector.shouldStop:
+                    # Cases after the first failure may already have
+                    # run; their results are not reported.
+                    stop_event.set()
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def run(self, result_collector, test_to_run):
+        """Run the cases of the suite concurrently.
+
+        """
+        def test(result):
+            self._run_tests(result_collector, test_to_run)
+        return super(ThreadedCaseRunner, self).run(result_collector, test)
@@ -6,6 +6,13 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from __future__ import absolute_import, unicode_literals
 
+import logging
+
+from jsonschema.exceptions import best_match
+import jsonschema
+
+logger = logging.getLogger(__name__)
+
 SCHEMA = {
     '$schema': 'http://json-schema.org/draft-04/schema#',
     'title': 'Haas Rest Test test cases',
@@ -31,8 +38,71 @@ SCHEMA = {
                         {'$ref': '#/definitions/template_var'},
                     ],
                 },
+                'socket': {
+                    'description': 'Path of a Unix domain socket to connect to instead of host',  # noqa
+                    'oneOf': [
+                        {'$ref': '#/definitions/env_var'},
+                        {'$ref': '#/definitions/simple_var'},
+                        {'$ref': '#/definitions/template_var'},
+                    ],
+                },
+                'resolve': {
+                    'type': 'object',
+                    'description': 'Mapping of host or host:port to the address to connect to',  # noqa
+                    'additionalProperties': {'type': 'string'},
+                },
+                'connection': {
+                    'type': 'object',
+                    'description': 'Reuse of HTTP connections between tests',  # noqa
+                    'properties': {
+                        'pool-size': {
+                            'type': 'integer',
+                            'minimum': 1,
+                            'default': 10,
+                        },
+                        'keep-alive': {
+                            'type': 'boolean',
+                            'default': True,
+                        },
+                        'reuse': {
+                            'enum': ['process', 'file', 'case'],
+                            'default': 'process',
+                        },
+                    },
+                    'additionalProperties': False,
+                },
+                'transport': {
+                    'type': 'string',
+                    'description': 'The name of the usagi.transports plugin used to make requests',  # noqa
+                    'default': 'requests',
+                },
+                'app': {
+                    'description': 'A Python WSGI or ASGI application called in the test process instead of connecting to host',  # noqa
+                    'oneOf': [
+                        {'type': 'string', 'pattern': '^[^:]+:[^:]+$'},
+                        {
+                            'type': 'object',
+                            'properties': {
+                                'target': {
+                                    'type': 'string',
+                                    'pattern': '^[^:]+:[^:]+$',
+                                },
+                                'interface': {
+                                    'enum': ['auto', 'wsgi', 'asgi'],
+                                    'default': 'auto',
+                                },
+                            },
+                            'required': ['target'],
+                            'additionalProperties': False,
+                        },
+                    ],
+                },
             },
-            'required': ['host'],
+            'anyOf': [
+                {'required': ['host']},
+                {'required': ['app']},
+                {'required': ['socket']},
+            ],
         },
         'test-pre-definitions': {
             'type': 'object',
@@ -121,6 +191,9 @@ SCHEMA = {
                 'max-diff': {
                     '$ref': '#/definitions/max-diff',
                 },
+                'tags': {
+                    '$ref': '#/definitions/tags',
+                },
             },
             'required': ['name', 'tests'],
         },
@@ -158,6 +231,9 @@ SCHEMA = {
                     'type': 'array',
                     'minItems': 1,
                 },
+                'tags': {
+                    '$ref': '#/definitions/tags',
+                },
             },
             'required': ['url', 'name'],
         },
@@ -165,5 +241,137 @@ SCHEMA = {
             'type': ['number', 'null'],
             'description': 'Set the case maxDiff option to control error output',  # noqa
         },
+        'tags': {
+            'description': 'Tags used to select cases and tests to run',
+            'type': 'array',
+            'items': {
+                'type': 'string',
+            },
+        },
     },
 }
+
+
+#: Schema of the first document of a multi-document test file, holding
+#: the configuration shared by the case documents that follow it.
+STREAM_HEADER_SCHEMA = {
+    '$schema': SCHEMA['$schema'],
+    'title': 'Haas Rest Test test stream header',
+    'description': 'Configuration of a multi-document test file',
+    'type': 'object',
+    'properties': dict(
+        (name, value) for name, value in SCHEMA['properties'].items()
+        if name != 'cases'
+    ),
+    'required': ['version', 'config'],
+    'not': {'required': ['cases']},
+    'definitions': SCHEMA['definitions'],
+}
+
+#: Schema of each case document of a multi-document test file.
+CASE_SCHEMA = {
+    '$schema': SCHEMA['$schema'],
+    'title': 'Haas Rest Test test case',
+    'allOf': [{'$ref': '#/definitions/case'}],
+    'definitions': SCHEMA['definitions'],
+}
+
+VALIDATOR_BACKEND_JSONSCHEMA = 'jsonschema'
+VALIDATOR_BACKEND_FASTJSONSCHEMA = 'fastjsonschema'
+
+# Validators are keyed by the id() of the schema; the schema itself is
+# kept alive alongside the validator so that the id cannot be reused.
+_validators = {}
+_fast_validators = {}
+_validator_backend = VALIDATOR_BACKEND_JSONSCHEMA
+
+
+def set_validator_backend(backend):
+    """Select the backend used by :func:`~.validate`.
+
+    Parameters
+    ----------
+    backend : str
+        ``'jsonschema'`` (the default) or ``'fastjsonschema'``.  The
+        ``fastjsonschema`` backend generates Python code for each
+        schema, and requires the optional ``fastjsonschema`` package.
+        It is only used to accept valid data; errors are always
+        reported by ``jsonschema``.
+
+    """
+    global _validator_backend
+    if backend == VALIDATOR_BACKEND_FASTJSONSCHEMA:
+        try:
+            import fastjsonschema  # noqa
+        except ImportError:
+            logger.warning(
+                'fastjsonschema is not installed; using jsonschema')
+            backend = VALIDATOR_BACKEND_JSONSCHEMA
+    elif backend != VALIDATOR_BACKEND_JSONSCHEMA:
+        raise ValueError('Unknown validator backend {0!r}'.format(backend))
+    _validator_backend = backend
+
+
+def get_validator_backend():
+    return _validator_backend
+
+
+def get_validator(schema):
+    """Get the ``jsonschema`` validator for ``schema``.
+
+    The schema is checked and the validator constructed only the first
+    time it is requested; the same validator is returned for the life
+    of the process.
+
+    """
+    try:
+        return _validators[id(schema)][1]
+    except KeyError:
+        pass
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    validator = cls(schema)
+    _validators[id(schema)] = (schema, validator)
+    return validator
+
+
+def _get_fast_validator(schema):
+    try:
+        return _fast_validators[id(schema)][1]
+    except KeyError:
+        pass
+    import fastjsonschema
+    try:
+        validator = fastjsonschema.compile(schema)
+    except fastjsonschema.JsonSchemaDefinitionException:
+        logger.debug('Unable to compile schema %r', schema.get('title'),
+                     exc_info=True)
+        validator = None
+    _fast_validators[id(schema)] = (schema, validator)
+    return validator
+
+
+def validate(instance, schema):
+    """Validate ``instance`` against ``schema`` with a cached validator.
+
+    This is equivalent to :func:`jsonschema.validate`.
+
+    Raises
+    ------
+    jsonschema.exceptions.ValidationError
+        If the instance is invalid.
+
+    """
+    if _validator_backend == VALIDATOR_BACKEND_FASTJSONSCHEMA:
+        import fastjsonschema
+        fast_validator = _get_fast_validator(schema)
+        if fast_validator is not None:
+            try:
+                fast_validator(instance)
+            except fastjsonschema.JsonSchemaException:
+                pass
+            else:
+                return
+    error = best_match(get_validator(schema).iter_errors(instance))
+    if error is not None:
+        raise error
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from fnmatch import fnmatchcase
+
+from .sharding import case_key
+
+
+def _matches_any(name, patterns):
+    return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+
+class TestSelector(object):
+    """Select the cases and tests to construct from a parsed test file.
+
+    Selection is applied to the case specifications before any
+    ``TestCase`` or :class:`~usagi.web_test.WebTest` is created, so
+    unselected cases cost only the YAML parse.
+
+    Parameters
+    ----------
+    case_patterns : list
+        Glob patterns matched against case names.  A case is selected
+        if it matches any pattern.  All cases are selected if empty.
+    test_patterns : list
+        Glob patterns matched against test names.  A test is selected
+        if it matches any pattern.  All tests are selected if empty.
+    tags : list
+        A test is selected if it, or its case, has any of these tags.
+        Tags are not considered if empty.
+    shard : usagi.sharding.Shard
+        Optional shard of the suite; only the cases assigned to it are
+        selected.
+
+    """
+
+    __test__ = False
+
+    def __init__(self, case_patterns=(), test_patterns=(), tags=(),
+                 shard=None):
+        super(TestSelector, self).__init__()
+        self.case_patterns = list(case_patterns or ())
+        self.test_patterns = list(test_patterns or ())
+        self.tags = set(tags or ())
+        self.shard = shard
+
+    @property
+    def filters_all(self):
+        return not (self.case_patterns or self.test_patterns or self.tags)
+
+    @property
+    def selects_all(self):
+        return self.filters_all and self.shard is None
+
+    def _select_test(self, test, case_tags):
+        if self.test_patterns and \
+                not _matches_any(test['name'], self.test_patterns):
+            return False
+        if self.tags:
+            tags = case_tags.union(test.get('tags', ()))
+            if self.tags.isdisjoint(tags):
+                return False
+        return True
+
+    def select_case(self, case, filename=None):
+        """Select the tests of a case.
+
+        Case setup and teardown tests are always kept for a selected
+        case.
+
+        Parameters
+        ----------
+        case : dict
+            The case specification.
+        filename : str
+            The path of the test file of the case, used to assign it to
+            a shard.
+
+        Returns
+        -------
+        case : dict
+            A copy of ``case`` containing only the selected tests, or
+            ``None`` if no tests of the case are selected.
+
+        """
+        case = self.filter_case(case)
+        if case is None or self.shard is None or \
+                self.shard.selects(case_key(filename, case['name'])):
+            return case
+        return None
+
+    def filter_case(self, case):
+        """Select the tests of a case by name and tag, regardless of the
+        shard.
+
+        """
+        if self.filters_all:
+            return case
+        if self.case_patterns and \
+                not _matches_any(case['name'], self.case_patterns):
+            return None
+        case_tags = set(case.get('tags', ()))
+        tests = [test for test in case['tests']
+                 if self._select_test(test, case_tags)]
+        if len(tests) == 0:
+            return None
+        if len(tests) == len(case['tests']):
+            return case
+        case = case.copy()
+        case['tests'] = tests
+        return case
+
+    def select_cases(self, cases, filename=None):
+        """Generate the selected cases from a list of case
+        specifications.
+
+        """
+        for case in cases:
+            case = self.select_case(case, filename)
+            if case is not None:
+                yield case
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import threading
+
+from .dns import Resolver
+from .exceptions import HaasRestTestError
+from .lazy_import import lazy_import
+from .registry import get_registry
+from .utils import create_session as create_plain_session
+
+requests = lazy_import('requests')
+app_transport = lazy_import('usagi.app_transport')
+connections = lazy_import('usagi.connections')
+unix_socket = lazy_import('usagi.unix_socket')
+
+logger = logging.getLogger(__name__)
+
+REUSE_PROCESS = 'process'
+REUSE_FILE = 'file'
+REUSE_CASE = 'case'
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TRANSPORT = 'requests'
+
+
+class ConnectionConfig(object):
+    """The ``connection`` section of the test file ``config``.
+
+    Parameters
+    ----------
+    pool_size : int
+        The maximum number of connections kept open to each host.
+    keep_alive : bool
+        If ``False``, every request uses a new connection.
+    reuse : str
+        The scope across which connections are reused: ``'process'``
+        (all cases of all test files), ``'file'`` (the cases of one test
+        file) or ``'case'`` (the tests of a single case).
+
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, keep_alive=True,
+                 reuse=REUSE_PROCESS):
+        super(ConnectionConfig, self).__init__()
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.reuse = reuse
+
+    @classmethod
+    def from_dict(cls, connection):
+        return cls(
+            pool_size=connection.get('pool-size', DEFAULT_POOL_SIZE),
+            keep_alive=connection.get('keep-alive', True),
+            reuse=connection.get('reuse', REUSE_PROCESS),
+        )
+
+
+class AppConfig(object):
+    """The ``app`` section of the test file ``config``.
+
+    Parameters
+    ----------
+    target : str
+        The application to test, as ``'module:attribute'``.
+    interface : str
+        ``'wsgi'``, ``'asgi'`` or ``'auto'`` to detect the interface of
+        the application.
+
+    """
+
+    def __init__(self, target, interface='auto'):
+        super(AppConfig, self).__init__()
+        self.target = target
+        self.interface = interface
+
+    @classmethod
+    def from_dict(cls, app):
+        if isinstance(app, dict):
+            return cls(
+                target=app['target'],
+                interface=app.get('interface', 'auto'),
+            )
+        return cls(target=app)
+
+    @property
+    def key(self):
+        return (self.target, self.interface)
+
+
+class SessionManager(object):
+    """Create the ``requests`` sessions used by cases, sharing
+    connection pools between them.
+
+    Each case gets its own session, so cookies are never shared
+    between cases.  The transport adapter, which holds the pool of
+    open connections, is shared by all sessions with the same scheme,
+    host and pool size within the configured reuse scope, so
+    keep-alive connections survive case boundaries.
+
+    Host names are resolved through the process-wide
+    :class:`~usagi.dns.DnsCache`, with the ``resolve`` overrides of the
+    test file.  If the test file names a Unix domain ``socket``, the
+    pooled
+    connections are made to the socket.  If it names an in-process
+    application, requests are instead sent to that application by an
+    adapter shared by all cases that test it.
+
+    Attributes
+    ----------
+    concurrency : int
+        The number of cases that may run at the same time.  Pools hold
+        at least this many connections, so that concurrent cases do not
+        discard each other's connections.
+
+    """
+
+    def __init__(self):
+        super(SessionManager, self).__init__()
+        self.concurrency = 1
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def _create_adapter(self, config):
+        kwargs = dict(
+            pool_connections=1,
+            pool_maxsize=max(config.connection.pool_size, self.concurrency),
+        )
+        if config.socket is not None:
+            return unix_socket.UnixSocketAdapter(config.socket, **kwargs)
+        return connections.ResolvingAdapter(
+            Resolver(config.resolve), **kwargs)
+
+    def _get_adapter(self, key, config):
+        with self._lock:
+            adapter = self._adapters.get(key)
+            if adapter is None:
+                logger.debug('Creating connection pool for %r', key)
+                adapter = self._create_adapter(config)
+                self._adapters[key] = adapter
+        return adapter
+
+    def _get_app_adapter(self, app):
+        with self._lock:
+            adapter = self._adapters.get(app.key)
+            if adapter is None:
+                logger.debug('Loading application %r', app.target)
+                adapter = app_transport.create_app_adapter(
+                    app.target, app.interface)
+                self._adapters[app.key] = adapter
+        return adapter
+
+    def _get_shared_adapter(self, config):
+        # The adapter shared by cases of the reuse scope of config, or
+        # None if connections are not reused between cases.
+        connection = config.connection
+        if not connection.keep_alive or connection.reuse == REUSE_CASE:
+            return None
+        if connection.reuse == REUSE_FILE:
+            scope = config.test_filename
+        else:
+            scope = None
+        key = (config.scheme, config.host, connection.pool_size, scope,
+               config.socket, Resolver(config.resolve).key)
+        return self._get_adapter(key, config)
+
+    def create_session(self, config):
+        """Create a session for a case.
+
+        Parameters
+        ----------
+        config : usagi.config.Config
+            The configuration of the test file containing the case.
+
+        """
+        session = create_plain_session()
+        prefix = '{0}://{1}/'.format(config.scheme, config.host)
+        if config.app is not None:
+            session.mount(prefix, self._get_app_adapter(config.app))
+            return session
+        if not config.connection.keep_alive:
+            session.headers['Connection'] = 'close'
+        adapter = self._get_shared_adapter(config)
+        if adapter is None:
+            adapter = self._create_adapter(config)
+        session.mount(prefix, adapter)
+        return session
+
+    def connection_pool(self, config):
+        """The ``urllib3`` connection pool shared by the cases of
+        ``config`` for requests to its host, or ``None`` if connections
+        are not shared.
+
+        """
+        if config.app is not None:
+            return None
+        adapter = self._get_shared_adapter(config)
+        if adapter is None:
+            return None
+        url = '{0}://{1}/'.format(config.scheme, config.host)
+        session = create_plain_session()
+        settings = session.merge_environment_settings(
+            url, {}, None, None, None)
+        if hasattr(adapter, 'get_connection_with_tls_context'):
+            request = requests.Request('GET', url).prepare()
+            return adapter.get_connection_with_tls_context(
+                request, settings['verify'], proxies=settings['proxies'],
+                cert=settings['cert'])
+        return adapter.get_connection(  # pragma: no cover
+            url, settings['proxies'])
+
+    def close(self):
+        """Close all pooled connections.
+
+        """
+        with self._lock:
+            adapters = list(self._adapters.values())
+            self._adapters.clear()
+        for adapter in adapters:
+            adapter.close()
+
+
+_session_manager = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager():
+    """Get the process-wide :class:`~.SessionManager`.
+
+    """
+    global _session_manager
+    if _session_manager is None:
+        with _session_manager_lock:
+            if _session_manager is None:
+                _session_manager = SessionManager()
+    return _session_manager
+
+
+def create_session(config):
+    """Create a session for a case using the process-wide
+    :class:`~.SessionManager`.
+
+    """
+    return get_session_manager().create_session(config)
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(name):
+    """Get the process-wide instance of the transport plugin ``name``.
+
+    """
+    try:
+        return _transports[name]
+    except KeyError:
+        pass
+    with _transports_lock:
+        if name not in _transports:
+            transports = get_registry().transports
+            if name not in transports:
+                raise HaasRestTestError(
+                    'Unknown transport {0!r}'.format(name))
+            _transports[name] = transports[name]()
+    return _transports[name]
+
+
+def create_client(config):
+    """Create the transport client used by the tests of one case.
+
+    """
+    return get_transport(config.transport).create_client(config)
+
+
+def reset_sessions():
+    """Forget the process-wide :class:`~.SessionManager` and transports
+    without closing their connections.
+
+    For use in a child process forked from a process that has already
+    made requests: the inherited connections belong to the parent.
+
+    """
+    global _session_manager
+    with _session_manager_lock:
+        _session_manager = None
+    with _transports_lock:
+        _transports.clear()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""Split the cases of a suite into disjoint shards run by separate jobs.
+
+Cases are identified by a key made of the path of their test file,
+relative to the current directory, and their name, so all jobs of a
+run assign every case to the same shard.  By default a case is assigned
+by a hash of its key.  Given the recorded duration of each case, cases
+are instead assigned longest first to the shard with the least total
+duration, so that all shards take about the same time.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import heapq
+import json
+import logging
+import os
+
+from .lazy_import import lazy_import
+
+history = lazy_import('usagi.history')
+
+logger = logging.getLogger(__name__)
+
+KEY_SEPARATOR = '::'
+
+
+def relative_path(filename):
+    """The path of a test file relative to the current directory, with
+    ``/`` separators.
+
+    """
+    try:
+        path = os.path.relpath(filename)
+    except ValueError:
+        # On another drive than the current directory.
+        path = os.path.abspath(filename)
+    return path.replace(os.sep, '/')
+
+
+def case_key(filename, case_name):
+    """The key identifying a case in shard assignments and recorded
+    durations.
+
+    """
+    return '{0}{1}{2}'.format(
+        relative_path(filename), KEY_SEPARATOR, case_name)
+
+
+def parse_shard(value):
+    """Parse a shard given as ``'i/N'``, with ``i`` from ``1`` to ``N``.
+
+    Returns
+    -------
+    shard : tuple
+        The zero-based ``(index, count)`` of the shard.
+
+    """
+    index, separator, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError('Invalid shard {0!r}, expected i/N'.format(value))
+    if not separator or count < 1 or not 1 <= index <= count:
+        raise ValueError(
+            'Invalid shard {0!r}, expected i/N with 1 <= i <= N'.format(
+                value))
+    return index - 1, count
+
+
+def load_durations(paths):
+    """Load and merge the case durations recorded in ``paths``, JSON
+    files or :class:`usagi.history.HistoryStore` databases.  Later files
+    take precedence, and missing files are ignored.
+
+    """
+    durations = {}
+    for path in paths:
+        if not os.path.exists(path):
+            logger.warning('No case durations recorded in %r', path)
+        elif history.is_history_file(path):
+            with history.HistoryStore(path) as store:
+                durations.update(store.case_durations())
+        else:
+            with open(path) as fh:
+                durations.update(json.load(fh))
+    return durations
+
+
+def hash_shard(key, count):
+    """The shard of a case key, by hash.
+
+    """
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % count
+
+
+def assign_by_duration(keys, durations, count):
+    """Assign cases to ``count`` shards with the longest processing time
+    first rule, in which each case, longest first, goes to the shard
+    with the least total duration.
+
+    Cases without a recorded duration are assumed to take the mean
+    recorded duration.
+
+    Returns
+    -------
+    assignments : dict
+        The zero-based shard of each key.
+
+    """
+    keys = set(keys)
+    known = [durations[key] for key in keys if key in durations]
+    default = sum(known) / len(known) if known else 1.0
+    weights = dict((key, durations.get(key, default)) for key in keys)
+    loads = [(0.0, index) for index in range(count)]
+    assignments = {}
+    for key in sorted(keys, key=lambda key: (-weights[key], key)):
+        load, index = heapq.heappop(loads)
+        assignments[key] = index
+        heapq.heappush(loads, (load + weights[key], index))
+    return assignments
+
+
+class Shard(object):
+    """The shard of the suite run by this job.
+
+    Parameters
+    ----------
+    index : int
+        The zero-based index of the shard.
+    count : int
+        The number of shards.
+    durations : dict
+        Optional recorded durations of cases by key, used by
+        :meth:`balance`.
+
+    """
+
+    def __init__(self, index, count, durations=None):
+        super(Shard, self).__init__()
+        self.index = index
+        self.count = count
+        self.durations = durations
+        self.assignments = {}
+
+    @property
+    def balanced(self):
+        """``True`` if the cases are assigned by duration, which
+        requires the keys of all cases before any is selected.
+
+        """
+        return self.durations is not None
+
+    def balance(self, keys):
+        """Assign the cases ``keys`` to shards by their duration.
+
+        """
+        self.assignments = assign_by_duration(
+            keys, self.durations, self.count)
+
+    def selects(self, key):
+        shard = self.assignments.get(key)
+        if shard is None:
+            shard = hash_shard(key, self.count)
+        return shard == self.index
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""An ASGI application used by the in-process transport tests.
+
+This module requires Python 3.5 or later.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+
+async def app(scope, receive, send):
+    message = await receive()
+    headers = dict(
+        (name.decode('latin-1'), value.decode('latin-1'))
+        for name, value in scope['headers'])
+    body = json.dumps({
+        'method': scope['method'],
+        'path': scope['path'],
+        'query': scope['query_string'].decode('latin-1'),
+        'host': headers.get('host'),
+        'body': message['body'].decode('utf-8'),
+    }).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': 201 if scope['method'] == 'POST' else 200,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'x-interface', b'asgi'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def no_response(scope, receive, send):
+    await receive()
+
+
+async def failing(scope, receive, send):
+    raise ValueError('broken')
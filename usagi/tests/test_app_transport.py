@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import json
+import sys
+import textwrap
+
+import yaml
+
+from haas.loader import Loader
+from haas.result import ResultCollecter
+from haas.suite import find_test_cases
+from haas.testing import unittest
+
+from ..app_transport import WSGIAdapter, create_app_adapter, load_app
+from ..config import Config
+from ..exceptions import HaasRestTestError
+from ..sessions import SessionManager
+from ..yaml_test_loader import YamlTestLoader
+from .utils import make_config
+
+WSGI_TARGET = 'usagi.tests.test_app_transport:wsgi_app'
+ASGI_TARGET = 'usagi.tests.asgi_app:app'
+
+requires_asgi = unittest.skipIf(
+    sys.version_info < (3, 5), 'ASGI requires Python 3.5')
+
+
+def wsgi_app(environ, start_response):
+    length = int(environ.get('CONTENT_LENGTH') or 0)
+    body = json.dumps({
+        'method': environ['REQUEST_METHOD'],
+        'path': environ['PATH_INFO'],
+        'query': environ['QUERY_STRING'],
+        'host': environ['HTTP_HOST'],
+        'content_type': environ.get('CONTENT_TYPE'),
+        'cookie': environ.get('HTTP_COOKIE'),
+        'body': environ['wsgi.input'].read(length).decode('utf-8'),
+    }).encode('utf-8')
+    headers = [
+        (str('Content-Type'), str('application/json')),
+        (str('X-Interface'), str('wsgi')),
+    ]
+    if environ['PATH_INFO'] == '/login':
+        headers.append((str('Set-Cookie'), str('session=abc; Path=/')))
+    start_response(str('200 OK'), headers)
+    return [body]
+
+
+def no_response_wsgi_app(environ, start_response):
+    return []
+
+
+class TestAppConfig(unittest.TestCase):
+
+    def test_target_string(self):
+        # When
+        config = make_config(app=WSGI_TARGET)
+
+        # Then
+        self.assertEqual(config.host, 'localhost')
+        self.assertEqual(config.app.target, WSGI_TARGET)
+        self.assertEqual(config.app.interface, 'auto')
+
+    def test_target_mapping(self):
+        # When
+        config = Config.from_dict(
+            {'host': 'api.test', 'app': {
+                'target': WSGI_TARGET, 'interface': 'wsgi'}},
+            '/path/to/test.yml')
+
+        # Then
+        self.assertEqual(config.host, 'api.test')
+        self.assertEqual(config.app.interface, 'wsgi')
+
+    def test_no_app(self):
+        # When
+        config = Config.from_dict({'host': 'api.test'}, '/path/to/test.yml')
+
+        # Then
+        self.assertIsNone(config.app)
+
+    def test_load_app_invalid_target(self):
+        # When/Then
+        with self.assertRaises(HaasRestTestError):
+            load_app('usagi.tests.test_app_transport')
+
+    def test_interface_detected(self):
+        # When
+        adapter = create_app_adapter(WSGI_TARGET)
+
+        # Then
+        self.assertIsInstance(adapter, WSGIAdapter)
+        self.assertIs(adapter.app, wsgi_app)
+
+    @requires_asgi
+    def test_asgi_interface_detected(self):
+        # Given
+        from ..asgi import ASGIAdapter
+
+        # When
+        adapter = create_app_adapter(ASGI_TARGET)
+
+        # Then
+        self.assertIsInstance(adapter, ASGIAdapter)
+        adapter.close()
+
+
+class TestAppTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = SessionManager()
+
+    def tearDown(self):
+        self.manager.close()
+
+    def test_wsgi_request(self):
+        # Given
+        session = self.manager.create_session(make_config(app=WSGI_TARGET))
+
+        # When
+        response = session.post(
+            'http://localhost/some%20path?q=1', json={'key': 'value'})
+
+        # Then
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.reason, 'OK')
+        self.assertEqual(response.headers['x-interface'], 'wsgi')
+        self.assertEqual(response.json(), {
+            'method': 'POST',
+            'path': '/some path',
+            'query': 'q=1',
+            'host': 'localhost',
+            'content_type': 'application/json',
+            'cookie': None,
+            'body': '{"key": "value"}',
+        })
+
+    def test_wsgi_cookies(self):
+        # Given
+        session = self.manager.create_session(make_config(app=WSGI_TARGET))
+
+        # When
+        session.get('http://localhost/login')
+        response = session.get('http://localhost/')
+
+        # Then
+        self.assertEqual(session.cookies['session'], 'abc')
+        self.assertEqual(response.json()['cookie'], 'session=abc')
+
+    def test_adapter_shared(self):
+        # Given
+        config = make_config(app=WSGI_TARGET)
+
+        # When
+        session_1 = self.manager.create_session(config)
+        session_2 = self.manager.create_session(config)
+
+        # Then
+        self.assertIs(
+            session_1.get_adapter('http://localhost/'),
+            session_2.get_adapter('http://localhost/'))
+        self.assertIsInstance(
+            session_1.get_adapter('http://localhost/'), WSGIAdapter)
+
+    @requires_asgi
+    def test_asgi_request(self):
+        # Given
+        session = self.manager.create_session(make_config(app=ASGI_TARGET))
+
+        # When
+        response = session.post(
+            'http://localhost/items?page=2', data='hello')
+
+        # Then
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.reason, 'Created')
+        self.assertEqual(response.headers['x-interface'], 'asgi')
+        self.assertEqual(response.json(), {
+            'method': 'POST',
+            'path': '/items',
+            'query': 'page=2',
+            'host': 'localhost',
+            'body': 'hello',
+        })
+
+    def test_wsgi_no_start_response(self):
+        # Given
+        target = 'usagi.tests.test_app_transport:no_response_wsgi_app'
+        session = self.manager.create_session(make_config(app=target))
+
+        # When
+        with self.assertRaises(HaasRestTestError) as exc:
+            session.get('http://localhost/')
+
+        # Then
+        self.assertIn(target, str(exc.exception))
+        self.assertIn('start_response', str(exc.exception))
+
+    @requires_asgi
+    def test_asgi_no_response_start(self):
+        for target in ('usagi.tests.asgi_app:no_response',
+                       'usagi.tests.asgi_app:failing'):
+            # Given
+            session = self.manager.create_session(make_config(app=target))
+
+            # When
+            with self.assertRaises(HaasRestTestError) as exc:
+                session.get('http://localhost/')
+
+            # Then
+            self.assertIn(target, str(exc.exception))
+            self.assertIn('http.response.start', str(exc.exception))
+
+    def test_yaml_case(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+        ---
+          version: '1.0'
+
+          config:
+            app: {target}
+
+          cases:
+            - name: "In process"
+              tests:
+                - name: "Log in"
+                  url: "/login"
+                  assertions:
+                    - name: status_code
+                      expected: 200
+                    - name: header
+                      header: X-Interface
+                      value: wsgi
+                - name: "Cookie sent"
+                  url: "/"
+                  assertions:
+                    - name: body
+                      format: json
+                      lookup-var: false
+                      value:
+                        method: GET
+                        path: /
+                        query: ''
+                        host: localhost
+                        content_type: null
+                        cookie: session=abc
+                        body: ''
+        """).format(target=WSGI_TARGET)
+        loader = YamlTestLoader(Loader())
+        suite = loader.load_tests_from_yaml(
+            yaml.safe_load(test_yaml), '/path/to/test.yml')
+        result = ResultCollecter()
+
+        # When
+        for case in find_test_cases(suite):
+            case(result)
+
+        # Then
+        self.assertEqual(result.testsRun, 2)
+        self.assertTrue(result.wasSuccessful())
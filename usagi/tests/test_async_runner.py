@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+import threading
+
+import yaml
+
+from haas.loader import Loader
+from haas.result import ResultCollector
+from haas.suite import TestSuite, find_test_cases
+from haas.testing import unittest
+
+from ..async_engine import AiohttpClient
+from ..async_runner import AsyncCaseRunner
+from ..history import HistoryStore
+from ..response import BufferedResponse
+from ..result_handler import HistoryResultHandler
+from ..yaml_test_loader import YamlTestLoader
+from .utils import WSGIServerTestCase, run_suite, short_test_name
+
+if sys.version_info >= (3, 5):
+    import asyncio
+else:  # pragma: no cover
+    asyncio = None
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+TEST_YAML = textwrap.dedent("""
+  version: '1.0'
+
+  config:
+    host: test.domain
+
+  cases:
+    - name: "Slow"
+      tests:
+        - name: "First"
+          url: "/slow"
+          assertions:
+            - name: status_code
+              expected: 200
+        - name: "Second"
+          url: "/fast"
+          assertions:
+            - name: status_code
+              expected: 200
+    - name: "Fast"
+      tests:
+        - name: "Failing"
+          url: "/fast"
+          assertions:
+            - name: status_code
+              expected: 404
+        - name: "Unreachable"
+          url: "/down"
+    - name: "Poll"
+      tests:
+        - name: "Eventually"
+          url: "/eventually"
+          poll:
+            period: 0
+            timeout: 5
+          assertions:
+            - name: status_code
+              expected: 200
+""")
+
+
+class FakeConnectionError(Exception):
+    pass
+
+
+def _done(value):
+    future = asyncio.get_event_loop().create_future()
+    future.set_result(value)
+    return future
+
+
+class FakeClient(object):
+
+    connection_errors = (FakeConnectionError,)
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def request(self, method, url, **kwargs):
+        transport = self.transport
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        path = url[len('http://test.domain'):]
+        transport.requests.append(path)
+        if path == '/down':
+            future.set_exception(FakeConnectionError('refused'))
+            return future
+        if path == '/eventually':
+            transport.polls += 1
+            status = 200 if transport.polls >= 3 else 503
+            delay = 0
+        else:
+            status = 200
+            delay = 0.1 if path == '/slow' else 0
+        transport.in_flight += 1
+        transport.max_in_flight = max(
+            transport.max_in_flight, transport.in_flight)
+
+        def respond():
+            transport.in_flight -= 1
+            future.set_result(
+                BufferedResponse(status, {}, path.encode('ascii')))
+        loop.call_later(delay, respond)
+        return future
+
+
+class FakeClientContext(object):
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def __aenter__(self):
+        self.transport.clients += 1
+        return _done(FakeClient(self.transport))
+
+    def __aexit__(self, *exc_info):
+        return _done(None)
+
+
+class FakeTransport(object):
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.requests = []
+        self.clients = 0
+        self.polls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __aenter__(self):
+        return _done(self)
+
+    def __aexit__(self, *exc_info):
+        return _done(None)
+
+    def client(self):
+        return FakeClientContext(self)
+
+
+class _LocalTest(unittest.TestCase):
+
+    def test_local(self):
+        self.thread = threading.current_thread()
+
+
+@unittest.skipIf(asyncio is None, 'Requires Python 3.5')
+class TestAsyncCaseRunner(unittest.TestCase):
+
+    def setUp(self):
+        loader = YamlTestLoader(Loader())
+        self.suite = loader.load_tests_from_yaml(
+            yaml.safe_load(TEST_YAML), '/path/to/test_async.yml')
+        self.transports = []
+
+    def _transport_factory(self, concurrency):
+        transport = FakeTransport(concurrency)
+        self.transports.append(transport)
+        return transport
+
+    def _run(self, concurrency, failfast=False):
+        runner = AsyncCaseRunner(
+            concurrency=concurrency,
+            transport_factory=self._transport_factory)
+        return run_suite(runner, self.suite, failfast=failfast)
+
+    def test_results_in_suite_order(self):
+        # When
+        collector, results = self._run(concurrency=10)
+
+        # Then
+        transport, = self.transports
+        self.assertEqual(transport.clients, 3)
+        self.assertEqual(transport.max_in_flight, 3)
+        self.assertEqual(
+            [short_test_name(result.test) for result in results],
+            [short_test_name(test) for test in find_test_cases(self.suite)])
+        statuses = [result.status.name for result in results]
+        self.assertEqual(
+            statuses, ['success', 'success', 'failure', 'failure',
+                       'success'])
+        self.assertIn('Unable to connect', results[3].exception)
+        self.assertEqual(transport.polls, 3)
+        self.assertFalse(collector.wasSuccessful())
+
+    def test_concurrency_limit(self):
+        # When
+        collector, results = self._run(concurrency=1)
+
+        # Then
+        transport, = self.transports
+        self.assertEqual(transport.max_in_flight, 1)
+        self.assertEqual(transport.requests[:2], ['/slow', '/fast'])
+        self.assertEqual(len(results), 5)
+
+    def test_failfast(self):
+        # When
+        collector, results = self._run(concurrency=1, failfast=True)
+
+        # Then
+        self.assertTrue(collector.shouldStop)
+        self.assertEqual(
+            [short_test_name(result.test) for result in results],
+            ["'Slow:First'", "'Slow:Second'", "'Fast:Failing'"])
+
+    def test_local_cases_run_in_threads(self):
+        # Given
+        local_test = _LocalTest('test_local')
+        self.suite = TestSuite([self.suite, local_test])
+
+        # When
+        collector, results = self._run(concurrency=10)
+
+        # Then
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[-1].status.name, 'success')
+        # Not run on the thread of the event loop
+        self.assertIsNot(local_test.thread, threading.current_thread())
+
+    def test_response_sizes_recorded(self):
+        # Given
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, 'history.sqlite')
+        handler = HistoryResultHandler(path)
+        runner = AsyncCaseRunner(
+            concurrency=10, transport_factory=self._transport_factory)
+        collector = ResultCollector()
+        collector.add_result_handler(handler)
+
+        # When
+        handler.start_test_run()
+        runner.run(collector, self.suite)
+        handler.stop_test_run()
+
+        # Then
+        with HistoryStore(path) as store:
+            sizes = [(row[3], row[6]) for row in store.results()]
+        self.assertEqual(sizes, [
+            ('First', 5), ('Second', 5), ('Failing', 5),
+            ('Unreachable', None), ('Eventually', 11)])
+
+    def test_parser_arguments(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--warnings', default=None)
+
+        # When
+        AsyncCaseRunner.add_parser_arguments(parser, '--runner-', 'runner_')
+        args = parser.parse_args(['--runner-usagi-concurrency', '500'])
+        runner = AsyncCaseRunner.from_args(args, 'runner_')
+
+        # Then
+        self.assertEqual(runner.concurrency, 500)
+
+
+class FakeSessionResponse(object):
+
+    status = 200
+    headers = {'Set-Cookie': 'a=1', 'set-cookie': 'b=2'}
+    url = 'http://test.domain/'
+    reason = 'OK'
+
+    def __aenter__(self):
+        return _done(self)
+
+    def __aexit__(self, *exc_info):
+        return _done(None)
+
+    def read(self):
+        return _done(b'')
+
+
+class FakeSession(object):
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append(kwargs)
+        return FakeSessionResponse()
+
+
+@unittest.skipIf(asyncio is None, 'Requires Python 3.5')
+class TestAiohttpClient(unittest.TestCase):
+
+    def test_repeated_headers(self):
+        # Given
+        client = AiohttpClient(FakeSession())
+
+        # When
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        response = loop.run_until_complete(
+            client.request('GET', 'http://test.domain/'))
+
+        # Then
+        self.assertEqual(response.headers['set-cookie'], 'a=1, b=2')
+
+    def test_query_params_formatted(self):
+        # Given
+        session = FakeSession()
+        client = AiohttpClient(session)
+        params = {'flag': True, 'count': 3, 'ratio': 0.5, 'name': 'x',
+                  'missing': None}
+
+        # When
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        loop.run_until_complete(
+            client.request('GET', 'http://test.domain/', params=params))
+
+        # Then
+        request, = session.requests
+        self.assertEqual(
+            sorted(request['params']),
+            [('count', '3'), ('flag', 'True'), ('name', 'x'),
+             ('ratio', '0.5')])
+
+
+QUERY_YAML = textwrap.dedent("""
+  version: '1.0'
+
+  config:
+    host: 127.0.0.1:{port}
+
+  cases:
+    - name: "Query"
+      tests:
+        - name: "Params"
+          url: "/query"
+          parameters:
+            queryparams:
+              flag: true
+              count: 3
+          assertions:
+            - name: status_code
+              expected: 200
+        - name: "Missing"
+          url: "/missing"
+          assertions:
+            - name: status_code
+              expected: 404
+""")
+
+
+def query_app(environ, start_response):
+    query = sorted(environ['QUERY_STRING'].split('&'))
+    if environ['PATH_INFO'] == '/query' and query == ['count=3',
+                                                      'flag=True']:
+        status = str('200 OK')
+    else:
+        status = str('404 Not Found')
+    start_response(status, [(str('Content-Type'), str('text/plain'))])
+    return [b'']
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp not installed')
+class TestAiohttpTransport(WSGIServerTestCase):
+
+    app = staticmethod(query_app)
+
+    def test_run(self):
+        # Given
+        loader = YamlTestLoader(Loader())
+        test_yaml = QUERY_YAML.format(port=self.server.server_port)
+        suite = loader.load_tests_from_yaml(
+            yaml.safe_load(test_yaml), '/path/to/test_aiohttp.yml')
+        runner = AsyncCaseRunner(concurrency=2)
+
+        # When
+        collector, results = run_suite(runner, suite)
+
+        # Then
+        self.assertTrue(collector.wasSuccessful())
+        self.assertEqual(
+            [result.status.name for result in results],
+            ['success', 'success'])
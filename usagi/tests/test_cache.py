@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import textwrap
+
+from mock import Mock, patch
+
+from haas.loader import Loader
+from haas.testing import unittest
+
+from ..cache import ParsedFileCache, environment_key
+from ..schema import (
+    VALIDATOR_BACKEND_FASTJSONSCHEMA, VALIDATOR_BACKEND_JSONSCHEMA)
+from ..yaml_test_loader import YamlTestLoader
+
+
+class TestParsedFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(
+            prefix='usagi-', suffix='.tmp')
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.test_filename = os.path.join(self.temp_dir, 'test_file.yml')
+        with open(self.test_filename, 'wb') as fh:
+            fh.write(b'data')
+        self.cache = ParsedFileCache(self.cache_dir, 'key')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cache_miss(self):
+        # Given
+        parse = Mock(return_value=({'data': 1}, None))
+
+        # When
+        result = self.cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 1}, None))
+        parse.assert_called_once_with(b'data')
+
+    def test_cache_hit(self):
+        # Given
+        parse = Mock(return_value=({'data': 1}, 'error'))
+        self.cache.load(self.test_filename, parse)
+        parse.reset_mock()
+        cache = ParsedFileCache(self.cache_dir, 'key')
+
+        # When
+        result = cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 1}, 'error'))
+        self.assertFalse(parse.called)
+
+    def test_cache_hit_touched_file(self):
+        # Given
+        parse = Mock(return_value=({'data': 1}, None))
+        self.cache.load(self.test_filename, parse)
+        parse.reset_mock()
+        stat = os.stat(self.test_filename)
+        os.utime(self.test_filename, (stat.st_atime, stat.st_mtime + 10))
+
+        # When
+        result = self.cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 1}, None))
+        self.assertFalse(parse.called)
+
+    def test_cache_modified_file(self):
+        # Given
+        parse = Mock(return_value=({'data': 1}, None))
+        self.cache.load(self.test_filename, parse)
+        with open(self.test_filename, 'wb') as fh:
+            fh.write(b'new data')
+        parse = Mock(return_value=({'data': 2}, None))
+
+        # When
+        result = self.cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 2}, None))
+        parse.assert_called_once_with(b'new data')
+
+    def test_cache_rewritten_file(self):
+        # Given
+        parse = Mock(return_value=({'data': 1}, None))
+        self.cache.load(self.test_filename, parse)
+        stat = os.stat(self.test_filename)
+        with open(self.test_filename, 'wb') as fh:
+            fh.write(b'DATA')
+        # Rewritten within the resolution of the modification time
+        os.utime(self.test_filename, (stat.st_atime, stat.st_mtime))
+        parse = Mock(return_value=({'data': 2}, None))
+
+        # When
+        result = self.cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 2}, None))
+        parse.assert_called_once_with(b'DATA')
+
+    def test_cache_validator_backend_changed(self):
+        # Given
+        with patch('usagi.cache.get_validator_backend',
+                   return_value=VALIDATOR_BACKEND_JSONSCHEMA):
+            self.cache.load(
+                self.test_filename, Mock(return_value=({'data': 1}, None)))
+        parse = Mock(return_value=({'data': 2}, 'error'))
+
+        # When
+        with patch('usagi.cache.get_validator_backend',
+                   return_value=VALIDATOR_BACKEND_FASTJSONSCHEMA):
+            result = self.cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 2}, 'error'))
+        self.assertTrue(parse.called)
+
+    def test_cache_environment_changed(self):
+        # Given
+        self.cache.load(
+            self.test_filename, Mock(return_value=({'data': 1}, None)))
+        cache = ParsedFileCache(self.cache_dir, 'other-key')
+        parse = Mock(return_value=({'data': 2}, None))
+
+        # When
+        result = cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 2}, None))
+        self.assertTrue(parse.called)
+
+    def test_cache_corrupt_entry(self):
+        # Given
+        self.cache.load(
+            self.test_filename, Mock(return_value=({'data': 1}, None)))
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), 'wb') as fh:
+                fh.write(b'corrupt')
+        parse = Mock(return_value=({'data': 2}, None))
+
+        # When
+        result = self.cache.load(self.test_filename, parse)
+
+        # Then
+        self.assertEqual(result, ({'data': 2}, None))
+
+    def test_environment_key(self):
+        # When
+        spec = 'usagi.plugins.assertions:StatusCodeAssertion (0.4.0)'
+        key1 = environment_key({'usagi.assertions:status_code': spec})
+        key2 = environment_key({'usagi.assertions:status_code': spec})
+        key3 = environment_key({})
+
+        # Then
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+
+
+class TestYamlTestLoaderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(
+            prefix='usagi-', suffix='.tmp')
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_tests_from_cached_file(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+        ---
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Test root URL"
+                  url: "/"
+        """)
+        test_filename = os.path.join(self.temp_dir, 'test_file.yml')
+        with open(test_filename, 'wb') as fh:
+            fh.write(test_yaml.encode('utf-8'))
+        YamlTestLoader(Loader(), cache_dir=self.cache_dir).\
+            load_tests_from_file(test_filename)
+        loader = YamlTestLoader(Loader(), cache_dir=self.cache_dir)
+
+        # When
+        suite = loader.load_tests_from_file(test_filename)
+
+        # Then
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertEqual(suite.countTestCases(), 1)
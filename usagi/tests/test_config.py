@@ -6,6 +6,8 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from __future__ import absolute_import, unicode_literals
 
+import pickle
+
 from haas.testing import unittest
 
 from .utils import environment
@@ -47,3 +49,32 @@ class TestTemplateVariables(unittest.TestCase):
 
         # Then
         self.assertEqual(config.host, expected)
+
+
+class TestPickle(unittest.TestCase):
+
+    def test_round_trip(self):
+        # Given
+        config_dict = {
+            'host': {
+                'type': 'template',
+                'template': '{var1}.domain',
+            },
+            'vars': {'var1': 'host'},
+            'connection': {'pool-size': 3},
+            'resolve': {'host.domain': '127.0.0.1'},
+        }
+        config = Config.from_dict(config_dict, __file__)
+
+        # When
+        loaded = pickle.loads(pickle.dumps(config))
+
+        # Then
+        self.assertEqual(loaded.host, 'host.domain')
+        self.assertEqual(loaded.variables, {'var1': 'host'})
+        self.assertEqual(loaded.connection.pool_size, 3)
+        self.assertEqual(loaded.resolve, {'host.domain': '127.0.0.1'})
+        self.assertEqual(
+            loaded.load_variable('url', {'type': 'template',
+                                         'template': '/{var1}'}),
+            '/host')
@@ -6,16 +6,27 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from __future__ import absolute_import, unicode_literals
 
+import argparse
+import json
 import os
 import shutil
 import tempfile
 import textwrap
 
+from mock import patch
+
 from haas.loader import Loader
+from haas.module_import_error import ModuleImportError
 from haas.suite import find_test_cases, TestSuite
 from haas.testing import unittest
 
 from ..discoverer import RestTestDiscoverer
+from ..dns import DEFAULT_TTL, get_dns_cache
+from ..history import ORDER_FAILED, HistoryStore
+from ..prewarm import PrewarmingSuite
+from ..schema import VALIDATOR_BACKEND_FASTJSONSCHEMA
+from ..sharding import case_key, relative_path
+from ..yaml_test_loader import create_test_case_for_case
 
 
 class TestDiscoverer(unittest.TestCase):
@@ -191,3 +202,347 @@ class TestDiscoverer(unittest.TestCase):
         self.assertEqual(suite.countTestCases(), 0)
         for case in find_test_cases(suite):
             self.assertIsInstance(case, unittest.TestCase)
+
+    def test_discover_from_directory_parallel(self):
+        # Given
+        test_yaml_template = textwrap.dedent("""
+        ---
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Case {0}"
+              tests:
+                - name: "Test root URL"
+                  url: "/"
+                - name: "Test other URL"
+                  url: "/other"
+        """)
+        for index in range(5):
+            with tempfile.NamedTemporaryFile(
+                    delete=False, prefix='test', suffix='.yml',
+                    dir=self.temp_dir) as fh:
+                fh.write(test_yaml_template.format(index).encode('utf-8'))
+        serial_suite = self.discoverer.discover(self.temp_dir)
+        discoverer = RestTestDiscoverer(Loader(), jobs=2)
+
+        # When
+        suite = discoverer.discover(self.temp_dir)
+
+        # Then
+        self.assertIsInstance(suite, TestSuite)
+        self.assertEqual(suite.countTestCases(), 10)
+        self.assertEqual(
+            [str(case) for case in find_test_cases(suite)],
+            [str(case) for case in find_test_cases(serial_suite)],
+        )
+
+    def test_discover_parallel_invalid_file(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+        ---
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          tests:
+            - name: "Test root URL"
+              url: "/"
+        """)
+        with tempfile.NamedTemporaryFile(
+                delete=False, prefix='test', suffix='.yml',
+                dir=self.temp_dir) as fh:
+            fh.write(test_yaml.encode('utf-8'))
+        discoverer = RestTestDiscoverer(Loader(), jobs=2)
+
+        # When
+        suite = discoverer.discover(self.temp_dir)
+
+        # Then
+        self.assertEqual(suite.countTestCases(), 1)
+        case, = find_test_cases(suite)
+        self.assertIsInstance(case, ModuleImportError)
+
+    def test_parser_arguments(self):
+        # Given
+        parser = argparse.ArgumentParser()
+
+        # When
+        RestTestDiscoverer.add_parser_arguments(
+            parser, '--discovery-', 'discovery_')
+        # The plugin is registered as both 'usagi' and 'rest-test'
+        RestTestDiscoverer.add_parser_arguments(
+            parser, '--discovery-', 'discovery_')
+        args = parser.parse_args(['--discovery-usagi-jobs', '4'])
+        discoverer = RestTestDiscoverer.from_args(
+            args, 'discovery_', Loader())
+
+        # Then
+        self.assertEqual(discoverer._jobs, 4)
+        self.assertTrue(discoverer._yaml_loader.selector.selects_all)
+
+    def test_parser_arguments_selection(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        RestTestDiscoverer.add_parser_arguments(
+            parser, '--discovery-', 'discovery_')
+
+        # When
+        args = parser.parse_args([
+            '--discovery-usagi-case', 'Users*',
+            '--discovery-usagi-test', 'List*',
+            '--discovery-usagi-test', 'Get*',
+            '--discovery-usagi-tag', 'smoke',
+        ])
+        discoverer = RestTestDiscoverer.from_args(
+            args, 'discovery_', Loader())
+
+        # Then
+        selector = discoverer._yaml_loader.selector
+        self.assertEqual(selector.case_patterns, ['Users*'])
+        self.assertEqual(selector.test_patterns, ['List*', 'Get*'])
+        self.assertEqual(selector.tags, set(['smoke']))
+
+    def test_parser_arguments_file_finder(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        RestTestDiscoverer.add_parser_arguments(
+            parser, '--discovery-', 'discovery_')
+
+        # When
+        args = parser.parse_args([
+            '--discovery-usagi-pattern', '*.usagi.yml',
+            '--discovery-usagi-include', 'api/*',
+            '--discovery-usagi-exclude', 'fixtures',
+        ])
+        discoverer = RestTestDiscoverer.from_args(
+            args, 'discovery_', Loader())
+
+        # Then
+        finder = discoverer._file_finder
+        self.assertEqual(finder.patterns, ['*.usagi.yml'])
+        self.assertEqual(finder.include, ['api/*'])
+        self.assertEqual(finder.exclude, ['fixtures'])
+
+    def test_schema_backend_selected_by_discover(self):
+        # Given
+        with patch('usagi.discoverer.set_validator_backend') as set_backend:
+            discoverer = RestTestDiscoverer(
+                Loader(), schema_backend=VALIDATOR_BACKEND_FASTJSONSCHEMA)
+
+            # Then
+            self.assertFalse(set_backend.called)
+
+            # When
+            discoverer.discover(self.temp_dir)
+
+        # Then
+        set_backend.assert_called_once_with(VALIDATOR_BACKEND_FASTJSONSCHEMA)
+
+    def test_parser_arguments_dns_ttl(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        RestTestDiscoverer.add_parser_arguments(
+            parser, '--discovery-', 'discovery_')
+        self.addCleanup(setattr, get_dns_cache(), 'ttl', DEFAULT_TTL)
+
+        # When
+        args = parser.parse_args(['--discovery-usagi-dns-ttl', '30'])
+        discoverer = RestTestDiscoverer.from_args(
+            args, 'discovery_', Loader())
+
+        # Then
+        self.assertEqual(get_dns_cache().ttl, DEFAULT_TTL)
+
+        # When
+        discoverer.discover(self.temp_dir)
+
+        # Then
+        self.assertEqual(get_dns_cache().ttl, 30)
+
+    def test_parser_arguments_prewarm(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        RestTestDiscoverer.add_parser_arguments(
+            parser, '--discovery-', 'discovery_')
+        args = parser.parse_args(['--discovery-usagi-prewarm', '4'])
+        discoverer = RestTestDiscoverer.from_args(
+            args, 'discovery_', Loader())
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Test root URL"
+                  url: "/"
+        """)
+        with tempfile.NamedTemporaryFile(
+                delete=False, suffix='.yml', dir=self.temp_dir) as fh:
+            fh.write(test_yaml.encode('utf-8'))
+        test_filename = fh.name
+
+        # When
+        with patch('usagi.prewarm.prewarm_suite') as prewarm_suite:
+            suite = discoverer.discover(test_filename)
+
+        # Then
+        # Connections are opened when the suite runs, not at discovery
+        self.assertIsInstance(suite, PrewarmingSuite)
+        self.assertEqual(suite.connections, 4)
+        self.assertEqual(len(list(find_test_cases(suite))), 1)
+        self.assertFalse(prewarm_suite.called)
+
+    def _write_sharded_files(self):
+        names = []
+        for file_index in range(2):
+            filename = os.path.join(
+                self.temp_dir, 'test_{0}.yml'.format(file_index))
+            cases = []
+            for case_index in range(6):
+                name = 'Case {0}.{1}'.format(file_index, case_index)
+                names.append(case_key(filename, name))
+                cases.append({
+                    'name': name,
+                    'tests': [{'name': 'Test', 'url': '/'}],
+                })
+            with open(filename, 'w') as fh:
+                json.dump({
+                    'version': '1.0',
+                    'config': {'host': 'test.domain'},
+                    'cases': cases,
+                }, fh)
+        return names
+
+    def _discovered_case_keys(self, suite):
+        return [
+            case_key(test.usagi_tests.config.test_filename, test.usagi_name)
+            for test in find_test_cases(suite)]
+
+    def test_discover_shards(self):
+        # Given
+        keys = self._write_sharded_files()
+        discoverers = [
+            RestTestDiscoverer(Loader(), shard=(index, 3))
+            for index in range(3)]
+
+        # When
+        with patch('usagi.yaml_test_loader.create_test_case_for_case',
+                   wraps=create_test_case_for_case) as create:
+            shards = [
+                self._discovered_case_keys(
+                    discoverer.discover(self.temp_dir))
+                for discoverer in discoverers]
+
+        # Then
+        self.assertEqual(sorted(sum(shards, [])), sorted(keys))
+        # Only the cases of the selected shard are constructed.
+        self.assertEqual(create.call_count, len(keys))
+
+    def test_discover_shards_balanced_by_duration(self):
+        # Given
+        keys = self._write_sharded_files()
+        durations_file = os.path.join(self.temp_dir, 'durations.json')
+        durations = dict((key, 1.0) for key in keys)
+        durations[keys[0]] = 6.0
+        with open(durations_file, 'w') as fh:
+            json.dump(durations, fh)
+        discoverers = [
+            RestTestDiscoverer(
+                Loader(), shard=(index, 2), shard_durations=[durations_file])
+            for index in range(2)]
+
+        # When
+        shards = [
+            self._discovered_case_keys(discoverer.discover(self.temp_dir))
+            for discoverer in discoverers]
+
+        # Then
+        self.assertEqual(sorted(sum(shards, [])), sorted(keys))
+        self.assertEqual(
+            sorted(sum(durations[key] for key in shard) for shard in shards),
+            [8.0, 9.0])
+        longest = [shard for shard in shards if keys[0] in shard][0]
+        self.assertEqual(len(longest), 4)
+
+    def test_discover_file_shards_balanced_by_duration(self):
+        # Given
+        keys = self._write_sharded_files()[:6]
+        discoverers = [
+            RestTestDiscoverer(
+                Loader(), shard=(index, 2), jobs=0, shard_durations=[])
+            for index in range(2)]
+        filename = os.path.join(self.temp_dir, 'test_0.yml')
+
+        # When
+        shards = [
+            self._discovered_case_keys(discoverer.discover(filename))
+            for discoverer in discoverers]
+
+        # Then
+        # With no recorded durations, the cases are spread evenly.
+        self.assertEqual(sorted(sum(shards, [])), sorted(keys))
+        self.assertEqual([len(shard) for shard in shards], [3, 3])
+
+    def test_parser_arguments_shard(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        RestTestDiscoverer.add_parser_arguments(
+            parser, '--discovery-', 'discovery_')
+        durations_file = os.path.join(self.temp_dir, 'durations.json')
+        with open(durations_file, 'w') as fh:
+            json.dump({'test.yml::Case': 2.0}, fh)
+
+        # When
+        args = parser.parse_args([
+            '--discovery-usagi-shard', '2/3',
+            '--discovery-usagi-shard-durations', durations_file,
+        ])
+        discoverer = RestTestDiscoverer.from_args(
+            args, 'discovery_', Loader())
+
+        # Then
+        shard = discoverer._yaml_loader.selector.shard
+        self.assertEqual((shard.index, shard.count), (1, 3))
+        self.assertEqual(shard.durations, {'test.yml::Case': 2.0})
+        with self.assertRaises(SystemExit):
+            parser.parse_args(['--discovery-usagi-shard', '4/3'])
+
+    def test_discover_failed_first(self):
+        # Given
+        keys = self._write_sharded_files()
+        history = os.path.join(self.temp_dir, 'history.sqlite')
+        filename = relative_path(os.path.join(self.temp_dir, 'test_1.yml'))
+        with HistoryStore(history) as store:
+            store.add_run([
+                (filename, 'Case 1.4', 0, 'Test', 0.1, 'failure', None),
+                (filename, 'Case 1.2', 0, 'Test', 0.1, 'success', None),
+            ])
+        discoverer = RestTestDiscoverer(
+            Loader(), order=ORDER_FAILED, history=history)
+
+        # When
+        suite = discoverer.discover(self.temp_dir)
+
+        # Then
+        expected = [keys[10]] + keys[:10] + keys[11:]
+        self.assertEqual(self._discovered_case_keys(suite), expected)
+
+    def test_discover_order_without_history(self):
+        # Given
+        keys = self._write_sharded_files()
+        discoverer = RestTestDiscoverer(
+            Loader(), order=ORDER_FAILED,
+            history=os.path.join(self.temp_dir, 'missing.sqlite'))
+
+        # When
+        suite = discoverer.discover(self.temp_dir)
+
+        # Then
+        self.assertEqual(self._discovered_case_keys(suite), keys)
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import socket
+import tempfile
+import textwrap
+import threading
+
+from mock import patch
+from six import StringIO
+
+import yaml
+
+from haas.loader import Loader
+from haas import result as haas_result
+from haas.suite import TestSuite, find_test_cases
+from haas.testing import unittest
+
+from ..distributed import (
+    Coordinator, CoordinatorRunner, WorkQueue, parse_address,
+    receive_message, results_from_list, results_to_list, send_message)
+from ..exceptions import HaasRestTestError
+from ..main import main
+from ..process_runner import GROUP_FILE, CaseJob, run_jobs
+from ..runner import group_test_cases
+from ..yaml_test_loader import YamlTestLoader
+from .test_process_runner import TEST_YAML, _LocalTest, status_app
+from .utils import WSGIServerTestCase, run_suite, short_test_name
+
+
+class TestAddresses(unittest.TestCase):
+
+    def test_parse_address(self):
+        self.assertEqual(
+            parse_address('example.com:8000'),
+            (socket.AF_INET, ('example.com', 8000)))
+        self.assertEqual(
+            parse_address(':8000'), (socket.AF_INET, ('localhost', 8000)))
+        self.assertEqual(
+            parse_address('unix:/tmp/usagi.sock'),
+            (socket.AF_UNIX, '/tmp/usagi.sock'))
+
+    def test_invalid_address(self):
+        for address in ('example.com', 'example.com:http', 'unix:'):
+            with self.assertRaises(ValueError):
+                parse_address(address)
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def test_take_in_order(self):
+        # Given
+        queue = WorkQueue(['a', 'b'])
+
+        # When
+        first = queue.take()
+        second = queue.take()
+        queue.complete(0, 'A')
+        queue.complete(1, 'B')
+
+        # Then
+        self.assertEqual(first, (0, 'a'))
+        self.assertEqual(second, (1, 'b'))
+        self.assertIsNone(queue.take())
+        self.assertEqual(queue.wait_result(1, timeout=0), 'B')
+
+    def test_put_back(self):
+        # Given
+        queue = WorkQueue(['a', 'b'])
+        queue.take()
+
+        # When
+        queue.put_back(0)
+
+        # Then
+        self.assertEqual(queue.take(), (0, 'a'))
+
+    def test_close_releases_waiting_workers(self):
+        # Given
+        queue = WorkQueue(['a'])
+        queue.take()
+        taken = []
+        thread = threading.Thread(target=lambda: taken.append(queue.take()))
+        thread.start()
+
+        # When
+        queue.close()
+        thread.join(5)
+
+        # Then
+        self.assertEqual(taken, [None])
+
+
+class TestCoordinatorRunner(WSGIServerTestCase):
+
+    app = staticmethod(status_app)
+
+    def _load(self, filename):
+        loader = YamlTestLoader(Loader())
+        test_yaml = TEST_YAML.format(port=self.server.server_port)
+        return loader.load_tests_from_yaml(
+            yaml.safe_load(test_yaml), filename)
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.suite = TestSuite([
+            self._load('/path/to/test_one.yml'),
+            _LocalTest('test_local'),
+            self._load('/path/to/test_two.yml'),
+        ])
+
+    def _assert_results(self, results):
+        status = haas_result.TestCompletionStatus
+        self.assertEqual(
+            [short_test_name(result.test) for result in results],
+            [short_test_name(test) for test in find_test_cases(self.suite)])
+        self.assertEqual(
+            [result.status for result in results],
+            [status.success, status.failure, status.success,
+             status.success,
+             status.success, status.failure, status.success])
+        for result, test in zip(results, find_test_cases(self.suite)):
+            self.assertIs(result.test_class, type(test))
+
+    def test_case_job_json_round_trip(self):
+        # Given
+        units = group_test_cases(self.suite)
+        job = CaseJob.from_tests(units[1])
+
+        # When
+        data = json.loads(json.dumps(job.to_dict()))
+        tests = CaseJob.from_dict(data).create_tests()
+
+        # Then
+        self.assertEqual(
+            [short_test_name(test) for test in tests], ["'Second:Only'"])
+        self.assertEqual(tests[0].maxDiff, 10)
+        config = tests[0].usagi_tests.config
+        self.assertEqual(config.host, job.config.host)
+        self.assertEqual(config.resolve, {'api.test': '127.0.0.1'})
+        self.assertEqual(config.test_filename, '/path/to/test_one.yml')
+
+    def test_case_job_json_round_trip_yaml_values(self):
+        # Given
+        with open(os.path.join(self.temp_dir, 'dated.yml'), 'w') as fh:
+            fh.write('day: 2024-01-01\ndata: !!binary aGVsbG8=\n')
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: api.test
+            vars:
+              dated:
+                type: file
+                file: dated.yml
+                format: yaml
+
+          cases:
+            - name: "Dated"
+              tests:
+                - name: "Only"
+                  url: "/ok"
+        """)
+        suite = YamlTestLoader(Loader()).load_tests_from_yaml(
+            yaml.safe_load(test_yaml),
+            os.path.join(self.temp_dir, 'test_dated.yml'))
+        units = group_test_cases(suite)
+        job = CaseJob.from_tests(units[0])
+
+        # When
+        data = json.loads(json.dumps(job.to_dict()))
+        loaded = CaseJob.from_dict(data)
+
+        # Then
+        self.assertEqual(
+            loaded.config.variables,
+            {'dated': {'day': datetime.date(2024, 1, 1),
+                       'data': b'hello'}})
+        self.assertEqual(loaded.specs, job.specs)
+
+    def test_results_json_round_trip(self):
+        # Given
+        units = group_test_cases(self.suite)
+        results, _, _ = run_jobs([CaseJob.from_tests(units[0])])
+
+        # When
+        loaded = results_from_list(
+            json.loads(json.dumps(results_to_list(results))))
+
+        # Then
+        self.assertEqual(len(loaded[0]), 2)
+        for expected, actual in zip(results[0], loaded[0]):
+            self.assertEqual(actual[:2], expected[:2])
+            self.assertEqual(actual[3:], expected[3:])
+            self.assertAlmostEqual(
+                actual[2].total_seconds, expected[2].total_seconds,
+                places=5)
+
+    def test_tcp_local_workers(self):
+        # Given
+        stream = StringIO()
+        runner = CoordinatorRunner(local_workers=2, stream=stream)
+
+        # When
+        collector, results = run_suite(runner, self.suite)
+
+        # Then
+        self._assert_results(results)
+        self.assertFalse(collector.wasSuccessful())
+        self.assertIn('listening on 127.0.0.1:', stream.getvalue())
+
+    def test_unix_local_workers_by_file(self):
+        # Given
+        path = os.path.join(self.temp_dir, 'coordinator.sock')
+        runner = CoordinatorRunner(
+            listen='unix:' + path, local_workers=1, unit=GROUP_FILE,
+            stream=StringIO())
+
+        # When
+        _, results = run_suite(runner, self.suite)
+
+        # Then
+        self._assert_results(results)
+        self.assertFalse(os.path.exists(path))
+
+    def test_failfast(self):
+        # Given
+        runner = CoordinatorRunner(local_workers=1, stream=StringIO())
+
+        # When
+        collector, results = run_suite(runner, self.suite, failfast=True)
+
+        # Then
+        self.assertTrue(collector.shouldStop)
+        self.assertEqual(len(results), 2)
+
+    def test_lost_worker_unit_is_served_again(self):
+        # Given
+        queue = WorkQueue([{'type': 'unit', 'id': 0}])
+        coordinator = Coordinator('127.0.0.1:0', queue)
+        coordinator.start()
+        self.addCleanup(coordinator.close)
+        _, address = parse_address(coordinator.address)
+        sock = socket.create_connection(address)
+        stream = sock.makefile('rwb')
+        send_message(stream, {'type': 'next'})
+        unit = receive_message(stream)
+
+        # When
+        stream.close()
+        sock.close()
+
+        # Then
+        self.assertEqual(unit, {'type': 'unit', 'id': 0})
+        self.assertEqual(queue.take(), (0, unit))
+
+    def test_workers_exit_early(self):
+        # Given
+        runner = CoordinatorRunner(local_workers=1, stream=StringIO())
+
+        # When
+        with patch('usagi.distributed.run_worker'):
+            with self.assertRaises(HaasRestTestError):
+                run_suite(runner, self.suite)
+
+    def test_parser(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        CoordinatorRunner.add_parser_arguments(parser, '--runner-', 'runner_')
+
+        # When
+        args = parser.parse_args([
+            '--runner-usagi-listen', 'unix:/tmp/usagi.sock',
+            '--runner-usagi-local-workers', '3',
+            '--runner-usagi-unit', 'file'])
+        args.warnings = None
+        runner = CoordinatorRunner.from_args(args, 'runner_')
+
+        # Then
+        self.assertEqual(runner.listen, 'unix:/tmp/usagi.sock')
+        self.assertEqual(runner.local_workers, 3)
+        self.assertEqual(runner.unit, GROUP_FILE)
+
+
+class TestWorkerCommand(unittest.TestCase):
+
+    def test_worker_command(self):
+        # When
+        with patch('usagi.distributed.run_worker') as run_worker:
+            code = main(['usagi', 'worker', 'unix:/tmp/usagi.sock',
+                         '--wait', '2'])
+
+        # Then
+        self.assertEqual(code, 0)
+        run_worker.assert_called_once_with('unix:/tmp/usagi.sock', wait=2.0)
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import socket
+
+from mock import patch
+from six import StringIO
+from urllib3.exceptions import NewConnectionError
+
+from haas.plugins.result_handler import TimingResultHandler
+from haas.testing import unittest
+
+from ..config import Config
+from ..connections import ResolvingHTTPConnectionPool
+from ..dns import DnsCache, Resolver, get_dns_cache, is_ip_address
+from ..plugins.transports import Urllib3Transport
+from ..result_handler import DnsStatsResultHandler
+from ..sessions import SessionManager
+from .utils import WSGIServerTestCase, enabled_result_handlers
+
+ADDRESS_INFO = [
+    (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.1.2.3', 80)),
+]
+
+
+def host_app(environ, start_response):
+    start_response(str('200 OK'), [(str('Content-Type'), str('text/plain'))])
+    return [environ['HTTP_HOST'].encode('utf-8')]
+
+
+class TestDnsCache(unittest.TestCase):
+
+    def test_lookup_cached(self):
+        # Given
+        cache = DnsCache(ttl=60)
+
+        # When
+        with patch('socket.getaddrinfo', return_value=ADDRESS_INFO) as gai:
+            first = cache.lookup('api.test', 80)
+            second = cache.lookup('api.test', 80)
+
+        # Then
+        self.assertEqual(first, ['10.1.2.3'])
+        self.assertEqual(second, ['10.1.2.3'])
+        gai.assert_called_once_with('api.test', 80, 0, socket.SOCK_STREAM)
+        stats = cache.stats
+        self.assertEqual(stats.lookups, 1)
+        self.assertEqual(stats.hits, 1)
+
+    def test_lookup_all_addresses(self):
+        # Given
+        cache = DnsCache()
+        info = [
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, '', ('::1', 80, 0, 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 80)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 80)),
+        ]
+
+        # When
+        with patch('socket.getaddrinfo', return_value=info):
+            addresses = cache.lookup('localhost', 80)
+
+        # Then
+        self.assertEqual(addresses, ['::1', '127.0.0.1'])
+
+    def test_ttl_expired(self):
+        # Given
+        cache = DnsCache(ttl=60)
+
+        # When
+        with patch('socket.getaddrinfo', return_value=ADDRESS_INFO) as gai:
+            with patch('usagi.dns.default_timer', return_value=100.0):
+                cache.lookup('api.test', 80)
+            with patch('usagi.dns.default_timer', return_value=161.0):
+                cache.lookup('api.test', 80)
+
+        # Then
+        self.assertEqual(gai.call_count, 2)
+
+    def test_no_cache(self):
+        # Given
+        cache = DnsCache(ttl=0)
+
+        # When
+        with patch('socket.getaddrinfo', return_value=ADDRESS_INFO) as gai:
+            cache.lookup('api.test', 80)
+            cache.lookup('api.test', 80)
+
+        # Then
+        self.assertEqual(gai.call_count, 2)
+
+    def test_lookup_error(self):
+        # Given
+        cache = DnsCache()
+
+        # When
+        with patch('socket.getaddrinfo', side_effect=socket.gaierror):
+            with self.assertRaises(socket.gaierror):
+                cache.lookup('api.test', 80)
+
+        # Then
+        self.assertEqual(cache.stats.lookups, 1)
+
+    def test_clear(self):
+        # Given
+        cache = DnsCache()
+        with patch('socket.getaddrinfo', return_value=ADDRESS_INFO):
+            cache.lookup('api.test', 80)
+
+        # When
+        cache.clear()
+
+        # Then
+        self.assertEqual(cache.stats.lookups, 0)
+
+
+class TestResolver(unittest.TestCase):
+
+    def test_overrides(self):
+        # Given
+        cache = DnsCache()
+        resolver = Resolver(
+            {'api.test': '10.0.0.1', 'api.test:8443': '10.0.0.2'}, cache)
+
+        # When/Then
+        self.assertEqual(resolver.resolve('api.test', 80), ['10.0.0.1'])
+        self.assertEqual(resolver.resolve('api.test', 8443), ['10.0.0.2'])
+        self.assertEqual(cache.stats.overrides, 2)
+
+    def test_ip_address(self):
+        # Given
+        cache = DnsCache()
+        resolver = Resolver(cache=cache)
+
+        # When
+        with patch('socket.getaddrinfo') as gai:
+            addresses = resolver.resolve('127.0.0.1', 80)
+
+        # Then
+        self.assertEqual(addresses, ['127.0.0.1'])
+        self.assertFalse(gai.called)
+        self.assertTrue(is_ip_address('::1'))
+        self.assertFalse(is_ip_address('localhost'))
+
+    def test_cache_used(self):
+        # Given
+        cache = DnsCache()
+        resolver = Resolver({'other.test': '10.0.0.1'}, cache)
+
+        # When
+        with patch('socket.getaddrinfo', return_value=ADDRESS_INFO):
+            addresses = resolver.resolve('api.test', 80)
+
+        # Then
+        self.assertEqual(addresses, ['10.1.2.3'])
+        self.assertIs(Resolver().cache, get_dns_cache())
+
+
+class TestResolvingConnections(WSGIServerTestCase):
+
+    app = staticmethod(host_app)
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestResolvingConnections, cls).setUpClass()
+        cls.port = cls.server.server_port
+
+    def _config(self):
+        return Config.from_dict(
+            {'host': 'api.test:{0}'.format(self.port),
+             'resolve': {'api.test': '127.0.0.1'}},
+            '/path/to/test.yml')
+
+    def test_requests_transport(self):
+        # Given
+        manager = SessionManager()
+        self.addCleanup(manager.close)
+        session = manager.create_session(self._config())
+
+        # When
+        response = session.get('http://api.test:{0}/'.format(self.port))
+
+        # Then
+        self.assertEqual(response.text, 'api.test:{0}'.format(self.port))
+
+    def test_urllib3_transport(self):
+        # Given
+        transport = Urllib3Transport()
+        self.addCleanup(transport.close)
+        client = transport.create_client(self._config())
+
+        # When
+        response = client.request(
+            'GET', 'http://api.test:{0}/'.format(self.port))
+
+        # Then
+        self.assertEqual(response.text, 'api.test:{0}'.format(self.port))
+
+    def test_host_unchanged(self):
+        # Given
+        resolver = Resolver({'api.test': '127.0.0.1'})
+        pool = ResolvingHTTPConnectionPool(
+            'api.test', self.port, resolver=resolver)
+        connection = pool._new_conn()
+        self.addCleanup(connection.close)
+
+        # When
+        connection.connect()
+
+        # Then
+        self.assertEqual(connection.host, 'api.test')
+        self.assertEqual(connection.sock.getpeername()[0], '127.0.0.1')
+
+    def test_next_address_tried(self):
+        # Given
+        cache = DnsCache()
+        info = [
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, '',
+             ('::1', self.port, 0, 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '',
+             ('127.0.0.1', self.port)),
+        ]
+        pool = ResolvingHTTPConnectionPool(
+            'localhost', self.port, resolver=Resolver(cache=cache))
+        self.addCleanup(pool.close)
+
+        # When
+        with patch('usagi.dns.socket.getaddrinfo', return_value=info):
+            response = pool.request('GET', '/')
+
+        # Then
+        self.assertEqual(
+            response.data, 'localhost:{0}'.format(self.port).encode('ascii'))
+
+    def test_all_addresses_refused(self):
+        # Given
+        resolver = Resolver({'api.test': '127.0.0.1'})
+        pool = ResolvingHTTPConnectionPool(
+            'api.test', self.port, resolver=resolver)
+        connection = pool._new_conn()
+        self.addCleanup(connection.close)
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        connection.port = listener.getsockname()[1]
+        listener.close()
+
+        # When/Then
+        with self.assertRaises(NewConnectionError):
+            connection.connect()
+        self.assertEqual(connection.host, 'api.test')
+
+    def test_connections_share_lookup(self):
+        # Given
+        manager = SessionManager()
+        self.addCleanup(manager.close)
+        config = Config.from_dict(
+            {'host': 'api.test:{0}'.format(self.port),
+             'connection': {'reuse': 'case'}},
+            '/path/to/test.yml')
+        url = 'http://api.test:{0}/'.format(self.port)
+        info = [(socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                 ('127.0.0.1', self.port))]
+        get_dns_cache().clear()
+        self.addCleanup(get_dns_cache().clear)
+
+        # When
+        with patch('usagi.dns.socket.getaddrinfo', return_value=info):
+            for _ in range(3):
+                manager.create_session(config).get(url)
+
+        # Then
+        stats = get_dns_cache().stats
+        self.assertEqual(stats.lookups, 1)
+        self.assertEqual(stats.hits, 2)
+
+
+class TestDnsStatsResultHandler(unittest.TestCase):
+
+    def _parse(self, argv):
+        parser = argparse.ArgumentParser()
+        parser.add_argument(
+            '--summarize-test-time', nargs='?', type=int,
+            default=TimingResultHandler.OPTION_DEFAULT)
+        DnsStatsResultHandler.add_parser_arguments(
+            parser, 'usagi-dns', '--with-usagi-dns', 'usagi_dns')
+        args = parser.parse_args(argv)
+        return DnsStatsResultHandler.from_args(
+            args, 'usagi-dns', 'usagi_dns', 1)
+
+    def test_disabled(self):
+        # When/Then
+        self.assertIsNone(self._parse([]))
+
+    def test_enabled(self):
+        # When/Then
+        self.assertIsInstance(
+            self._parse(['--with-usagi-dns']), DnsStatsResultHandler)
+        self.assertIsInstance(
+            self._parse(['--summarize-test-time']), DnsStatsResultHandler)
+
+    def test_enabled_by_haas(self):
+        # When
+        handlers = enabled_result_handlers(['--with-usagi-dns'])
+
+        # Then
+        self.assertEqual(
+            [type(handler) for handler in handlers
+             if isinstance(handler, DnsStatsResultHandler)],
+            [DnsStatsResultHandler])
+
+    def test_report(self):
+        # Given
+        stream = StringIO()
+        handler = DnsStatsResultHandler(stream=stream)
+
+        # When
+        handler.start_test_run()
+        handler.stop_test_run()
+
+        # Then
+        output = stream.getvalue()
+        self.assertIn('DNS resolution report', output)
+        self.assertIn('Lookups', output)
+        self.assertIn('Cache hits', output)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from haas.testing import unittest
+
+from .. import file_finder
+from ..file_finder import TestFileFinder
+
+
+class TestTestFileFinder(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(
+            prefix='usagi-', suffix='.tmp')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _touch(self, *relpaths):
+        for relpath in relpaths:
+            path = os.path.join(self.temp_dir, *relpath.split('/'))
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(path, 'w'):
+                pass
+
+    def _find(self, finder):
+        return [
+            os.path.relpath(path, self.temp_dir).replace(os.sep, '/')
+            for path in finder.find(self.temp_dir)
+        ]
+
+    def test_default_pattern(self):
+        # Given
+        self._touch(
+            'test_b.yml', 'test_a.yml', 'not_test.yml', 'test_c.ymll',
+            'api/test_api.yml', 'api/v2/test_v2.yml')
+
+        # When
+        found = self._find(TestFileFinder())
+
+        # Then
+        self.assertEqual(found, [
+            'test_a.yml', 'test_b.yml', 'api/test_api.yml',
+            'api/v2/test_v2.yml'])
+
+    def test_custom_patterns(self):
+        # Given
+        self._touch(
+            'users.usagi.yml', 'test_users.yml', 'api/groups.usagi.yml')
+
+        # When
+        found = self._find(TestFileFinder(patterns=['*.usagi.yml']))
+
+        # Then
+        self.assertEqual(found, ['users.usagi.yml', 'api/groups.usagi.yml'])
+
+    def test_include(self):
+        # Given
+        self._touch('test_a.yml', 'api/test_api.yml', 'web/test_web.yml')
+
+        # When
+        found = self._find(TestFileFinder(include=['api/*']))
+
+        # Then
+        self.assertEqual(found, ['api/test_api.yml'])
+
+    def test_exclude_prunes_directories(self):
+        # Given
+        self._touch(
+            'test_a.yml', 'fixtures/test_fixture.yml', 'api/test_api.yml',
+            'api/test_slow.yml')
+        finder = TestFileFinder(exclude=['fixtures', 'test_slow.yml'])
+
+        # When
+        with patch.object(file_finder, 'scandir',
+                          side_effect=file_finder.scandir) as mock_scandir:
+            found = self._find(finder)
+
+        # Then
+        self.assertEqual(found, ['test_a.yml', 'api/test_api.yml'])
+        scanned = [call[0][0] for call in mock_scandir.call_args_list]
+        self.assertNotIn(os.path.join(self.temp_dir, 'fixtures'), scanned)
+
+    def test_default_pruned_directories(self):
+        # Given
+        self._touch(
+            'test_a.yml', '.git/test_git.yml', 'venv/pyvenv.cfg',
+            'venv/lib/test_venv.yml', 'node_modules/test_node.yml')
+
+        # When
+        found = self._find(TestFileFinder())
+
+        # Then
+        self.assertEqual(found, ['test_a.yml'])
+
+    def test_ignore_file(self):
+        # Given
+        self._touch(
+            'test_a.yml', 'build/test_build.yml', 'api/test_api.yml',
+            'api/test_draft.yml', 'api/build/test_build.yml',
+            'web/test_draft.yml')
+        with open(os.path.join(self.temp_dir, '.usagiignore'), 'w') as fh:
+            fh.write('# Comment\n\n/build/\napi/test_draft.yml\n')
+        with open(os.path.join(self.temp_dir, 'api', '.usagiignore'),
+                  'w') as fh:
+            fh.write('build\n')
+
+        # When
+        found = self._find(TestFileFinder())
+
+        # Then
+        self.assertEqual(found, [
+            'test_a.yml', 'api/test_api.yml', 'web/test_draft.yml'])
+
+    def test_ignore_file_disabled(self):
+        # Given
+        self._touch('test_a.yml', 'test_b.yml')
+        with open(os.path.join(self.temp_dir, '.usagiignore'), 'w') as fh:
+            fh.write('test_b.yml\n')
+
+        # When
+        found = self._find(TestFileFinder(ignore_filename=None))
+
+        # Then
+        self.assertEqual(found, ['test_a.yml', 'test_b.yml'])
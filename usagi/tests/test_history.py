@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import textwrap
+
+import yaml
+
+from haas.loader import Loader
+from haas.result import ResultCollector
+from haas.suite import TestSuite
+from haas.testing import unittest
+
+from ..history import (
+    ORDER_FAILED, ORDER_LONGEST, ORDER_SUITE, HistoryStore, is_history_file,
+    order_units)
+from ..process_runner import ProcessCaseRunner
+from ..result_handler import HistoryResultHandler
+from ..runner import group_test_cases
+from ..sharding import case_key, load_durations, relative_path
+from ..yaml_test_loader import YamlTestLoader
+from .test_process_runner import requires_fork
+from .utils import WSGIServerTestCase, enabled_result_handlers
+
+TEST_YAML = textwrap.dedent("""
+  version: '1.0'
+
+  config:
+    host: 127.0.0.1:{port}
+
+  cases:
+    - name: "Users"
+      tests:
+        - name: "List"
+          url: "/users"
+          assertions:
+            - name: status_code
+              expected: 200
+        - name: "Missing"
+          url: "/missing"
+          assertions:
+            - name: status_code
+              expected: 200
+    - name: "Groups"
+      tests:
+        - name: "List"
+          url: "/groups"
+""")
+
+BODIES = {
+    '/users': b'["alice", "bob"]',
+    '/groups': b'[]',
+}
+
+
+def body_app(environ, start_response):
+    body = BODIES.get(environ['PATH_INFO'])
+    if body is None:
+        start_response(str('404 Not Found'), [])
+        return [b'not found']
+    start_response(str('200 OK'), [])
+    return [body]
+
+
+def _record(filename, case_name, duration, outcome='success', index=0):
+    return (filename, case_name, index, 'Test', duration, outcome, None)
+
+
+class TestHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, 'history.sqlite')
+
+    def test_add_run(self):
+        # Given
+        records = [
+            ('test.yml', 'Users', 0, 'List', 0.5, 'success', 15),
+            ('test.yml', 'Users', 1, 'Missing', 0.25, 'failure', None),
+        ]
+
+        # When
+        with HistoryStore(self.path) as store:
+            run_id = store.add_run(records)
+        with HistoryStore(self.path) as store:
+            results = store.results()
+
+        # Then
+        self.assertEqual(run_id, 1)
+        self.assertEqual([tuple(row) for row in results], records)
+        self.assertTrue(is_history_file(self.path))
+
+    def test_keep_recent_runs(self):
+        # Given
+        with HistoryStore(self.path, max_runs=2) as store:
+
+            # When
+            run_ids = [
+                store.add_run([_record('test.yml', 'Users', float(index))])
+                for index in range(3)]
+
+            # Then
+            self.assertEqual(store.results(run_ids[0]), [])
+            self.assertEqual(len(store.results(run_ids[1])), 1)
+            self.assertEqual(len(store.results(run_ids[2])), 1)
+
+    def test_case_durations(self):
+        # Given
+        with HistoryStore(self.path) as store:
+            store.add_run([
+                _record('test.yml', 'Users', 1.0),
+                _record('test.yml', 'Groups', 4.0),
+            ])
+            store.add_run([
+                _record('test.yml', 'Users', 2.0),
+                _record('test.yml', 'Users', 0.5, index=1),
+            ])
+
+            # When
+            durations = store.case_durations()
+
+        # Then
+        self.assertEqual(durations, {
+            case_key('test.yml', 'Users'): 2.5,
+            case_key('test.yml', 'Groups'): 4.0,
+        })
+        self.assertEqual(load_durations([self.path]), durations)
+
+    def test_failed_cases(self):
+        # Given
+        with HistoryStore(self.path) as store:
+            store.add_run([
+                _record('test.yml', 'Users', 1.0, 'failure'),
+                _record('test.yml', 'Groups', 1.0, 'error'),
+            ])
+            second = store.add_run([
+                _record('test.yml', 'Users', 1.0, 'failure'),
+                _record('test.yml', 'Groups', 1.0, 'success'),
+                _record('test.yml', 'Tags', 1.0, 'skipped'),
+            ])
+
+            # When
+            failed = store.failed_cases()
+
+        # Then
+        self.assertEqual(failed, {
+            case_key('test.yml', 'Users'): second,
+            case_key('test.yml', 'Groups'): second - 1,
+        })
+
+    def test_enabled_by_haas(self):
+        # When
+        handlers = enabled_result_handlers(
+            ['--with-usagi-history', self.path])
+
+        # Then
+        handlers = [handler for handler in handlers
+                    if isinstance(handler, HistoryResultHandler)]
+        self.assertEqual(len(handlers), 1)
+        self.assertEqual(handlers[0].path, self.path)
+
+    def test_not_history_file(self):
+        # Given
+        path = os.path.join(self.temp_dir, 'durations.json')
+        with open(path, 'w') as fh:
+            json.dump({}, fh)
+
+        # Then
+        self.assertFalse(is_history_file(path))
+
+
+class TestHistoryRecording(WSGIServerTestCase):
+
+    app = staticmethod(body_app)
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, 'history.sqlite')
+        self.filename = os.path.join(self.temp_dir, 'test_api.yml')
+        loader = YamlTestLoader(Loader())
+        test_yaml = TEST_YAML.format(port=self.server.server_port)
+        self.suite = TestSuite([loader.load_tests_from_yaml(
+            yaml.safe_load(test_yaml), self.filename)])
+
+    def _run(self, runner=None):
+        handler = HistoryResultHandler(self.path)
+        collector = ResultCollector()
+        collector.add_result_handler(handler)
+        handler.start_test_run()
+        if runner is None:
+            self.suite(collector)
+        else:
+            runner.run(collector, self.suite)
+        handler.stop_test_run()
+        with HistoryStore(self.path) as store:
+            return [tuple(row[:4]) + tuple(row[5:])
+                    for row in store.results()]
+
+    def _assert_records(self, records):
+        filename = relative_path(self.filename)
+        self.assertEqual(records, [
+            (filename, 'Users', 0, 'List', 'success', 16),
+            (filename, 'Users', 1, 'Missing', 'failure', 9),
+            (filename, 'Groups', 0, 'List', 'success', 2),
+        ])
+
+    def test_record_run(self):
+        # When
+        records = self._run()
+
+        # Then
+        self._assert_records(records)
+
+    @requires_fork
+    def test_record_process_runner(self):
+        # When
+        records = self._run(ProcessCaseRunner(processes=2))
+
+        # Then
+        self._assert_records(records)
+
+    def test_order_units(self):
+        # Given
+        units = group_test_cases(self.suite)
+        with HistoryStore(self.path) as store:
+            store.add_run([
+                _record(relative_path(self.filename), 'Users', 1.0),
+                _record(relative_path(self.filename), 'Groups', 3.0,
+                        'failure'),
+            ])
+            store.add_run([
+                _record(relative_path(self.filename), 'Users', 2.0,
+                        'failure'),
+            ])
+
+            # When
+            orders = dict(
+                (order, [units.index(unit)
+                         for unit in order_units(units, order, store)])
+                for order in (ORDER_SUITE, ORDER_LONGEST, ORDER_FAILED))
+
+        # Then
+        self.assertEqual(orders[ORDER_SUITE], [0, 1])
+        self.assertEqual(orders[ORDER_LONGEST], [1, 0])
+        self.assertEqual(orders[ORDER_FAILED], [0, 1])
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import json
+import subprocess
+import sys
+import textwrap
+
+from haas.testing import unittest
+
+from ..lazy_import import lazy_import
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_import_on_attribute_access(self):
+        # Given
+        module = lazy_import('json')
+
+        # Then
+        self.assertFalse(module.is_imported)
+
+        # When
+        dumps = module.dumps
+
+        # Then
+        self.assertTrue(module.is_imported)
+        self.assertIs(dumps, json.dumps)
+
+    def test_missing_module(self):
+        # Given
+        module = lazy_import('usagi_no_such_module')
+
+        # When/Then
+        with self.assertRaises(ImportError):
+            module.anything
+
+    def test_missing_attribute(self):
+        # Given
+        module = lazy_import('json')
+
+        # When/Then
+        with self.assertRaises(AttributeError):
+            module.no_such_attribute
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_discoverer_import_budget(self):
+        # Given
+        script = textwrap.dedent("""
+            import json
+            import sys
+            import usagi.discoverer
+            modules = ['requests', 'urllib3', 'jq', 'sqlite3', 'ssl']
+            print(json.dumps([m for m in modules if m in sys.modules]))
+        """)
+
+        # When
+        output = subprocess.check_output([sys.executable, '-c', script])
+
+        # Then
+        self.assertEqual(json.loads(output.decode('utf-8')), [])
+
+    def test_discoverer_does_not_import_runtime_dependencies(self):
+        # Given
+        script = textwrap.dedent("""
+            import json
+            import sys
+            import usagi.discoverer
+            from usagi.registry import get_registry
+            registry = get_registry()
+            registry.assertions['body']
+            registry.parameters['body']
+            modules = ['requests', 'jq']
+            print(json.dumps([m for m in modules if m in sys.modules]))
+        """)
+
+        # When
+        output = subprocess.check_output([sys.executable, '-c', script])
+
+        # Then
+        self.assertEqual(json.loads(output.decode('utf-8')), [])
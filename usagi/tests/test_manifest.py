@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from haas.testing import unittest
+
+from ..main import main
+from ..manifest import (
+    MANIFEST_ENVIRONMENT_VARIABLE, ManifestEntryPoint, default_manifest_path,
+    load_manifest, write_manifest)
+from ..plugins.assertions import StatusCodeAssertion
+from ..registry import PluginRegistry, write_plugin_manifest
+from .utils import environment
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(
+            prefix='usagi-', suffix='.tmp')
+        self.manifest_path = os.path.join(self.temp_dir, 'plugins.json')
+        self.plugins = {
+            'usagi.assertions': [
+                {
+                    'name': 'status_code',
+                    'value': 'usagi.plugins.assertions:StatusCodeAssertion',
+                    'version': '1.0',
+                },
+            ],
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_default_manifest_path(self):
+        # When
+        with environment(**{MANIFEST_ENVIRONMENT_VARIABLE: '/manifest'}):
+            path = default_manifest_path()
+
+        # Then
+        self.assertEqual(path, '/manifest')
+
+    def test_load_manifest(self):
+        # Given
+        write_manifest(self.manifest_path, self.plugins)
+
+        # When
+        entry_points = load_manifest(
+            self.manifest_path, ['usagi.assertions'])
+
+        # Then
+        entry_point, = entry_points['usagi.assertions']
+        self.assertIsInstance(entry_point, ManifestEntryPoint)
+        self.assertEqual(entry_point.name, 'status_code')
+        self.assertEqual(entry_point.version, '1.0')
+        self.assertIs(entry_point.load(), StatusCodeAssertion)
+
+    def test_load_missing_manifest(self):
+        # When
+        entry_points = load_manifest(
+            self.manifest_path, ['usagi.assertions'])
+
+        # Then
+        self.assertIsNone(entry_points)
+
+    def test_load_stale_manifest(self):
+        # Given
+        write_manifest(self.manifest_path, self.plugins)
+
+        # When
+        with patch('usagi.manifest.environment_hash', return_value='new'):
+            entry_points = load_manifest(
+                self.manifest_path, ['usagi.assertions'])
+
+        # Then
+        self.assertIsNone(entry_points)
+
+    def test_load_manifest_missing_namespace(self):
+        # Given
+        write_manifest(self.manifest_path, self.plugins)
+
+        # When
+        entry_points = load_manifest(
+            self.manifest_path, ['usagi.assertions', 'usagi.parameters'])
+
+        # Then
+        self.assertIsNone(entry_points)
+
+    def test_load_invalid_manifest(self):
+        # Given
+        with open(self.manifest_path, 'w') as fh:
+            fh.write('{')
+
+        # When
+        entry_points = load_manifest(
+            self.manifest_path, ['usagi.assertions'])
+
+        # Then
+        self.assertIsNone(entry_points)
+
+    def test_registry_uses_manifest(self):
+        # Given
+        write_plugin_manifest(self.manifest_path)
+        registry = PluginRegistry(manifest_path=self.manifest_path)
+
+        # When
+        with patch('usagi.registry._scan_entry_points') as scan:
+            assertions = registry.assertions
+
+        # Then
+        self.assertFalse(scan.called)
+        self.assertIs(assertions['status_code'], StatusCodeAssertion)
+        self.assertEqual(registry.specs(), PluginRegistry(
+            manifest_path=os.path.join(self.temp_dir, 'none')).specs())
+
+    def test_main_write_manifest(self):
+        # When
+        with patch('sys.stdout'):
+            code = main(['usagi', 'write-manifest', '-o', self.manifest_path])
+
+        # Then
+        self.assertEqual(code, 0)
+        with open(self.manifest_path) as fh:
+            manifest = json.load(fh)
+        self.assertIn('status_code', [
+            plugin['name']
+            for plugin in manifest['plugins']['usagi.assertions']
+        ])
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import textwrap
+import threading
+
+import yaml
+from six.moves import BaseHTTPServer, socketserver
+
+from haas.loader import Loader
+from haas.result import ResultCollector
+from haas.testing import unittest
+
+from ..plugins.transports import Urllib3Transport
+from ..prewarm import PrewarmingSuite, find_configs, prewarm_suite
+from ..runner import ThreadedCaseRunner
+from ..sessions import get_session_manager, get_transport
+from ..yaml_test_loader import YamlTestLoader
+from .utils import unused_port
+
+
+class _CountingHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _CountingServer(socketserver.ThreadingMixIn,
+                      BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        BaseHTTPServer.HTTPServer.__init__(self, *args, **kwargs)
+        self.lock = threading.Lock()
+        self.connections = 0
+
+
+class TestPrewarm(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _CountingServer(('127.0.0.1', 0), _CountingHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+        self.host = '127.0.0.1:{0}'.format(self.server.server_port)
+
+    def tearDown(self):
+        get_session_manager().close()
+        get_transport('urllib3').close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _load_suite(self, host, **config):
+        config['host'] = host
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          cases:
+            - name: "First"
+              tests:
+                - name: "Root"
+                  url: "/"
+                  assertions:
+                    - name: status_code
+                      expected: 200
+            - name: "Second"
+              tests:
+                - name: "Root"
+                  url: "/"
+                  assertions:
+                    - name: status_code
+                      expected: 200
+        """)
+        test_data = yaml.safe_load(test_yaml)
+        test_data['config'] = config
+        return YamlTestLoader(Loader()).load_tests_from_yaml(
+            test_data, '/path/to/test.yml')
+
+    def _run(self, suite, runner=None):
+        result = ResultCollector()
+        if runner is None:
+            suite(result)
+        else:
+            runner.run(result, suite)
+        self.assertTrue(result.wasSuccessful())
+
+    def test_find_configs(self):
+        # Given
+        suite = self._load_suite(self.host)
+
+        # When
+        configs = list(find_configs(suite))
+
+        # Then
+        self.assertEqual(len(configs), 1)
+        self.assertEqual(configs[0].host, self.host)
+
+    def test_prewarm_requests_transport(self):
+        # Given
+        suite = self._load_suite(self.host)
+
+        # When
+        count = prewarm_suite(suite, 3)
+        self._run(suite)
+
+        # Then
+        self.assertEqual(count, 3)
+        # The tests reused the pre-warmed connections
+        self.assertEqual(self.server.connections, 3)
+
+    def test_prewarm_urllib3_transport(self):
+        # Given
+        suite = self._load_suite(self.host, transport='urllib3')
+        pool = get_transport('urllib3').connection_pool(
+            next(find_configs(suite)))
+
+        # When
+        count = prewarm_suite(suite, 2)
+        self._run(suite)
+
+        # Then
+        self.assertEqual(count, 2)
+        self.assertEqual(self.server.connections, 2)
+        self.assertIsInstance(get_transport('urllib3'), Urllib3Transport)
+        self.assertIs(
+            pool, get_transport('urllib3').connection_pool(
+                next(find_configs(suite))))
+
+    def test_limited_by_pool_size(self):
+        # Given
+        suite = self._load_suite(self.host, connection={'pool-size': 2})
+
+        # When
+        count = prewarm_suite(suite, 5)
+
+        # Then
+        self.assertEqual(count, 2)
+
+    def test_prewarming_suite(self):
+        # Given
+        suite = PrewarmingSuite([self._load_suite(self.host)], 3)
+
+        # When
+        self._run(suite)
+        self._run(suite)
+
+        # Then
+        # Pre-warmed once, and the tests reused the connections
+        self.assertEqual(self.server.connections, 3)
+
+    def test_prewarming_suite_threaded_runner(self):
+        # Given
+        suite = PrewarmingSuite([self._load_suite(self.host)], 12)
+        runner = ThreadedCaseRunner(threads=12)
+        self.addCleanup(setattr, get_session_manager(), 'concurrency', 1)
+
+        # When
+        self._run(suite, runner)
+
+        # Then
+        # The pools were sized for the threads of the runner before
+        # they were pre-warmed.
+        self.assertEqual(self.server.connections, 12)
+
+    def test_not_shared(self):
+        # Given
+        suite = self._load_suite(self.host, connection={'reuse': 'case'})
+
+        # When
+        count = prewarm_suite(suite, 3)
+
+        # Then
+        self.assertEqual(count, 0)
+        self.assertEqual(self.server.connections, 0)
+
+    def test_unreachable_host(self):
+        # Given
+        suite = self._load_suite('127.0.0.1:{0}'.format(unused_port()))
+
+        # When
+        count = prewarm_suite(suite, 2)
+
+        # Then
+        self.assertEqual(count, 0)
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import gc
+import multiprocessing
+import pickle
+import sys
+import textwrap
+
+from mock import Mock, patch
+
+import yaml
+
+from haas.loader import Loader
+from haas import result as haas_result
+from haas.suite import TestSuite, find_test_cases
+from haas.testing import unittest
+
+from ..dns import get_dns_cache
+from ..process_runner import (
+    GROUP_CASE, GROUP_FILE, PRELOAD_MODULES, START_FORK, START_FORKSERVER,
+    START_SPAWN, CaseJob, ProcessCaseRunner, default_start_method,
+    frozen_heap, get_all_start_methods, get_context, group_jobs, preload,
+    run_jobs)
+from ..runner import group_test_cases
+from ..yaml_test_loader import YamlTestLoader
+from .utils import WSGIServerTestCase, run_suite, short_test_name
+
+TEST_YAML = textwrap.dedent("""
+  version: '1.0'
+
+  config:
+    host: api.test:{port}
+    resolve:
+      api.test: 127.0.0.1
+
+  cases:
+    - name: "First"
+      tests:
+        - name: "Passing"
+          url: "/ok"
+          assertions:
+            - name: status_code
+              expected: 200
+        - name: "Failing"
+          url: "/missing"
+          assertions:
+            - name: status_code
+              expected: 200
+    - name: "Second"
+      max-diff: 10
+      tests:
+        - name: "Only"
+          url: "/ok"
+          assertions:
+            - name: status_code
+              expected: 200
+""")
+
+
+def status_app(environ, start_response):
+    if environ['PATH_INFO'] == '/ok':
+        status = str('200 OK')
+    else:
+        status = str('404 Not Found')
+    start_response(status, [(str('Content-Type'), str('text/plain'))])
+    return [b'']
+
+
+class _LocalTest(unittest.TestCase):
+
+    def test_local(self):
+        pass
+
+
+requires_fork = unittest.skipUnless(
+    START_FORK in multiprocessing.get_all_start_methods(),
+    'The fork start method is not available')
+
+
+class TestProcessCaseRunner(WSGIServerTestCase):
+
+    app = staticmethod(status_app)
+
+    def _load(self, filename):
+        loader = YamlTestLoader(Loader())
+        test_yaml = TEST_YAML.format(port=self.server.server_port)
+        return loader.load_tests_from_yaml(
+            yaml.safe_load(test_yaml), filename)
+
+    def setUp(self):
+        self.suite = TestSuite([
+            self._load('/path/to/test_one.yml'),
+            _LocalTest('test_local'),
+            self._load('/path/to/test_two.yml'),
+        ])
+
+    def test_case_job_round_trip(self):
+        # Given
+        units = group_test_cases(self.suite)
+        job = CaseJob.from_tests(units[1])
+
+        # When
+        tests = pickle.loads(pickle.dumps(job)).create_tests()
+
+        # Then
+        self.assertEqual(
+            [short_test_name(test) for test in tests], ["'Second:Only'"])
+        self.assertEqual(tests[0].maxDiff, 10)
+        config = units[1][0].usagi_tests.config
+        self.assertEqual(tests[0].usagi_tests.config.host, config.host)
+
+    def test_group_jobs(self):
+        # Given
+        units = group_test_cases(self.suite)
+
+        # When
+        by_case = group_jobs(units, GROUP_CASE)
+        by_file = group_jobs(units, GROUP_FILE)
+
+        # Then
+        self.assertEqual(
+            [None if jobs is None else len(jobs) for jobs, _ in by_case],
+            [1, 1, None, 1, 1])
+        self.assertEqual(
+            [None if jobs is None else len(jobs) for jobs, _ in by_file],
+            [2, None, 2])
+        self.assertEqual(
+            [len(tests) for _, tests in by_file], [3, 1, 3])
+
+    def test_run_jobs(self):
+        # Given
+        units = group_test_cases(self.suite)
+        jobs = [CaseJob.from_tests(units[0])]
+        status = haas_result.TestCompletionStatus
+        get_dns_cache().reset_stats()
+
+        # When
+        results, dns_stats, tls_stats = run_jobs(jobs)
+
+        # Then
+        self.assertEqual(
+            [(name, status) for name, status, _, _, _, _ in results[0]],
+            [('test_00', status.success),
+             ('test_01', status.failure)])
+        self.assertIn('404', results[0][1][3])
+        self.assertEqual(dns_stats.overrides, 2)
+        self.assertEqual(tls_stats.full_handshakes, 0)
+
+    def _assert_results(self, results):
+        status = haas_result.TestCompletionStatus
+        self.assertEqual(
+            [short_test_name(result.test) for result in results],
+            [short_test_name(test) for test in find_test_cases(self.suite)])
+        self.assertEqual(
+            [result.status for result in results],
+            [status.success, status.failure, status.success,
+             status.success,
+             status.success, status.failure, status.success])
+        for result, test in zip(results, find_test_cases(self.suite)):
+            self.assertIs(result.test_class, type(test))
+
+    def test_results_in_suite_order(self):
+        # Given
+        runner = ProcessCaseRunner(processes=2)
+        overrides = get_dns_cache().stats.overrides
+
+        # When
+        collector, results = run_suite(runner, self.suite)
+
+        # Then
+        self.assertFalse(collector.wasSuccessful())
+        self.assertEqual(collector.testsRun, 7)
+        self._assert_results(results)
+        # Host name resolution in the workers is reported in the parent
+        self.assertEqual(get_dns_cache().stats.overrides - overrides, 6)
+
+    def test_group_by_file(self):
+        # Given
+        runner = ProcessCaseRunner(processes=2, group=GROUP_FILE)
+
+        # When
+        collector, results = run_suite(runner, self.suite)
+
+        # Then
+        self.assertEqual(collector.testsRun, 7)
+        self._assert_results(results)
+
+    def test_failfast(self):
+        # Given
+        runner = ProcessCaseRunner(processes=2)
+
+        # When
+        collector, results = run_suite(runner, self.suite, failfast=True)
+
+        # Then
+        self.assertEqual(
+            [short_test_name(result.test) for result in results],
+            ["'First:Passing'", "'First:Failing'"])
+
+    @requires_fork
+    def test_fork_does_not_pickle_jobs(self):
+        # Given
+        runner = ProcessCaseRunner(processes=2, start_method=START_FORK)
+
+        # When
+        with patch.object(CaseJob, '__reduce_ex__',
+                          side_effect=AssertionError('pickled')):
+            collector, results = run_suite(runner, self.suite)
+
+        # Then
+        self._assert_results(results)
+
+    @requires_fork
+    @unittest.skipUnless(hasattr(gc, 'freeze'), 'Requires Python 3.7')
+    def test_fork_workers_share_frozen_heap(self):
+        # Given
+        runner = ProcessCaseRunner(processes=1, start_method=START_FORK)
+
+        # When
+        pool = runner._start_pool(1)
+        try:
+            worker_freeze_count = pool.apply(gc.get_freeze_count)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        # Then
+        self.assertGreater(worker_freeze_count, 0)
+        self.assertEqual(gc.get_freeze_count(), 0)
+        for name in PRELOAD_MODULES:
+            self.assertIn(name, sys.modules)
+
+    def test_spawn(self):
+        # Given
+        runner = ProcessCaseRunner(processes=1, start_method=START_SPAWN)
+
+        # When
+        collector, results = run_suite(runner, self.suite)
+
+        # Then
+        self._assert_results(results)
+
+    def test_frozen_heap_without_gc_freeze(self):
+        # Given
+        gc_module = Mock(spec=['collect'])
+
+        # When
+        with patch('usagi.process_runner.gc', gc_module):
+            with frozen_heap():
+                pass
+
+        # Then
+        self.assertEqual(gc_module.method_calls, [])
+
+    def test_without_multiprocessing_contexts(self):
+        # Given
+        multiprocessing_module = Mock(spec=['Pool', 'Process'])
+
+        # When
+        with patch('usagi.process_runner.multiprocessing',
+                   multiprocessing_module):
+            start_methods = get_all_start_methods()
+            context = get_context(default_start_method())
+            with self.assertRaises(ValueError):
+                get_context(START_FORKSERVER)
+
+        # Then
+        self.assertEqual(start_methods, [default_start_method()])
+        self.assertIs(context, multiprocessing_module)
+
+    def test_preload(self):
+        # When
+        with patch('usagi.process_runner.get_registry') as get_registry:
+            preload()
+
+        # Then
+        get_registry.return_value.load_all.assert_called_once_with()
+        self.assertIn('usagi.tls', sys.modules)
+
+    def test_parser_arguments(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--warnings', default=None)
+        ProcessCaseRunner.add_parser_arguments(
+            parser, '--runner-', 'runner_')
+        ProcessCaseRunner.add_parser_arguments(
+            parser, '--runner-', 'runner_')
+
+        # When
+        args = parser.parse_args([
+            '--runner-usagi-processes', '3',
+            '--runner-usagi-process-group', 'file',
+            '--runner-usagi-start-method', 'spawn'])
+        runner = ProcessCaseRunner.from_args(args, 'runner_')
+
+        # Then
+        self.assertEqual(runner.processes, 3)
+        self.assertEqual(runner.group, GROUP_FILE)
+        self.assertEqual(runner.start_method, START_SPAWN)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from mock import Mock, patch
+
+from haas.testing import unittest
+
+from ..plugins.assertions import StatusCodeAssertion
+from ..registry import (
+    ASSERTIONS, PARAMETERS, TRANSPORTS, VAR_LOADERS, PluginNamespace,
+    PluginRegistry, get_registry)
+
+
+def _entry_point(name, plugin, value='module:Plugin', version='1.0'):
+    entry_point = Mock(spec=['name', 'value', 'dist', 'load'])
+    entry_point.name = name
+    entry_point.value = value
+    entry_point.dist.version = version
+    entry_point.load.return_value = plugin
+    return entry_point
+
+
+class TestPluginNamespace(unittest.TestCase):
+
+    def test_plugin_loaded_on_first_use(self):
+        # Given
+        plugin = object()
+        entry_point = _entry_point('plugin', plugin)
+        other = _entry_point('other', object())
+        namespace = PluginNamespace('usagi.test', [entry_point, other])
+
+        # When
+        names = sorted(namespace)
+
+        # Then
+        self.assertEqual(names, ['other', 'plugin'])
+        self.assertIn('plugin', namespace)
+        self.assertEqual(len(namespace), 2)
+        self.assertFalse(entry_point.load.called)
+
+        # When
+        loaded = namespace['plugin']
+
+        # Then
+        self.assertIs(loaded, plugin)
+        self.assertIs(namespace.get('plugin'), plugin)
+        entry_point.load.assert_called_once_with()
+        self.assertFalse(other.load.called)
+
+    def test_missing_plugin(self):
+        # Given
+        namespace = PluginNamespace('usagi.test', [])
+
+        # When/Then
+        self.assertNotIn('plugin', namespace)
+        self.assertIsNone(namespace.get('plugin'))
+        with self.assertRaises(KeyError):
+            namespace['plugin']
+
+    def test_duplicate_plugin(self):
+        # Given
+        first = _entry_point('plugin', object())
+        second = _entry_point('plugin', object())
+        namespace = PluginNamespace('usagi.test', [first, second])
+
+        # When
+        plugin = namespace['plugin']
+
+        # Then
+        self.assertIs(plugin, first.load.return_value)
+        self.assertFalse(second.load.called)
+
+    def test_specs(self):
+        # Given
+        entry_point = _entry_point(
+            'plugin', object(), value='package.module:Plugin', version='1.2')
+        namespace = PluginNamespace('usagi.test', [entry_point])
+
+        # When
+        specs = namespace.specs()
+
+        # Then
+        self.assertEqual(specs, {'plugin': 'package.module:Plugin (1.2)'})
+        self.assertFalse(entry_point.load.called)
+
+
+class TestPluginRegistry(unittest.TestCase):
+
+    def test_builtin_plugins(self):
+        # Given
+        registry = PluginRegistry()
+
+        # Then
+        self.assertIs(registry.assertions['status_code'], StatusCodeAssertion)
+        self.assertIn('method', registry.parameters)
+        self.assertIn('env', registry.var_loaders)
+
+    def test_entry_points_scanned_once(self):
+        # Given
+        registry = PluginRegistry()
+        scanned = {ASSERTIONS: [], PARAMETERS: [], VAR_LOADERS: []}
+
+        # When
+        with patch('usagi.registry._scan_entry_points',
+                   return_value=scanned) as scan:
+            registry.assertions
+            registry.parameters
+            registry.var_loaders
+
+        # Then
+        scan.assert_called_once_with(PluginRegistry.namespaces)
+
+    def test_load_all(self):
+        # Given
+        plugin = object()
+        entry_point = _entry_point('plugin', plugin)
+        broken = _entry_point('broken', None)
+        broken.load.side_effect = ImportError('No module named broken')
+        registry = PluginRegistry()
+        scanned = {ASSERTIONS: [entry_point, broken], PARAMETERS: [],
+                   VAR_LOADERS: [], TRANSPORTS: []}
+
+        # When
+        with patch('usagi.registry._scan_entry_points',
+                   return_value=scanned):
+            registry.load_all()
+
+        # Then
+        entry_point.load.assert_called_once_with()
+        broken.load.assert_called_once_with()
+        self.assertIs(registry.assertions['plugin'], plugin)
+
+    def test_specs(self):
+        # Given
+        registry = PluginRegistry()
+
+        # When
+        specs = registry.specs()
+
+        # Then
+        self.assertIn('usagi.assertions:status_code', specs)
+        self.assertTrue(
+            specs['usagi.assertions:status_code'].startswith(
+                'usagi.plugins.assertions:StatusCodeAssertion'))
+
+    def test_get_registry(self):
+        # When
+        registry = get_registry()
+
+        # Then
+        self.assertIsInstance(registry, PluginRegistry)
+        self.assertIs(get_registry(), registry)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import json
+
+from haas.testing import unittest
+
+from ..config import Config
+from ..plugins.assertions import (
+    BodyAssertion, HeaderAssertion, Sha256BodyAssertion, StatusCodeAssertion)
+from ..response import BufferedResponse
+
+
+class TestBufferedResponse(unittest.TestCase):
+
+    def test_attributes(self):
+        # Given
+        body = {'data': ['é']}
+        content = json.dumps(body).encode('utf-8')
+
+        # When
+        response = BufferedResponse(
+            200, [('Content-Type', 'application/json; charset=utf-8')],
+            content, url='http://test.domain/', reason='OK')
+
+        # Then
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.ok)
+        self.assertEqual(
+            response.headers['content-type'],
+            'application/json; charset=utf-8')
+        self.assertEqual(response.encoding, 'utf-8')
+        self.assertEqual(response.json(), body)
+        self.assertEqual(
+            b''.join(response.iter_content(chunk_size=3)), content)
+
+    def test_text_encoding(self):
+        # When
+        response = BufferedResponse(
+            404, {'Content-Type': 'text/plain; charset=latin-1'},
+            'été'.encode('latin-1'))
+
+        # Then
+        self.assertFalse(response.ok)
+        self.assertEqual(response.text, 'été')
+
+    def test_assertion_plugins(self):
+        # Given
+        config = Config.from_dict({'host': 'test.domain'}, __file__)
+        content = b'{"key": "value"}'
+        response = BufferedResponse(
+            200, {'Content-Type': 'application/json'}, content)
+        assertions = [
+            StatusCodeAssertion.from_dict({'expected': 200}),
+            HeaderAssertion.from_dict(
+                {'header': 'content-type', 'value': 'application/json'}),
+            BodyAssertion.from_dict(
+                {'format': 'json', 'value': {'key': 'value'},
+                 'lookup-var': False}),
+            Sha256BodyAssertion.from_dict(
+                {'expected': hashlib.sha256(content).hexdigest()}),
+        ]
+
+        # When/Then
+        for assertion in assertions:
+            assertion.run(config, 'http://test.domain/', self, response)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import textwrap
+import threading
+import time
+
+import responses
+import yaml
+
+from haas.loader import Loader
+from haas import result as haas_result
+from haas.suite import find_test_cases
+from haas.testing import unittest
+
+from ..runner import ThreadedCaseRunner, group_test_cases
+from ..sessions import get_session_manager
+from ..yaml_test_loader import YamlTestLoader
+from .utils import run_suite, short_test_name
+
+
+TEST_YAML = textwrap.dedent("""
+  version: '1.0'
+
+  config:
+    host: test.domain
+
+  cases:
+    - name: "Slow"
+      tests:
+        - name: "First"
+          url: "/slow"
+          assertions:
+            - name: status_code
+              expected: 200
+        - name: "Second"
+          url: "/fast"
+          assertions:
+            - name: status_code
+              expected: 200
+    - name: "Fast"
+      tests:
+        - name: "Failing"
+          url: "/fast"
+          assertions:
+            - name: status_code
+              expected: 404
+        - name: "Passing"
+          url: "/fast"
+          assertions:
+            - name: status_code
+              expected: 200
+    - name: "Other"
+      tests:
+        - name: "Only"
+          url: "/fast"
+""")
+
+
+class TestThreadedCaseRunner(unittest.TestCase):
+
+    def setUp(self):
+        loader = YamlTestLoader(Loader())
+        self.suite = loader.load_tests_from_yaml(
+            yaml.safe_load(TEST_YAML), '/path/to/test_runner.yml')
+        self.threads = set()
+        self.addCleanup(setattr, get_session_manager(), 'concurrency', 1)
+
+    def _callback(self, delay):
+        def callback(request):
+            self.threads.add(threading.current_thread().name)
+            time.sleep(delay)
+            return (200, {}, '')
+        return callback
+
+    def _add_responses(self):
+        responses.add_callback(
+            responses.GET, 'http://test.domain/slow',
+            callback=self._callback(0.2))
+        responses.add_callback(
+            responses.GET, 'http://test.domain/fast',
+            callback=self._callback(0))
+
+    def test_group_test_cases(self):
+        # When
+        units = group_test_cases(self.suite)
+
+        # Then
+        self.assertEqual(
+            [[short_test_name(test) for test in unit] for unit in units],
+            [["'Slow:First'", "'Slow:Second'"],
+             ["'Fast:Failing'", "'Fast:Passing'"],
+             ["'Other:Only'"]])
+
+    @responses.activate
+    def test_results_in_suite_order(self):
+        # Given
+        self._add_responses()
+        runner = ThreadedCaseRunner(threads=3)
+
+        # When
+        collector, results = run_suite(runner, self.suite)
+
+        # Then
+        self.assertFalse(collector.wasSuccessful())
+        self.assertEqual(collector.testsRun, 5)
+        self.assertEqual(
+            [short_test_name(result.test) for result in results],
+            [short_test_name(test) for test in find_test_cases(self.suite)])
+        status = haas_result.TestCompletionStatus
+        self.assertEqual(
+            [result.status for result in results],
+            [status.success, status.success, status.failure,
+             status.success, status.success])
+        self.assertGreater(len(self.threads), 1)
+        self.assertEqual(get_session_manager().concurrency, 3)
+
+    @responses.activate
+    def test_single_thread(self):
+        # Given
+        self._add_responses()
+        runner = ThreadedCaseRunner(threads=1)
+
+        # When
+        collector, results = run_suite(runner, self.suite)
+
+        # Then
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len(self.threads), 1)
+
+    @responses.activate
+    def test_failfast(self):
+        # Given
+        self._add_responses()
+        runner = ThreadedCaseRunner(threads=1)
+
+        # When
+        collector, results = run_suite(runner, self.suite, failfast=True)
+
+        # Then
+        self.assertTrue(collector.shouldStop)
+        self.assertEqual(
+            [short_test_name(result.test) for result in results],
+            ["'Slow:First'", "'Slow:Second'", "'Fast:Failing'"])
+
+    def test_parser_arguments(self):
+        # Given
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--warnings', default=None)
+
+        # When
+        ThreadedCaseRunner.add_parser_arguments(
+            parser, '--runner-', 'runner_')
+        ThreadedCaseRunner.add_parser_arguments(
+            parser, '--runner-', 'runner_')
+        args = parser.parse_args(['--runner-usagi-threads', '4'])
+        runner = ThreadedCaseRunner.from_args(args, 'runner_')
+
+        # Then
+        self.assertEqual(runner.threads, 4)
@@ -8,13 +8,22 @@ from __future__ import absolute_import, unicode_literals
 
 import textwrap
 
+from mock import patch
 from jsonschema.exceptions import ValidationError
 import jsonschema
 import yaml
 
 from haas.testing import unittest
 
-from ..schema import SCHEMA
+from .. import schema
+from ..schema import (
+    SCHEMA, VALIDATOR_BACKEND_FASTJSONSCHEMA, VALIDATOR_BACKEND_JSONSCHEMA,
+    get_validator, set_validator_backend, validate)
+
+try:
+    import fastjsonschema
+except ImportError:  # pragma: no cover
+    fastjsonschema = None
 
 
 class TestSchema(unittest.TestCase):
@@ -471,3 +480,273 @@ class TestSchema(unittest.TestCase):
         # Validation fails
         with self.assertRaises(ValidationError):
             jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_tags(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Basic"
+              tags: [smoke, users]
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+                  tags: [slow]
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation succeeds
+        jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_tags_not_strings(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+                  tags: [1]
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation fails
+        with self.assertRaises(ValidationError):
+            jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_connection(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: test.domain
+            connection:
+              pool-size: 4
+              keep-alive: true
+              reuse: file
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation succeeds
+        jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_connection_invalid_reuse(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: test.domain
+            connection:
+              reuse: forever
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation fails
+        with self.assertRaises(ValidationError):
+            jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_app(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            app:
+              target: my_service.wsgi:application
+              interface: wsgi
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation succeeds
+        jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_app_invalid_target(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            app: my_service.wsgi
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation fails
+        with self.assertRaises(ValidationError):
+            jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_socket(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            host: api.test
+            socket:
+              type: env
+              env: API_SOCKET
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation succeeds
+        jsonschema.validate(test_data, SCHEMA)
+
+    def test_schema_no_host_or_app(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+          version: '1.0'
+
+          config:
+            scheme: https
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Another URL"
+                  url: "/another"
+
+        """)
+
+        test_data = yaml.safe_load(test_yaml)
+
+        # Validation fails
+        with self.assertRaises(ValidationError):
+            jsonschema.validate(test_data, SCHEMA)
+
+
+class TestValidate(unittest.TestCase):
+
+    _schema = {
+        '$schema': 'http://json-schema.org/draft-04/schema#',
+        'type': 'object',
+        'properties': {
+            'expected': {
+                'type': 'integer',
+            },
+        },
+        'required': ['expected']
+    }
+
+    def tearDown(self):
+        set_validator_backend(VALIDATOR_BACKEND_JSONSCHEMA)
+
+    def test_validator_cached(self):
+        # When
+        validator = get_validator(self._schema)
+
+        # Then
+        self.assertIs(get_validator(self._schema), validator)
+        self.assertIsNot(get_validator(SCHEMA), validator)
+
+    def test_validator_built_once(self):
+        # Given
+        schema_ = dict(self._schema)
+        get_validator(schema_)
+
+        # When
+        with patch.object(jsonschema.Draft4Validator, 'check_schema') as mock:
+            validate({'expected': 200}, schema_)
+
+        # Then
+        self.assertFalse(mock.called)
+
+    def test_validate(self):
+        # When/Then
+        validate({'expected': 200}, self._schema)
+        with self.assertRaises(ValidationError):
+            validate({'expected': '200'}, self._schema)
+
+    def test_validate_same_error_as_jsonschema(self):
+        # Given
+        data = {'version': '1.0', 'config': {'host': 1}, 'cases': []}
+        with self.assertRaises(ValidationError) as exc_context:
+            jsonschema.validate(data, SCHEMA)
+        expected = str(exc_context.exception)
+
+        # When
+        with self.assertRaises(ValidationError) as exc_context:
+            validate(data, SCHEMA)
+
+        # Then
+        self.assertEqual(str(exc_context.exception), expected)
+
+    def test_invalid_backend(self):
+        # When/Then
+        with self.assertRaises(ValueError):
+            set_validator_backend('invalid')
+
+    @unittest.skipIf(fastjsonschema is None, 'fastjsonschema not installed')
+    def test_fastjsonschema_backend(self):
+        # Given
+        set_validator_backend(VALIDATOR_BACKEND_FASTJSONSCHEMA)
+
+        # When/Then
+        validate({'expected': 200}, self._schema)
+        with self.assertRaises(ValidationError):
+            validate({'expected': '200'}, self._schema)
+        self.assertIn(id(self._schema), schema._fast_validators)
+
+    def test_fastjsonschema_backend_not_installed(self):
+        # Given
+        with patch.dict('sys.modules', {'fastjsonschema': None}):
+
+            # When
+            set_validator_backend(VALIDATOR_BACKEND_FASTJSONSCHEMA)
+
+        # Then
+        self.assertEqual(
+            schema.get_validator_backend(), VALIDATOR_BACKEND_JSONSCHEMA)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from haas.testing import unittest
+
+from ..selection import TestSelector
+from ..sharding import Shard
+
+
+CASES = [
+    {
+        'name': 'Users',
+        'tags': ['smoke'],
+        'case-setup': ['login'],
+        'tests': [
+            {'name': 'List users', 'url': '/users'},
+            {'name': 'Create user', 'url': '/users', 'tags': ['slow']},
+        ],
+    },
+    {
+        'name': 'Groups',
+        'tests': [
+            {'name': 'List groups', 'url': '/groups'},
+            {'name': 'Delete group', 'url': '/groups/1', 'tags': ['slow']},
+        ],
+    },
+]
+
+
+def _names(cases):
+    return [
+        (case['name'], [test['name'] for test in case['tests']])
+        for case in cases
+    ]
+
+
+class TestTestSelector(unittest.TestCase):
+
+    def test_select_all(self):
+        # Given
+        selector = TestSelector()
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertTrue(selector.selects_all)
+        self.assertEqual(len(cases), 2)
+        self.assertIs(cases[0], CASES[0])
+        self.assertIs(cases[1], CASES[1])
+
+    def test_select_case_pattern(self):
+        # Given
+        selector = TestSelector(case_patterns=['Gr*'])
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertEqual(
+            _names(cases), [('Groups', ['List groups', 'Delete group'])])
+
+    def test_select_test_pattern(self):
+        # Given
+        selector = TestSelector(test_patterns=['List *'])
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertEqual(
+            _names(cases),
+            [('Users', ['List users']), ('Groups', ['List groups'])])
+        self.assertEqual(cases[0]['case-setup'], ['login'])
+        self.assertEqual(len(CASES[0]['tests']), 2)
+
+    def test_select_test_tag(self):
+        # Given
+        selector = TestSelector(tags=['slow'])
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertEqual(
+            _names(cases),
+            [('Users', ['Create user']), ('Groups', ['Delete group'])])
+
+    def test_select_case_tag(self):
+        # Given
+        selector = TestSelector(tags=['smoke'])
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertEqual(
+            _names(cases), [('Users', ['List users', 'Create user'])])
+
+    def test_select_combined(self):
+        # Given
+        selector = TestSelector(
+            case_patterns=['Users'], test_patterns=['*user*'],
+            tags=['slow'])
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertEqual(_names(cases), [('Users', ['Create user'])])
+
+    def test_select_nothing(self):
+        # Given
+        selector = TestSelector(test_patterns=['No such test'])
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertEqual(cases, [])
+
+    def test_patterns_case_sensitive(self):
+        # Given
+        selector = TestSelector(case_patterns=['users'])
+
+        # When
+        cases = list(selector.select_cases(CASES))
+
+        # Then
+        self.assertEqual(cases, [])
+
+    def test_select_shard(self):
+        # Given
+        selectors = [
+            TestSelector(tags=['smoke', 'slow'], shard=Shard(index, 2))
+            for index in range(2)]
+
+        # When
+        shards = [
+            _names(selector.select_cases(CASES, '/path/to/test.yml'))
+            for selector in selectors]
+
+        # Then
+        self.assertFalse(selectors[0].selects_all)
+        self.assertEqual(sorted(shards[0] + shards[1]), [
+            ('Groups', ['Delete group']),
+            ('Users', ['List users', 'Create user']),
+        ])
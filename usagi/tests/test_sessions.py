@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from haas.testing import unittest
+
+from ..sessions import (
+    REUSE_CASE, REUSE_FILE, REUSE_PROCESS, ConnectionConfig, SessionManager,
+    get_session_manager)
+from .utils import make_config
+
+
+class TestConnectionConfig(unittest.TestCase):
+
+    def test_defaults(self):
+        # When
+        connection = ConnectionConfig.from_dict({})
+
+        # Then
+        self.assertEqual(connection.pool_size, 10)
+        self.assertTrue(connection.keep_alive)
+        self.assertEqual(connection.reuse, REUSE_PROCESS)
+
+    def test_from_config(self):
+        # When
+        config = make_config(host='test.domain', connection={
+            'pool-size': 3, 'keep-alive': False, 'reuse': REUSE_FILE})
+
+        # Then
+        self.assertEqual(config.connection.pool_size, 3)
+        self.assertFalse(config.connection.keep_alive)
+        self.assertEqual(config.connection.reuse, REUSE_FILE)
+
+
+class TestSessionManager(unittest.TestCase):
+
+    url = 'http://test.domain/path'
+
+    def setUp(self):
+        self.manager = SessionManager()
+
+    def tearDown(self):
+        self.manager.close()
+
+    def test_process_reuse(self):
+        # Given
+        config_1 = make_config('/path/to/test_one.yml', host='test.domain')
+        config_2 = make_config('/path/to/test_two.yml', host='test.domain')
+
+        # When
+        session_1 = self.manager.create_session(config_1)
+        session_2 = self.manager.create_session(config_2)
+
+        # Then
+        self.assertIsNot(session_1, session_2)
+        adapter = session_1.get_adapter(self.url)
+        self.assertIs(session_2.get_adapter(self.url), adapter)
+        self.assertEqual(adapter._pool_maxsize, 10)
+
+    def test_file_reuse(self):
+        # Given
+        config_1 = make_config(
+            '/path/to/test_one.yml', host='test.domain',
+            connection={'reuse': REUSE_FILE})
+        config_2 = make_config(
+            '/path/to/test_two.yml', host='test.domain',
+            connection={'reuse': REUSE_FILE})
+
+        # When
+        session_1 = self.manager.create_session(config_1)
+        session_2 = self.manager.create_session(config_1)
+        session_3 = self.manager.create_session(config_2)
+
+        # Then
+        adapter = session_1.get_adapter(self.url)
+        self.assertIs(session_2.get_adapter(self.url), adapter)
+        self.assertIsNot(session_3.get_adapter(self.url), adapter)
+
+    def test_case_reuse(self):
+        # Given
+        config = make_config(
+            host='test.domain', connection={'reuse': REUSE_CASE})
+
+        # When
+        session_1 = self.manager.create_session(config)
+        session_2 = self.manager.create_session(config)
+
+        # Then
+        self.assertIsNot(
+            session_1.get_adapter(self.url), session_2.get_adapter(self.url))
+
+    def test_hosts_not_shared(self):
+        # Given
+        config_1 = make_config(host='test.domain')
+        config_2 = make_config(host='test.domain.other')
+
+        # When
+        session_1 = self.manager.create_session(config_1)
+        session_2 = self.manager.create_session(config_2)
+
+        # Then
+        self.assertIsNot(
+            session_1.get_adapter(self.url),
+            session_2.get_adapter('http://test.domain.other/path'))
+        self.assertIsNot(
+            session_1.get_adapter('http://test.domain.other/path'),
+            session_2.get_adapter('http://test.domain.other/path'))
+
+    def test_pool_size(self):
+        # Given
+        config = make_config(
+            host='test.domain', connection={'pool-size': 2})
+
+        # When
+        session = self.manager.create_session(config)
+
+        # Then
+        self.assertEqual(session.get_adapter(self.url)._pool_maxsize, 2)
+
+    def test_no_keep_alive(self):
+        # Given
+        config = make_config(
+            host='test.domain', connection={'keep-alive': False})
+
+        # When
+        session = self.manager.create_session(config)
+
+        # Then
+        self.assertEqual(session.headers['Connection'], 'close')
+
+    def test_cookies_isolated(self):
+        # Given
+        config = make_config(host='test.domain')
+        session_1 = self.manager.create_session(config)
+        session_2 = self.manager.create_session(config)
+
+        # When
+        session_1.cookies.set('token', 'secret', domain='test.domain')
+
+        # Then
+        self.assertEqual(len(session_2.cookies), 0)
+
+    def test_close(self):
+        # Given
+        config = make_config(host='test.domain')
+        session_1 = self.manager.create_session(config)
+
+        # When
+        self.manager.close()
+        session_2 = self.manager.create_session(config)
+
+        # Then
+        self.assertIsNot(
+            session_1.get_adapter(self.url), session_2.get_adapter(self.url))
+
+    def test_process_wide_manager(self):
+        # Then
+        self.assertIs(get_session_manager(), get_session_manager())
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from datetime import datetime, timedelta
+import json
+import os
+import shutil
+import tempfile
+
+from haas import result as haas_result
+from haas.testing import unittest
+
+from ..config import Config
+from ..result_handler import DurationsResultHandler
+from ..sharding import (
+    Shard, assign_by_duration, case_key, hash_shard, load_durations,
+    parse_shard)
+from ..yaml_test_loader import create_test_case_for_case
+from .utils import enabled_result_handlers
+
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('1/4'), (0, 4))
+        self.assertEqual(parse_shard('4/4'), (3, 4))
+        for value in ('0/4', '5/4', '1', '1/0', 'a/b', '1/4/2'):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_case_key(self):
+        # When
+        key = case_key(os.path.join(os.getcwd(), 'api', 'test.yml'), 'Users')
+
+        # Then
+        self.assertEqual(key, 'api/test.yml::Users')
+
+    def test_hash_shards_are_disjoint(self):
+        # Given
+        keys = ['test.yml::Case {0}'.format(index) for index in range(50)]
+        shards = [Shard(index, 3) for index in range(3)]
+
+        # When
+        selected = [
+            [key for key in keys if shard.selects(key)] for shard in shards]
+
+        # Then
+        self.assertEqual(sorted(sum(selected, [])), sorted(keys))
+        for keys in selected:
+            self.assertGreater(len(keys), 0)
+        self.assertEqual(
+            [hash_shard(key, 3) for key in selected[1]],
+            [1] * len(selected[1]))
+
+    def test_assign_by_duration(self):
+        # Given
+        durations = {'a': 10.0, 'b': 6.0, 'c': 5.0, 'd': 4.0, 'e': 1.0}
+
+        # When
+        assignments = assign_by_duration(durations, durations, 2)
+
+        # Then
+        self.assertEqual(
+            assignments, {'a': 0, 'b': 1, 'c': 1, 'd': 0, 'e': 1})
+
+    def test_assign_unknown_durations(self):
+        # Given
+        durations = {'a': 9.0, 'b': 3.0}
+
+        # When
+        assignments = assign_by_duration(['a', 'b', 'c', 'd'], durations, 2)
+
+        # Then
+        # c and d are assumed to take 6s each.
+        self.assertEqual(
+            assignments, {'a': 0, 'c': 1, 'd': 1, 'b': 0})
+
+    def test_balanced_shard_falls_back_to_hash(self):
+        # Given
+        shard = Shard(0, 2, durations={})
+
+        # When
+        shard.balance(['a', 'b'])
+
+        # Then
+        self.assertTrue(shard.balanced)
+        self.assertEqual(shard.selects('c'), hash_shard('c', 2) == 0)
+
+    def test_load_durations(self):
+        # Given
+        first = os.path.join(self.temp_dir, 'first.json')
+        second = os.path.join(self.temp_dir, 'second.json')
+        with open(first, 'w') as fh:
+            json.dump({'a': 1.0, 'b': 2.0}, fh)
+        with open(second, 'w') as fh:
+            json.dump({'b': 3.0}, fh)
+        missing = os.path.join(self.temp_dir, 'missing.json')
+
+        # When
+        durations = load_durations([first, second, missing])
+
+        # Then
+        self.assertEqual(durations, {'a': 1.0, 'b': 3.0})
+
+
+class TestDurationsResultHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.filename = os.path.join(self.temp_dir, 'test_api.yml')
+        config = Config.from_dict({'host': 'test.domain'}, self.filename)
+        case = {
+            'name': 'Users',
+            'tests': [{'name': 'One', 'url': '/'},
+                      {'name': 'Two', 'url': '/'}],
+        }
+        self.test_class = create_test_case_for_case(
+            self.filename, config, case, {}, {}, {})
+
+    def _result(self, name, seconds):
+        start = datetime(2015, 1, 1)
+        return haas_result.TestResult(
+            self.test_class, name, haas_result.TestCompletionStatus.success,
+            haas_result.TestDuration(
+                start, start + timedelta(seconds=seconds)))
+
+    def test_enabled_by_haas(self):
+        # Given
+        path = os.path.join(self.temp_dir, 'durations.json')
+
+        # When
+        handlers = enabled_result_handlers(['--with-usagi-durations', path])
+
+        # Then
+        handlers = [handler for handler in handlers
+                    if isinstance(handler, DurationsResultHandler)]
+        self.assertEqual(len(handlers), 1)
+        self.assertEqual(handlers[0].path, path)
+
+    def test_record_case_durations(self):
+        # Given
+        path = os.path.join(self.temp_dir, 'durations.json')
+        with open(path, 'w') as fh:
+            json.dump({'other.yml::Case': 5.0}, fh)
+        handler = DurationsResultHandler(path)
+
+        # When
+        handler.start_test_run()
+        handler(self._result('test_00', 1.5))
+        handler(self._result('test_01', 2.0))
+        handler.stop_test_run()
+
+        # Then
+        self.assertEqual(load_durations([path]), {
+            'other.yml::Case': 5.0,
+            case_key(self.filename, 'Users'): 3.5,
+        })
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import os
+import ssl
+import threading
+
+from mock import patch
+from six import StringIO
+from six.moves import BaseHTTPServer, socketserver
+
+from haas.plugins.result_handler import TimingResultHandler
+from haas.testing import unittest
+
+from ..config import Config
+from ..connections import ResolvingPoolManager
+from ..dns import Resolver
+from ..result_handler import TlsStatsResultHandler
+from ..sessions import SessionManager
+from ..tls import SUPPORTS_RESUMPTION, TlsContextCache
+from .utils import enabled_result_handlers
+
+CERTIFICATE = os.path.join(os.path.dirname(__file__), 'localhost.pem')
+
+requires_resumption = unittest.skipUnless(
+    SUPPORTS_RESUMPTION, 'TLS session resumption is not supported')
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'OK'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _TLSServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        BaseHTTPServer.HTTPServer.__init__(self, *args, **kwargs)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(CERTIFICATE)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class TestTlsContextCache(unittest.TestCase):
+
+    def test_context_shared(self):
+        # Given
+        cache = TlsContextCache()
+
+        # When
+        context_1 = cache.get_context('CERT_REQUIRED', ca_certs=CERTIFICATE)
+        context_2 = cache.get_context(
+            ssl.CERT_REQUIRED, ca_certs=CERTIFICATE)
+        context_3 = cache.get_context('CERT_NONE')
+
+        # Then
+        self.assertIs(context_1, context_2)
+        self.assertIsNot(context_1, context_3)
+        self.assertEqual(context_1.verify_mode, ssl.CERT_REQUIRED)
+        self.assertTrue(context_1.check_hostname)
+        self.assertEqual(context_3.verify_mode, ssl.CERT_NONE)
+        self.assertFalse(context_3.check_hostname)
+
+    def test_resumption_disabled(self):
+        # Given
+        cache = TlsContextCache(resumption=False)
+
+        # When
+        context = cache.get_context(ca_certs=CERTIFICATE)
+
+        # Then
+        self.assertIs(type(context), ssl.SSLContext)
+
+    def test_clear(self):
+        # Given
+        cache = TlsContextCache()
+        context = cache.get_context(ca_certs=CERTIFICATE)
+        cache.record_handshake(resumed=False)
+
+        # When
+        cache.clear()
+
+        # Then
+        self.assertIsNot(cache.get_context(ca_certs=CERTIFICATE), context)
+        self.assertEqual(cache.stats.full_handshakes, 0)
+
+
+@requires_resumption
+class TestTlsResumption(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _TLSServer(('127.0.0.1', 0), _Handler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+        self.host = 'localhost:{0}'.format(self.server.server_port)
+        self.cache = TlsContextCache()
+        patcher = patch('usagi.connections.get_tls_cache',
+                        return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = SessionManager()
+
+    def tearDown(self):
+        self.manager.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _config(self, **connection):
+        return Config.from_dict({
+            'host': self.host,
+            'scheme': 'https',
+            'resolve': {'localhost': '127.0.0.1'},
+            'connection': connection,
+        }, '/path/to/test.yml')
+
+    def test_sessions_resume(self):
+        # Given
+        config = self._config(reuse='case')
+        url = 'https://{0}/'.format(self.host)
+
+        # When
+        for _ in range(3):
+            session = self.manager.create_session(config)
+            response = session.get(url, verify=CERTIFICATE)
+            self.assertEqual(response.text, 'OK')
+            session.close()
+
+        # Then
+        stats = self.cache.stats
+        self.assertEqual(stats.full_handshakes, 1)
+        self.assertEqual(stats.resumed_handshakes, 2)
+
+    def test_no_keep_alive(self):
+        # Given
+        config = self._config(**{'keep-alive': False})
+        session = self.manager.create_session(config)
+        url = 'https://{0}/'.format(self.host)
+
+        # When
+        for _ in range(3):
+            response = session.get(url, verify=CERTIFICATE)
+            self.assertEqual(response.text, 'OK')
+
+        # Then
+        stats = self.cache.stats
+        self.assertEqual(stats.full_handshakes, 1)
+        self.assertEqual(stats.resumed_handshakes, 2)
+
+    def test_pool_manager(self):
+        # Given
+        url = 'https://{0}/'.format(self.host)
+
+        # When
+        for _ in range(2):
+            pool_manager = ResolvingPoolManager(
+                Resolver({'localhost': '127.0.0.1'}), ca_certs=CERTIFICATE)
+            response = pool_manager.request('GET', url)
+            pool_manager.clear()
+
+        # Then
+        self.assertEqual(response.data, b'OK')
+        stats = self.cache.stats
+        self.assertEqual(stats.full_handshakes, 1)
+        self.assertEqual(stats.resumed_handshakes, 1)
+
+    def test_verification_failure(self):
+        # Given
+        config = self._config()
+        session = self.manager.create_session(config)
+        url = 'https://{0}/'.format(self.host)
+
+        # When/Then
+        with self.assertRaises(Exception) as exc:
+            session.get(url)
+        self.assertIn('CERTIFICATE_VERIFY_FAILED', str(exc.exception))
+
+
+class TestTlsStatsResultHandler(unittest.TestCase):
+
+    def _parse(self, argv):
+        parser = argparse.ArgumentParser()
+        parser.add_argument(
+            '--summarize-test-time', nargs='?', type=int,
+            default=TimingResultHandler.OPTION_DEFAULT)
+        TlsStatsResultHandler.add_parser_arguments(
+            parser, 'usagi-tls', '--with-usagi-tls', 'usagi_tls')
+        args = parser.parse_args(argv)
+        return TlsStatsResultHandler.from_args(
+            args, 'usagi-tls', 'usagi_tls', 1)
+
+    def test_enabled(self):
+        # When/Then
+        self.assertIsNone(self._parse([]))
+        self.assertIsInstance(
+            self._parse(['--with-usagi-tls']), TlsStatsResultHandler)
+        self.assertIsInstance(
+            self._parse(['--summarize-test-time']), TlsStatsResultHandler)
+
+    def test_enabled_by_haas(self):
+        # When
+        handlers = enabled_result_handlers(['--with-usagi-tls'])
+
+        # Then
+        self.assertEqual(
+            [type(handler) for handler in handlers
+             if isinstance(handler, TlsStatsResultHandler)],
+            [TlsStatsResultHandler])
+
+    def test_report(self):
+        # Given
+        stream = StringIO()
+        handler = TlsStatsResultHandler(stream=stream)
+        cache = TlsContextCache()
+        cache.record_handshake(resumed=False)
+        cache.record_handshake(resumed=True)
+        cache.record_handshake(resumed=True)
+
+        # When
+        with patch('usagi.tls.get_tls_cache', return_value=cache):
+            handler.start_test_run()
+            handler.stop_test_run()
+
+        # Then
+        output = stream.getvalue()
+        self.assertIn('TLS handshake report', output)
+        self.assertIn('Full handshakes     1', output)
+        self.assertIn('Resumed handshakes  2', output)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+from mock import patch
+import requests
+from six.moves import BaseHTTPServer, socketserver
+
+from haas.testing import unittest
+
+from ..plugins.transports import Urllib3Transport
+from ..sessions import SessionManager
+from .utils import make_config
+
+requires_unix_sockets = unittest.skipUnless(
+    hasattr(socket, 'AF_UNIX'), 'Unix domain sockets are not supported')
+
+
+class _EchoHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({
+            'path': self.path,
+            'host': self.headers.get('Host'),
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return 'unix'
+
+    def log_message(self, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+@requires_unix_sockets
+class TestUnixSocket(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tempdir, 'api.sock')
+        self.server = _UnixHTTPServer(self.socket_path, _EchoHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+        self.manager = SessionManager()
+
+    def tearDown(self):
+        self.manager.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.tempdir)
+
+    def test_config(self):
+        # When
+        with patch.dict(os.environ, {'API_SOCKET': self.socket_path}):
+            config = make_config(socket={'type': 'env', 'env': 'API_SOCKET'})
+
+        # Then
+        self.assertEqual(config.socket, self.socket_path)
+        self.assertEqual(config.host, 'localhost')
+
+    def test_requests_over_socket(self):
+        # Given
+        config = make_config(socket=self.socket_path, host='api.test')
+        session = self.manager.create_session(config)
+
+        # When
+        response = session.get('http://api.test/items?page=2')
+
+        # Then
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {'path': '/items?page=2', 'host': 'api.test'})
+
+    def test_pool_shared(self):
+        # Given
+        config = make_config(socket=self.socket_path)
+
+        # When
+        session_1 = self.manager.create_session(config)
+        session_2 = self.manager.create_session(config)
+
+        # Then
+        self.assertIs(
+            session_1.get_adapter('http://localhost/'),
+            session_2.get_adapter('http://localhost/'))
+
+    def test_no_keep_alive(self):
+        # Given
+        config = make_config(
+            socket=self.socket_path, connection={'keep-alive': False})
+        session = self.manager.create_session(config)
+
+        # When
+        response = session.get('http://localhost/')
+
+        # Then
+        self.assertEqual(response.json()['host'], 'localhost')
+
+    def test_missing_socket(self):
+        # Given
+        config = make_config(socket=os.path.join(self.tempdir, 'missing.sock'))
+        session = self.manager.create_session(config)
+
+        # When/Then
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            session.get('http://localhost/')
+
+    def test_urllib3_transport(self):
+        # Given
+        transport = Urllib3Transport()
+        client = transport.create_client(
+            make_config(socket=self.socket_path, host='api.test'))
+
+        # When
+        try:
+            response = client.request('GET', 'http://api.test/status')
+        finally:
+            transport.close()
+
+        # Then
+        self.assertEqual(
+            response.json(), {'path': '/status', 'host': 'api.test'})
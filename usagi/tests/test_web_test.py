@@ -10,6 +10,7 @@ import itertools
 import json
 
 from mock import Mock, patch
+import requests
 import responses
 import six
 from six.moves import urllib
@@ -284,6 +285,34 @@ class TestWebTest(unittest.TestCase):
         # No maxDiff has been set
         self.assertIsInstance(case.maxDiff, Mock)
 
+    @responses.activate
+    def test_run_connection_error(self):
+        # Given
+        config = Config.from_dict({'host': 'test.invalid'}, __file__)
+        session = create_session()
+        test_spec = {
+            'name': 'A test',
+            'url': '/api/test',
+        }
+        test = WebTest.from_dict(
+            session, test_spec, config, {}, self.test_parameter_plugins)
+        responses.add(
+            self._get_web_test_method(test),
+            test.url,
+            body=requests.exceptions.ConnectionError('refused'),
+        )
+        case = MockTestCase()
+        case.fail.side_effect = AssertionError
+
+        # When
+        with self.assertRaises(AssertionError):
+            test.run(case)
+
+        # Then
+        args, kwargs = case.fail.call_args
+        self.assertIn('Unable to connect', args[0])
+        self.assertIsNone(test.response_size)
+
     @responses.activate
     def test_run_null_max_diff(self):
         # Given
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+from mock import Mock
+import yaml
+
+from haas.testing import unittest
+
+from .. import yaml_backend
+
+
+class TestYamlBackend(unittest.TestCase):
+
+    def test_backend(self):
+        # When
+        if getattr(yaml, '__with_libyaml__', False):
+            expected = yaml_backend.BACKEND_LIBYAML
+        else:
+            expected = yaml_backend.BACKEND_PYTHON
+
+        # Then
+        self.assertEqual(yaml_backend.BACKEND, expected)
+
+    def test_select_python_backend(self):
+        # Given
+        yaml_module = Mock(spec=['SafeLoader', 'SafeDumper'])
+
+        # When
+        backend, loader, dumper = yaml_backend._select_backend(yaml_module)
+
+        # Then
+        self.assertEqual(backend, yaml_backend.BACKEND_PYTHON)
+        self.assertIs(loader, yaml_module.SafeLoader)
+        self.assertIs(dumper, yaml_module.SafeDumper)
+
+    def test_select_libyaml_backend(self):
+        # Given
+        yaml_module = Mock(
+            spec=['SafeLoader', 'SafeDumper', 'CSafeLoader', 'CSafeDumper'])
+
+        # When
+        backend, loader, dumper = yaml_backend._select_backend(yaml_module)
+
+        # Then
+        self.assertEqual(backend, yaml_backend.BACKEND_LIBYAML)
+        self.assertIs(loader, yaml_module.CSafeLoader)
+        self.assertIs(dumper, yaml_module.CSafeDumper)
+
+    def test_round_trip(self):
+        # Given
+        data = {'cases': [{'name': 'A case', 'tests': [1, 2.5, None]}]}
+
+        # When
+        dumped = yaml_backend.safe_dump(data, default_flow_style=False)
+        loaded = yaml_backend.safe_load(dumped)
+
+        # Then
+        self.assertEqual(loaded, data)
+        self.assertEqual(dumped, yaml.safe_dump(data, default_flow_style=False))
+
+    def test_safe_load_rejects_python_tags(self):
+        # Given
+        document = '!!python/object/apply:os.getcwd []'
+
+        # When/Then
+        with self.assertRaises(yaml.YAMLError):
+            yaml_backend.safe_load(document)
+
+    def test_safe_load_all_is_lazy(self):
+        # Given
+        stream = 'version: 1\n---\nname: first\n---\n[unterminated\n'
+
+        # When
+        documents = yaml_backend.safe_load_all(stream)
+
+        # Then
+        self.assertEqual(next(documents), {'version': 1})
+        self.assertEqual(next(documents), {'name': 'first'})
+        with self.assertRaises(yaml.YAMLError):
+            next(documents)
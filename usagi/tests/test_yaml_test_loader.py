@@ -6,8 +6,12 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from __future__ import absolute_import, unicode_literals
 
+import os
+import shutil
+import tempfile
 import textwrap
 
+from mock import patch
 import responses
 import yaml
 
@@ -18,7 +22,14 @@ from haas.suite import find_test_cases, TestSuite
 from haas.testing import unittest
 
 from ..exceptions import YamlParseError
-from ..yaml_test_loader import YamlTestLoader
+from ..cache import ParsedFileCache
+from ..selection import TestSelector
+from ..sessions import create_client
+from ..sharding import case_key
+from ..web_test import WebTest
+from .. import yaml_backend
+from ..yaml_test_loader import (
+    CASE_TESTS_ATTRIBUTE, StreamedTestFile, YamlTestLoader, parse_test_file)
 
 
 class TestYamlTestLoader(unittest.TestCase):
@@ -382,3 +393,318 @@ class TestYamlTestLoader(unittest.TestCase):
         cls1, cls2 = [type(case) for case in find_test_cases(suite)]
         self.assertIs(cls1, cls2)
         self.assertEqual(cls1.maxDiff, 1234)
+
+    @responses.activate
+    def test_web_tests_created_on_first_run(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+        ---
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Test root URL"
+                  url: "/"
+                  assertions:
+                    - name: status_code
+                      expected: 200
+                - name: "Test root URL again"
+                  url: "/"
+        """)
+        responses.add(
+            responses.GET,
+            'http://test.domain/',
+            status=200,
+        )
+        test_data = yaml.safe_load(test_yaml)
+
+        # When
+        with patch('usagi.yaml_test_loader.create_client',
+                   side_effect=create_client) as mock_create_client:
+            suite = self.loader.load_tests_from_yaml(
+                test_data, '/path/to/foo.yaml')
+
+        # Then
+        self.assertFalse(mock_create_client.called)
+        case = next(find_test_cases(suite))
+        case_tests = getattr(case, CASE_TESTS_ATTRIBUTE)
+        self.assertFalse(case_tests.is_materialised)
+        self.assertEqual(len(case_tests), 2)
+
+        # When
+        result = ResultCollecter()
+        with patch('usagi.yaml_test_loader.create_client',
+                   side_effect=create_client) as mock_create_client:
+            suite(result)
+
+        # Then
+        self.assertTrue(result.wasSuccessful())
+        self.assertTrue(case_tests.is_materialised)
+        mock_create_client.assert_called_once_with(case_tests.config)
+        first, second = case_tests[0], case_tests[1]
+        self.assertIs(first.session, second.session)
+
+    def test_invalid_assertion_reported_on_run(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+        ---
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Basic"
+              tests:
+                - name: "Test root URL"
+                  url: "/"
+                  assertions:
+                    - name: no_such_assertion
+        """)
+        test_data = yaml.safe_load(test_yaml)
+
+        # When
+        suite = self.loader.load_tests_from_yaml(
+            test_data, '/path/to/foo.yaml')
+
+        # Then
+        self.assertEqual(suite.countTestCases(), 1)
+
+        # When
+        result = ResultCollecter()
+        suite(result)
+
+        # Then
+        self.assertFalse(result.wasSuccessful())
+        self.assertEqual(len(result.errors), 1)
+
+    def test_selected_tests_only_constructed(self):
+        # Given
+        test_yaml = textwrap.dedent("""
+        ---
+          version: '1.0'
+
+          config:
+            host: test.domain
+
+          cases:
+            - name: "Basic"
+              tags: [smoke]
+              tests:
+                - name: "Test root URL"
+                  url: "/"
+                - name: "Test slow URL"
+                  url: "/slow"
+                  tags: [slow]
+
+            - name: "Other"
+              tests:
+                - name: "Test other URL"
+                  url: "/other"
+                  assertions:
+                    - name: no_such_assertion
+        """)
+        test_data = yaml.safe_load(test_yaml)
+
+        def load_and_construct(selector):
+            loader = YamlTestLoader(Loader(), selector=selector)
+            with patch('usagi.yaml_test_loader.create_client'), \
+                    patch.object(WebTest, 'from_dict') as from_dict:
+                suite = loader.load_tests_from_yaml(
+                    test_data, '/path/to/foo.yaml')
+                cases = list(find_test_cases(suite))
+                for case in cases:
+                    case_tests = getattr(case, CASE_TESTS_ATTRIBUTE)
+                    for index in range(len(case_tests)):
+                        case_tests[index]
+            return cases, from_dict
+
+        # When
+        cases, from_dict = load_and_construct(TestSelector(tags=['smoke']))
+
+        # Then
+        self.assertEqual(from_dict.call_count, 2)
+        names = [str(case) for case in cases]
+        self.assertEqual(names, [
+            "'Basic:Test root URL' (/path/to/foo.yaml)",
+            "'Basic:Test slow URL' (/path/to/foo.yaml)",
+        ])
+
+        # When
+        cases, from_dict = load_and_construct(
+            TestSelector(test_patterns=['*slow*']))
+
+        # Then
+        self.assertEqual(from_dict.call_count, 1)
+        case, = cases
+        self.assertEqual(
+            str(case), "'Basic:Test slow URL' (/path/to/foo.yaml)")
+        args, kwargs = from_dict.call_args
+        self.assertEqual(args[1]['name'], 'Test slow URL')
+
+
+class TestYamlTestLoaderStream(unittest.TestCase):
+
+    stream_yaml = textwrap.dedent("""
+        version: '1.0'
+        config:
+          host: test.domain
+        test-pre-definitions:
+          login:
+            - name: "Login"
+              url: "/login"
+        ---
+        name: "First"
+        case-setup:
+          - login
+        tests:
+          - name: "Test root URL"
+            url: "/"
+        ---
+        name: "Second"
+        tests:
+          - name: "Test other URL"
+            url: "/other"
+          - name: "Test another URL"
+            url: "/another"
+    """)
+
+    def setUp(self):
+        self.loader = YamlTestLoader(Loader())
+        self.temp_dir = tempfile.mkdtemp(prefix='usagi-', suffix='.tmp')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, text):
+        filename = os.path.join(self.temp_dir, 'test_stream.yml')
+        with open(filename, 'w') as fh:
+            fh.write(text)
+        return filename
+
+    def test_parse_stream(self):
+        # Given
+        filename = self._write(self.stream_yaml)
+
+        # When
+        test_structure, error = parse_test_file(filename)
+
+        # Then
+        self.assertIsInstance(test_structure, StreamedTestFile)
+        self.assertIsNone(error)
+
+    def test_load_stream(self):
+        # Given
+        filename = self._write(self.stream_yaml)
+
+        # When
+        suite = self.loader.load_tests_from_file(filename)
+
+        # Then
+        self.assertEqual(suite.countTestCases(), 4)
+        names = [str(case) for case in find_test_cases(suite)]
+        self.assertEqual(names, [
+            "'First:Login' ({0})".format(filename),
+            "'First:Test root URL' ({0})".format(filename),
+            "'Second:Test other URL' ({0})".format(filename),
+            "'Second:Test another URL' ({0})".format(filename),
+        ])
+
+    def test_load_stream_from_parsed_file(self):
+        # Given
+        filename = self._write(self.stream_yaml)
+        cache = ParsedFileCache(os.path.join(self.temp_dir, 'cache'), 'key')
+        test_structure, error = parse_test_file(filename, cache)
+
+        # When
+        suite = self.loader.load_tests_from_parsed_file(
+            test_structure, filename, error)
+
+        # Then
+        self.assertEqual(suite.countTestCases(), 4)
+
+    def test_load_stream_selection(self):
+        # Given
+        filename = self._write(self.stream_yaml)
+        loader = YamlTestLoader(
+            Loader(), selector=TestSelector(case_patterns=['Second']))
+
+        # When
+        suite = loader.load_tests_from_file(filename)
+
+        # Then
+        self.assertEqual(suite.countTestCases(), 2)
+
+    def test_stream_case_keys(self):
+        # Given
+        filename = self._write(self.stream_yaml)
+        test_structure, error = parse_test_file(filename)
+        parsed = []
+        safe_load_all = yaml_backend.safe_load_all
+
+        def counting_load_all(stream):
+            for document in safe_load_all(stream):
+                parsed.append(document)
+                yield document
+
+        # When
+        with patch('usagi.yaml_test_loader.yaml_backend.safe_load_all',
+                   counting_load_all):
+            keys = self.loader.case_keys(test_structure, filename, error)
+            first = next(keys)
+            parsed_before_second = len(parsed)
+            rest = list(keys)
+
+        # Then
+        self.assertEqual(first, case_key(filename, 'First'))
+        self.assertEqual(rest, [case_key(filename, 'Second')])
+        # The header and the first case only
+        self.assertEqual(parsed_before_second, 2)
+
+    def test_load_stream_invalid_case(self):
+        # Given
+        filename = self._write(self.stream_yaml + textwrap.dedent("""
+        ---
+        name: "No tests"
+        ---
+        name: "Last"
+        tests:
+          - name: "Test last URL"
+            url: "/last"
+        """))
+
+        # When
+        suite = self.loader.load_tests_from_file(filename)
+
+        # Then
+        cases = list(find_test_cases(suite))
+        self.assertEqual(len(cases), 6)
+        error_case = cases[4]
+        self.assertIsInstance(error_case, ModuleImportError)
+        with self.assertRaises(YamlParseError) as exc:
+            getattr(error_case, error_case._testMethodName)()
+        self.assertIn('Case document 3', str(exc.exception))
+        self.assertEqual(
+            str(cases[5]), "'Last:Test last URL' ({0})".format(filename))
+
+    def test_load_stream_invalid_header(self):
+        # Given
+        filename = self._write(textwrap.dedent("""
+        version: '1.0'
+        ---
+        name: "First"
+        tests:
+          - name: "Test root URL"
+            url: "/"
+        """))
+
+        # When
+        suite = self.loader.load_tests_from_file(filename)
+
+        # Then
+        case, = find_test_cases(suite)
+        self.assertIsInstance(case, ModuleImportError)
@@ -7,7 +7,18 @@
 from __future__ import absolute_import, unicode_literals
 
 from contextlib import contextmanager
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+import argparse
 import os
+import socket
+import threading
+
+from haas.plugin_manager import PluginManager
+from haas.result import ResultCollector
+from haas.testing import unittest
+
+from ..config import Config
+from ..runner import CollectingResultHandler
 
 
 @contextmanager
@@ -20,3 +31,97 @@ def environment(**env):
         yield
     finally:
         os.environ = old_env
+
+
+def enabled_result_handlers(argv):
+    """The result handlers that ``haas`` enables for the command line
+    arguments ``argv``.
+
+    """
+    plugin_manager = PluginManager()
+    parser = argparse.ArgumentParser()
+    plugin_manager.add_plugin_arguments(parser)
+    args = parser.parse_args(argv)
+    return plugin_manager.get_enabled_hook_plugins(
+        plugin_manager.RESULT_HANDLERS, args, test_count=1)
+
+
+def make_config(test_filename='/path/to/test.yml', **config):
+    """Create the :class:`~usagi.config.Config` of a test file from the
+    options of its ``config`` section.
+
+    """
+    return Config.from_dict(config, test_filename)
+
+
+def short_test_name(test):
+    """The name of ``test`` without its class, e.g. ``"'Case:Test'"``.
+
+    """
+    return str(test).split(' (')[0]
+
+
+def run_suite(runner, suite, failfast=False):
+    """Run ``suite`` with the test runner ``runner``.
+
+    Returns
+    -------
+    collector : haas.result.ResultCollector
+        The result collector of the run.
+    results : list
+        The results of the tests, in the order they were reported.
+
+    """
+    handler = CollectingResultHandler()
+    collector = ResultCollector(failfast=failfast)
+    collector.add_result_handler(handler)
+    runner.run(collector, suite)
+    return collector, handler.results
+
+
+def unused_port():
+    """A local TCP port on which nothing is listening.
+
+    """
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class QuietHandler(WSGIRequestHandler):
+    """A WSGI request handler that does not log requests.
+
+    """
+
+    def log_message(self, *args):
+        pass
+
+
+class WSGIServerTestCase(unittest.TestCase):
+    """Base class of tests making requests to the WSGI application
+    ``app``, served on a local port by a background thread for the
+    tests of the class.
+
+    """
+
+    #: The WSGI application, wrapped with ``staticmethod``.
+    app = None
+
+    @classmethod
+    def setUpClass(cls):
+        super(WSGIServerTestCase, cls).setUpClass()
+        cls.server = make_server(
+            '127.0.0.1', 0, cls.app, handler_class=QuietHandler)
+        cls.thread = threading.Thread(
+            target=cls.server.serve_forever, kwargs={'poll_interval': 0.01})
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        super(WSGIServerTestCase, cls).tearDownClass()
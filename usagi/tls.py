@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""TLS contexts shared by all the connections of a process.
+
+Loading certificates into a new ``SSLContext`` for every connection is
+a large part of the cost of a handshake, so connections with the same
+verification settings share one context.  The context keeps the TLS
+session of the last connection to each server, which the next
+connection to that server offers for resumption, skipping the full
+handshake.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import socket
+import ssl
+import threading
+
+from urllib3.util.ssl_ import create_urllib3_context, resolve_cert_reqs
+
+logger = logging.getLogger(__name__)
+
+#: ``True`` if the ``ssl`` module can resume TLS sessions.
+SUPPORTS_RESUMPTION = hasattr(ssl.SSLContext, 'sslsocket_class')
+
+_CONTEXT_ATTRIBUTES = (
+    'options', 'minimum_version', 'maximum_version', 'verify_flags',
+    'post_handshake_auth', 'check_hostname', 'verify_mode',
+    'hostname_checks_common_name', 'keylog_filename',
+)
+
+
+class TlsStats(object):
+    """Counters of the TLS handshakes made with shared contexts.
+
+    Attributes
+    ----------
+    full_handshakes : int
+        The number of handshakes that negotiated a new session.
+    resumed_handshakes : int
+        The number of handshakes that resumed a previous session.
+
+    """
+
+    def __init__(self, full_handshakes=0, resumed_handshakes=0):
+        super(TlsStats, self).__init__()
+        self.full_handshakes = full_handshakes
+        self.resumed_handshakes = resumed_handshakes
+
+    def copy(self):
+        return type(self)(self.full_handshakes, self.resumed_handshakes)
+
+    def merge(self, other):
+        """Add the counters of ``other`` to this object.
+
+        """
+        self.full_handshakes += other.full_handshakes
+        self.resumed_handshakes += other.resumed_handshakes
+
+
+class ResumingSSLSocket(ssl.SSLSocket):
+    """An ``SSLSocket`` that saves its session in its context once the
+    session can be resumed.
+
+    With TLS 1.3, the session ticket arrives after the handshake and is
+    only received by the first read from the socket.
+
+    """
+
+    session_key = None
+    _session_saved = False
+
+    def read(self, *args, **kwargs):
+        data = super(ResumingSSLSocket, self).read(*args, **kwargs)
+        if not self._session_saved:
+            self._session_saved = self.context.save_session(self)
+        return data
+
+    def close(self):
+        if not self._session_saved:
+            self.context.save_session(self)
+        super(ResumingSSLSocket, self).close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """An ``SSLContext`` that offers the last session made to a server
+    when connecting to it again.
+
+    Parameters
+    ----------
+    protocol : int
+        The ``ssl`` protocol constant.
+    cache : TlsContextCache
+        The cache recording the handshakes made with this context.
+
+    """
+
+    if SUPPORTS_RESUMPTION:
+        sslsocket_class = ResumingSSLSocket
+
+    def __init__(self, protocol, cache):
+        super(ResumingSSLContext, self).__init__()
+        self.cache = cache
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def _session_key(self, sock, server_hostname):
+        try:
+            port = sock.getpeername()[1]
+        except (socket.error, IndexError, TypeError):
+            port = None
+        return (server_hostname, port)
+
+    def get_session(self, key):
+        with self._sessions_lock:
+            return self._sessions.get(key)
+
+    def save_session(self, ssl_sock):
+        """Keep the session of ``ssl_sock`` for the next connection to
+        the same server.
+
+        Returns
+        -------
+        saved : bool
+            ``True`` if the saved session has a ticket.
+
+        """
+        key = ssl_sock.session_key
+        if key is None:
+            return False
+        try:
+            session = ssl_sock.session
+        except (ssl.SSLError, ValueError):
+            return False
+        if session is None:
+            return False
+        with self._sessions_lock:
+            current = self._sessions.get(key)
+            # Do not replace a resumable session with one that has not
+            # yet received its ticket.
+            if current is None or session.has_ticket or \
+                    not current.has_ticket:
+                self._sessions[key] = session
+        return session.has_ticket
+
+    def wrap_socket(self, sock, server_side=False,
+                    do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True,
+                    server_hostname=None, session=None):
+        key = self._session_key(sock, server_hostname)
+        if session is None and not server_side:
+            session = self.get_session(key)
+        ssl_sock = super(ResumingSSLContext, self).wrap_socket(
+            sock, server_side=server_side,
+            do_handshake_on_connect=do_handshake_on_connect,
+            suppress_ragged_eofs=suppress_ragged_eofs,
+            server_hostname=server_hostname, session=session)
+        ssl_sock.session_key = key
+        if do_handshake_on_connect:
+            self.cache.record_handshake(ssl_sock.session_reused)
+            # Before TLS 1.3, the session is complete after the
+            # handshake.
+            ssl_sock._session_saved = self.save_session(ssl_sock) or \
+                ssl_sock.version() != 'TLSv1.3'
+        return ssl_sock
+
+
+class TlsContextCache(object):
+    """The ``SSLContext`` objects shared by the connections of a
+    process, one for each combination of verification settings.
+
+    Parameters
+    ----------
+    resumption : bool
+        If ``False``, contexts do not resume TLS sessions.
+
+    """
+
+    def __init__(self, resumption=True):
+        super(TlsContextCache, self).__init__()
+        self.resumption = resumption and SUPPORTS_RESUMPTION
+        self._contexts = {}
+        self._stats = TlsStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """A snapshot of the :class:`~.TlsStats` of the shared contexts.
+
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def reset_stats(self):
+        """Reset the counters, keeping the contexts and sessions.
+
+        Returns
+        -------
+        stats : TlsStats
+            The counters before the reset.
+
+        """
+        with self._lock:
+            stats, self._stats = self._stats, TlsStats()
+        return stats
+
+    def merge_stats(self, stats):
+        """Add ``stats``, counted by another process, to the counters.
+
+        """
+        with self._lock:
+            self._stats.merge(stats)
+
+    def record_handshake(self, resumed):
+        with self._lock:
+            if resumed:
+                self._stats.resumed_handshakes += 1
+            else:
+                self._stats.full_handshakes += 1
+
+    def _create_context(self, cert_reqs, ca_certs, ca_cert_dir,
+                        ca_cert_data, cert_file, key_file, key_password):
+        context = create_urllib3_context(cert_reqs=cert_reqs)
+        if self.resumption:
+            # Copy the urllib3 defaults to a context that can resume
+            # sessions.
+            template = context
+            context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT, self)
+            for name in _CONTEXT_ATTRIBUTES:
+                value = getattr(template, name, None)
+                if value is None:
+                    continue
+                if name == 'options':
+                    # urllib3 does not request TLS 1.2 session tickets
+                    value &= ~getattr(ssl, 'OP_NO_TICKET', 0)
+                setattr(context, name, value)
+        if ca_certs or ca_cert_dir or ca_cert_data:
+            context.load_verify_locations(ca_certs, ca_cert_dir, ca_cert_data)
+        elif context.verify_mode != ssl.CERT_NONE:
+            context.load_default_certs()
+        if cert_file:
+            context.load_cert_chain(cert_file, key_file, key_password)
+        return context
+
+    def get_context(self, cert_reqs=None, ca_certs=None, ca_cert_dir=None,
+                    ca_cert_data=None, cert_file=None, key_file=None,
+                    key_password=None):
+        """Get the shared context for a set of ``urllib3`` connection TLS
+        settings, with the certificates already loaded.
+
+        """
+        cert_reqs = resolve_cert_reqs(cert_reqs)
+        key = (cert_reqs, ca_certs, ca_cert_dir, ca_cert_data, cert_file,
+               key_file, key_password)
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                logger.debug('Creating TLS context for %r', key[:3])
+                context = self._create_context(*key)
+                self._contexts[key] = context
+        return context
+
+    def clear(self):
+        """Forget all contexts, sessions and statistics.
+
+        """
+        with self._lock:
+            self._contexts.clear()
+            self._stats = TlsStats()
+
+
+_tls_cache = None
+_tls_cache_lock = threading.Lock()
+
+
+def get_tls_cache():
+    """Get the process-wide :class:`~.TlsContextCache`.
+
+    """
+    global _tls_cache
+    if _tls_cache is None:
+        with _tls_cache_lock:
+            if _tls_cache is None:
+                _tls_cache = TlsContextCache()
+    return _tls_cache
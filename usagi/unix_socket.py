@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+"""HTTP over Unix domain sockets, for the ``socket`` option of the
+test file ``config``.
+
+Requests keep their logical URL, and so their ``Host`` header; only the
+connection is made to the socket.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+import numbers
+import socket
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.exceptions import NewConnectionError
+from urllib3.poolmanager import SSL_KEYWORDS, PoolManager
+
+from .exceptions import HaasRestTestError
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """An HTTP connection made to a Unix domain socket.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.socket_path = kwargs.pop('socket_path')
+        super(UnixHTTPConnection, self).__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, numbers.Number):
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except (OSError, IOError) as exc:
+            sock.close()
+            raise NewConnectionError(
+                self, 'Failed to connect to {0!r}: {1}'.format(
+                    self.socket_path, exc))
+        return sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+
+    ConnectionCls = UnixHTTPConnection
+
+
+class UnixSocketPoolManager(PoolManager):
+    """A ``urllib3.PoolManager`` that connects all of its pools to one
+    Unix domain socket.
+
+    Requests with the ``https`` scheme are sent without TLS.
+
+    Parameters
+    ----------
+    socket_path : str
+        The path of the socket.
+
+    """
+
+    def __init__(self, socket_path, *args, **kwargs):
+        if not hasattr(socket, 'AF_UNIX'):  # pragma: no cover
+            raise HaasRestTestError(
+                'Unix domain sockets are not supported on this platform')
+        super(UnixSocketPoolManager, self).__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if request_context is None:
+            request_context = self.connection_pool_kw.copy()
+        kwargs = dict(
+            (key, value) for key, value in request_context.items()
+            if key not in SSL_KEYWORDS and
+            key not in ('scheme', 'host', 'port'))
+        return UnixHTTPConnectionPool(
+            host, port, socket_path=self.socket_path, **kwargs)
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """A ``requests`` transport adapter sending requests over a Unix
+    domain socket.
+
+    Parameters
+    ----------
+    socket_path : str
+        The path of the socket.
+
+    """
+
+    def __init__(self, socket_path, **kwargs):
+        self.socket_path = socket_path
+        super(UnixSocketAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = UnixSocketPoolManager(
+            self.socket_path, num_pools=connections, maxsize=maxsize,
+            block=block, **pool_kwargs)
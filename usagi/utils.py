@@ -9,17 +9,18 @@ from __future__ import absolute_import, unicode_literals
 import os
 import sys
 
-from requests.utils import default_user_agent as requests_user_agent
-import requests
-
 import haas
 
 import usagi
+from .lazy_import import lazy_import
+
+requests = lazy_import('requests')
 
 
 def usagi_user_agent():
     return 'usagi/{0} haas/{1} {2}'.format(
-        usagi.__version__, haas.__version__, requests_user_agent())
+        usagi.__version__, haas.__version__,
+        requests.utils.default_user_agent())
 
 
 def create_session():
@@ -7,9 +7,9 @@
 from __future__ import absolute_import, unicode_literals
 
 from six import string_types
-from stevedore.extension import ExtensionManager
 
 from .exceptions import InvalidVariable, InvalidVariableType, VariableLoopError
+from .registry import get_registry
 
 
 class StringVarLoader(object):
@@ -28,13 +28,7 @@ class VarLoader(object):
     def __init__(self, filename):
         super(VarLoader, self).__init__()
         self.filename = filename
-        loaders = ExtensionManager(
-            namespace='usagi.var_loaders',
-        )
-        self.loaders = dict(
-            (name, loaders[name].plugin)
-            for name in loaders.names()
-        )
+        self.loaders = get_registry().var_loaders
         self.loader_keys = set(self.loaders.keys())
 
     def _create_loader(self, name, var):
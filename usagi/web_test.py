@@ -8,13 +8,15 @@ from __future__ import absolute_import, unicode_literals
 
 from contextlib import contextmanager
 
-from requests.exceptions import ConnectionError
 from six.moves import urllib
 
 from .exceptions import (
     InvalidAssertionClass, InvalidParameterClass, InvalidVariableType)
+from .lazy_import import lazy_import
 from .parameter_builder import ParameterBuilder
 
+requests = lazy_import('requests')
+
 
 def initialize_assertions(assertion_map, assertion_specs):
     for spec in assertion_specs:
@@ -42,8 +44,18 @@ class WebTest(object):
     The :meth:`WebTest.run() <usagi.web_test.WebTest.run>`
     method is executed from within the generated TestCase test method.
 
+    Requests are made with ``session``, the client created for the case
+    by a transport plugin (see
+    :class:`~usagi.plugins.i_transport.ITransport`), or a
+    ``requests.Session``.
+
+    After :meth:`run`, ``response_size`` is the size of the last response
+    body in bytes, or ``None`` if no response was received.
+
     """
 
+    response_size = None
+
     def __init__(self, session, config, name, path, assertions,
                  parameter_loaders, max_diff):
         super(WebTest, self).__init__()
@@ -109,6 +121,26 @@ class WebTest(object):
             max_diff=max_diff,
         )
 
+    def prepare(self, case):
+        """Configure the ``case`` for this test and build the URL.
+
+        """
+        if self.max_diff is not _Default:
+            case.maxDiff = self.max_diff
+
+        try:
+            return self.url
+        except InvalidVariableType as exc:
+            case.fail(repr(exc))
+
+    def check_response(self, case, url, response):
+        """Run all assertions on the ``response`` to the request for
+        ``url``.
+
+        """
+        for assertion in self.assertions:
+            assertion.run(self.config, url, case, response)
+
     def run(self, case):
         """Execute the web test case, and record results via the ``case``.
 
@@ -118,23 +150,24 @@ class WebTest(object):
             The ``TestCase`` instance used to record test results.
 
         """
-        if self.max_diff is not _Default:
-            case.maxDiff = self.max_diff
-
-        try:
-            url = self.url
-        except InvalidVariableType as exc:
-            case.fail(repr(exc))
+        self.response_size = None
+        url = self.prepare(case)
 
+        # A requests.Session has no connection_errors.
+        connection_errors = getattr(
+            self.session, 'connection_errors',
+            (requests.exceptions.ConnectionError,))
         with self.test_parameters() as test_parameters:
             try:
                 response = self.session.request(url=url, **test_parameters)
-            except ConnectionError as exc:
+            except connection_errors as exc:
                 case.fail('{0!r}: Unable to connect: {1!r}'.format(
                     url, str(exc)))
 
-        for assertion in self.assertions:
-            assertion.run(self.config, url, case, response)
+        content = getattr(response, 'content', None)
+        if content is not None:
+            self.response_size = len(content)
+        self.check_response(case, url, response)
 
 
 class WebPoll(WebTest):
@@ -157,6 +190,14 @@ class WebPoll(WebTest):
         self._period = period
         self._timeout = timeout
 
+    @property
+    def period(self):
+        return self._period
+
+    @property
+    def timeout(self):
+        return self._timeout
+
     def run(self, case):
         import time
         from timeit import default_timer
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2014 Simon Jagoe and Enthought Ltd.
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from __future__ import absolute_import, unicode_literals
+
+import logging
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+BACKEND_LIBYAML = 'libyaml'
+BACKEND_PYTHON = 'python'
+
+
+def _select_backend(yaml_module):
+    """Return the ``(name, loader, dumper)`` of the fastest safe YAML
+    backend provided by ``yaml_module``.
+
+    """
+    try:
+        loader = yaml_module.CSafeLoader
+        dumper = yaml_module.CSafeDumper
+    except AttributeError:
+        return BACKEND_PYTHON, yaml_module.SafeLoader, yaml_module.SafeDumper
+    return BACKEND_LIBYAML, loader, dumper
+
+
+# The libyaml C extension is used when PyYAML was built with it,
+# otherwise the pure-Python implementation is used.
+BACKEND, SafeLoader, SafeDumper = _select_backend(yaml)
+logger.debug('Using the %s YAML backend', BACKEND)
+
+
+def safe_load(stream):
+    """Parse the single YAML document in ``stream``.
+
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def safe_load_all(stream):
+    """Lazily parse each YAML document in ``stream``.
+
+    Documents are parsed one at a time as the returned generator is
+    consumed, so only the current document is held in memory.
+
+    """
+    return yaml.load_all(stream, Loader=SafeLoader)
+
+
+def safe_dump(data, stream=None, **kwargs):
+    """Serialize ``data`` to YAML using only standard YAML tags.
+
+    """
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
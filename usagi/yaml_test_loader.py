@@ -6,23 +6,27 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from __future__ import absolute_import, unicode_literals
 
+import itertools
 import logging
 import sys
+import threading
 
 from jsonschema.exceptions import ValidationError
-from stevedore.extension import ExtensionManager
-import jsonschema
 import six
-import yaml
 
 from haas.module_import_error import ModuleImportError
 from haas.testing import unittest
 
+from .cache import ParsedFileCache, environment_key
 from .config import Config
 from .exceptions import YamlParseError
-from .schema import SCHEMA
-from .utils import create_session
+from .registry import get_registry
+from .schema import CASE_SCHEMA, SCHEMA, STREAM_HEADER_SCHEMA, validate
+from .selection import TestSelector
+from .sharding import case_key
+from .sessions import create_client
 from .web_test import WebTest
+from . import yaml_backend
 
 
 logger = logging.getLogger(__name__)
@@ -30,6 +34,25 @@ logger = logging.getLogger(__name__)
 
 TEST_NAME_ATTRIBUTE = 'usagi_name'
 
+CASE_TESTS_ATTRIBUTE = 'usagi_tests'
+
+TEST_INDEX_ATTRIBUTE = 'usagi_index'
+
+_NO_DOCUMENT = object()
+
+
+class StreamedTestFile(object):
+    """Returned by :func:`parse_test_file` in place of the test
+    structure of a multi-document test file.
+
+    A multi-document file holds a header document with the ``version``,
+    ``config`` and ``test-pre-definitions`` of the file, followed by
+    one document per case.  It is not parsed as a whole; instead
+    :meth:`YamlTestLoader.load_tests_from_stream` validates and loads
+    one case document at a time.
+
+    """
+
 
 def _create_yaml_parse_error_test(filename, error):
     message = 'Unable to parse test {0!r}\n{1}'.format(
@@ -45,21 +68,87 @@ def _create_yaml_parse_error_test(filename, error):
     return cls(method_name)
 
 
-def _create_test_method(test):
+class LazyCaseTests(object):
+    """The :class:`~usagi.web_test.WebTest` instances of a single
+    generated case.
+
+    The transport client and the tests themselves are only created
+    when a test of the case is first executed, so that discovering,
+    listing and filtering a suite does not allocate any networking
+    objects.
+
+    Parameters
+    ----------
+    config : usagi.config.Config
+        The Config that applies to the tests.
+    specs : list
+        The test specifications, in execution order.
+    assertions_map : dict
+        Mapping of assertion name to assertion plugin class.
+    test_parameter_plugins : dict
+        Mapping of parameter name to test parameter plugin class.
+
+    Attributes
+    ----------
+    response_sizes : dict
+        The size of the last response body of each test that has run,
+        by test method name.
+
+    """
+
+    def __init__(self, config, specs, assertions_map,
+                 test_parameter_plugins):
+        super(LazyCaseTests, self).__init__()
+        self.config = config
+        self.specs = specs
+        self.response_sizes = {}
+        self._assertions_map = assertions_map
+        self._test_parameter_plugins = test_parameter_plugins
+        self._tests = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_materialised(self):
+        return self._tests is not None
+
+    def _create_tests(self):
+        client = create_client(self.config)
+        return [
+            WebTest.from_dict(
+                client, spec, self.config, self._assertions_map,
+                self._test_parameter_plugins)
+            for spec in self.specs
+        ]
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __getitem__(self, index):
+        if self._tests is None:
+            with self._lock:
+                if self._tests is None:
+                    self._tests = self._create_tests()
+        return self._tests[index]
+
+
+def _create_test_method(case_tests, index):
     def test_method(self):
-        test.run(self)
+        test = case_tests[index]
+        try:
+            test.run(self)
+        finally:
+            case_tests.response_sizes[self._testMethodName] = \
+                test.response_size
 
-    setattr(test_method, TEST_NAME_ATTRIBUTE, test.name)
+    setattr(test_method, TEST_NAME_ATTRIBUTE, case_tests.specs[index]['name'])
+    setattr(test_method, TEST_INDEX_ATTRIBUTE, index)
 
     return test_method
 
 
-def _create_reused_tests(session, config, assertions_map,
-                         test_parameter_plugins, test_names, test_definitions):
+def _get_reused_test_specs(test_names, test_definitions):
     return [
-        WebTest.from_dict(
-            session, spec, config, assertions_map,
-            test_parameter_plugins)
+        spec
         for name in test_names
         for spec in test_definitions[name]
     ]
@@ -76,30 +165,44 @@ def create_test_case_for_case(filename, config, case, assertions_map,
         generated tests, in the same order as defined in the file.
 
     """
-    session = create_session()
-
-    pre_run_cases = _create_reused_tests(
-        session, config, assertions_map, test_parameter_plugins,
+    pre_run_specs = _get_reused_test_specs(
         case.get('case-setup', []), test_definitions)
-    post_run_cases = _create_reused_tests(
-        session, config, assertions_map, test_parameter_plugins,
+    post_run_specs = _get_reused_test_specs(
         case.get('case-teardown', []), test_definitions)
-    tests = pre_run_cases + [
-        WebTest.from_dict(
-            session, spec, config, assertions_map, test_parameter_plugins)
-        for spec in case['tests']
-    ] + post_run_cases
+    tests = LazyCaseTests(
+        config, pre_run_specs + case['tests'] + post_run_specs,
+        assertions_map, test_parameter_plugins)
+    return create_test_case_class(
+        filename, case['name'], tests,
+        case.get('max-diff', unittest.TestCase.maxDiff))
+
+
+def create_test_case_class(filename, case_name, tests,
+                           max_diff=unittest.TestCase.maxDiff):
+    """Generate the ``TestCase`` running the tests of a case.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the test file defining the case.
+    case_name : str
+        The name of the case.
+    tests : LazyCaseTests
+        The tests of the case.
+    max_diff : int
+        The ``maxDiff`` of the generated ``TestCase``.
+
+    """
     test_count = len(tests)
     class_dict = dict(
         ('test_{index:0>{test_count}}'.format(
             index=index, test_count=test_count),
-         _create_test_method(test))
-        for index, test in enumerate(tests)
+         _create_test_method(tests, index))
+        for index in range(test_count)
     )
-    class_dict[TEST_NAME_ATTRIBUTE] = case['name']
-
-    if 'max-diff' in case:
-        class_dict['maxDiff'] = case['max-diff']
+    class_dict[TEST_NAME_ATTRIBUTE] = case_name
+    class_dict[CASE_TESTS_ATTRIBUTE] = tests
+    class_dict['maxDiff'] = max_diff
 
     def __str__(self):
         method = getattr(self, self._testMethodName)
@@ -126,6 +229,73 @@ def create_test_case_for_case(filename, config, case, assertions_map,
     return type(class_name, (unittest.TestCase,), class_dict)
 
 
+def _validate_test_structure(test_structure, schema=SCHEMA):
+    try:
+        validate(test_structure, schema)
+    except ValidationError as e:
+        return str(e)
+    return None
+
+
+def _read_first_documents(documents):
+    """Read the first document of a YAML stream, and the second if
+    there is one.
+
+    """
+    first = next(documents, None)
+    return first, next(documents, _NO_DOCUMENT)
+
+
+def _stream_valid_cases(filename):
+    """Generate the valid case documents of a multi-document test file,
+    parsing one document at a time.
+
+    """
+    with open(filename) as fh:
+        documents = yaml_backend.safe_load_all(fh)
+        next(documents, None)
+        for case in documents:
+            if _validate_test_structure(case, CASE_SCHEMA) is None:
+                yield case
+
+
+def _parse_test_data(data):
+    first, second = _read_first_documents(yaml_backend.safe_load_all(data))
+    if second is not _NO_DOCUMENT:
+        return StreamedTestFile(), None
+    return first, _validate_test_structure(first)
+
+
+def parse_test_file(filename, cache=None):
+    """Parse and validate a YAML test file.
+
+    This does not require any state from the :class:`~.YamlTestLoader`,
+    so it may be executed in a worker process during parallel
+    discovery.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the test file.
+    cache : usagi.cache.ParsedFileCache
+        Optional cache of previously parsed test files.
+
+    Returns
+    -------
+    test_structure : dict
+        The parsed test structure, or a :class:`~.StreamedTestFile` if
+        the file contains more than one YAML document.
+    error : str
+        The schema validation error message, or ``None`` if the test
+        structure is valid.
+
+    """
+    if cache is not None:
+        return cache.load(filename, _parse_test_data)
+    with open(filename) as fh:
+        return _parse_test_data(fh)
+
+
 class YamlTestLoader(object):
     """A test case generator, creating ``TestCase`` and ``TestSuite``
     instances from a single YAML file.
@@ -134,58 +304,154 @@ class YamlTestLoader(object):
     ----------
     loader : haas.loader.Loader
         The ``haas`` test loader.
+    cache_dir : str
+        Optional directory in which to cache parsed and validated test
+        files between runs.
+    selector : usagi.selection.TestSelector
+        Optional selection of the cases and tests to load.  Unselected
+        cases and tests are never constructed.
 
     """
 
-    def __init__(self, loader):
+    def __init__(self, loader, cache_dir=None, selector=None):
         super(YamlTestLoader, self).__init__()
         self._loader = loader
+        if selector is None:
+            selector = TestSelector()
+        self.selector = selector
 
-        assertions = ExtensionManager(
-            namespace='usagi.assertions',
-        )
-        test_parameters = ExtensionManager(
-            namespace='usagi.parameters'
-        )
+        registry = get_registry()
+        self._assertions_map = registry.assertions
+        self._test_parameters = registry.parameters
 
-        self._assertions_map = dict(
-            (name, assertions[name].plugin)
-            for name in assertions.names()
-        )
-        self._test_parameters = dict(
-            (name, test_parameters[name].plugin)
-            for name in test_parameters.names()
-        )
+        if cache_dir is not None:
+            self.cache = ParsedFileCache(
+                cache_dir, environment_key(registry.specs()))
+        else:
+            self.cache = None
 
     def load_tests_from_file(self, filename):
         """Load the YAML test file and create a ``TestSuite`` containing all
         test cases contained in the file.
 
         """
+        if self.cache is not None:
+            test_structure, error = parse_test_file(filename, self.cache)
+            return self.load_tests_from_parsed_file(
+                test_structure, filename, error)
         with open(filename) as fh:
-            test_structure = yaml.safe_load(fh)
-        return self.load_tests_from_yaml(test_structure, filename)
+            documents = yaml_backend.safe_load_all(fh)
+            first, second = _read_first_documents(documents)
+            if second is not _NO_DOCUMENT:
+                return self._load_tests_from_documents(
+                    first, itertools.chain([second], documents), filename)
+        return self.load_tests_from_yaml(first, filename)
+
+    def load_tests_from_stream(self, filename):
+        """Load a multi-document YAML test file one case at a time.
+
+        The first document configures the file, and each following
+        document is a single case.  Each case is validated and turned
+        into a ``TestCase`` before the next document is parsed.
+
+        """
+        with open(filename) as fh:
+            documents = yaml_backend.safe_load_all(fh)
+            header = next(documents, None)
+            return self._load_tests_from_documents(
+                header, documents, filename)
+
+    def _load_tests_from_documents(self, header, case_documents, filename):
+        loader = self._loader
+        error = _validate_test_structure(header, STREAM_HEADER_SCHEMA)
+        if error is not None:
+            test = _create_yaml_parse_error_test(filename, error)
+            return loader.create_suite([test])
+        config = Config.from_dict(header['config'], filename)
+        test_pre_definitions = header.get('test-pre-definitions', {})
+
+        tests = []
+        for index, case in enumerate(case_documents, 1):
+            error = _validate_test_structure(case, CASE_SCHEMA)
+            if error is not None:
+                error = 'Case document {0}: {1}'.format(index, error)
+                tests.append(_create_yaml_parse_error_test(filename, error))
+                continue
+            case = self.selector.select_case(case, filename)
+            if case is not None:
+                tests.append(self._load_case(
+                    filename, config, case, test_pre_definitions))
+        return loader.create_suite(tests)
+
+    def _load_case(self, filename, config, case, test_pre_definitions):
+        case = create_test_case_for_case(
+            filename, config, case, self._assertions_map,
+            self._test_parameters, test_pre_definitions)
+        return self._loader.load_case(case)
 
     def load_tests_from_yaml(self, test_structure, filename):
         """Create a ``TestSuite`` containing all test cases contained in the
         yaml structure.
 
+        """
+        error = _validate_test_structure(test_structure)
+        return self.load_tests_from_parsed_file(
+            test_structure, filename, error)
+
+    def load_tests_from_parsed_file(self, test_structure, filename, error):
+        """Create a ``TestSuite`` from a yaml structure that has already
+        been validated by :func:`~.parse_test_file`.
+
+        Parameters
+        ----------
+        test_structure : dict
+            The parsed test structure, or a :class:`~.StreamedTestFile`
+            to load the file one case at a time.
+        filename : str
+            The path of the file from which the structure was loaded.
+        error : str
+            The schema validation error message, or ``None`` if the
+            test structure is valid.
+
         """
         loader = self._loader
-        try:
-            jsonschema.validate(test_structure, SCHEMA)
-        except ValidationError as e:
-            test = _create_yaml_parse_error_test(filename, str(e))
+        if isinstance(test_structure, StreamedTestFile):
+            return self.load_tests_from_stream(filename)
+        if error is not None:
+            test = _create_yaml_parse_error_test(filename, error)
             return loader.create_suite([test])
         config = Config.from_dict(test_structure['config'], filename)
 
         test_pre_definitions = test_structure.get('test-pre-definitions', {})
 
-        cases = (
-            create_test_case_for_case(
-                filename, config, case, self._assertions_map,
-                self._test_parameters, test_pre_definitions)
-            for case in test_structure['cases']
-        )
-        tests = [loader.load_case(case) for case in cases]
+        tests = [
+            self._load_case(filename, config, case, test_pre_definitions)
+            for case in self.selector.select_cases(
+                test_structure['cases'], filename)
+        ]
         return loader.create_suite(tests)
+
+    def case_keys(self, test_structure, filename, error):
+        """Generate the shard keys of the cases of a parsed test file
+        selected by name and tag, without constructing them.
+
+        Parameters
+        ----------
+        test_structure : dict
+            The test structure returned by :func:`~.parse_test_file`.
+        filename : str
+            The path of the test file.
+        error : str
+            The schema validation error message, or ``None`` if the
+            test structure is valid.
+
+        """
+        if error is not None:
+            return
+        if isinstance(test_structure, StreamedTestFile):
+            cases = _stream_valid_cases(filename)
+        else:
+            cases = test_structure['cases']
+        for case in cases:
+            if self.selector.filter_case(case) is not None:
+                yield case_key(filename, case['name'])